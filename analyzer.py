@@ -1,22 +1,30 @@
-import jieba
 import numpy as np
 from datetime import datetime
+from lexicon import DEFAULT_DEGREES, DEFAULT_NEGATORS, LexiconEngine
+from tokenizer import Tokenizer
 
 class SentimentAnalyzer:
-    def __init__(self, positive_words, negative_words):
-        self.positive_words = set(positive_words)
-        self.negative_words = set(negative_words)
+    """
+    positive_words / negative_words 可为词列表（权重 1）或 {词: 权重}；
+    情绪词可跨多个分词结果匹配，并受前方否定词（极性翻转）与程度副词（权重倍数）修饰
+    """
+    def __init__(self, positive_words, negative_words, tokenizer=None,
+                 negators=DEFAULT_NEGATORS, degrees=DEFAULT_DEGREES):
+        self.tokenizer = tokenizer or Tokenizer()
+        self.lexicon = LexiconEngine.from_polarity(positive_words, negative_words,
+                                                   negators=negators, degrees=degrees)
 
-    def analyze_sentiment(self, text):
+    def analyze_sentiment(self, text, words=None):
         """
         计算情绪得分和标签
+        words 为已分好的词时直接使用，不再重复分词
         """
-        words = list(jieba.cut(text))
-        pos_count = sum(1 for w in words if w in self.positive_words)
-        neg_count = sum(1 for w in words if w in self.negative_words)
+        if words is None:
+            words = self.tokenizer.cut(text)
+        pos_weight, neg_weight, pos_count, neg_count = self.lexicon.score_words(words)
         
-        # 计算得分: (pos - neg) / (pos + neg + 1)
-        score = (pos_count - neg_count) / (pos_count + neg_count + 1)
+        # 计算得分: (pos - neg) / (pos + neg + 1)，pos / neg 为修饰后的权重和
+        score = (pos_weight - neg_weight) / (pos_weight + neg_weight + 1)
         
         if score > 0.1:
             label = "正面"
@@ -30,23 +38,63 @@ class SentimentAnalyzer:
     def calculate_heat(self, row):
         """
         计算热度指标
-        Heat = log(comments + 1) + 0.5 * log(likes + 1)
+        Heat = log(comments + 1) + 0.5 * log(likes + 1) + 0.5 * log(dup_count)
+        dup_count 为近重复折叠后代表帖所代表的帖子数（含自身），无重复时该项为 0
         """
         likes = row.get('likes', 0)
         comments = row.get('comments', 0)
-        heat = np.log1p(comments) + 0.5 * np.log1p(likes)
+        dup_count = row.get('dup_count', 1)
+        heat = np.log1p(comments) + 0.5 * np.log1p(likes) + 0.5 * np.log1p(dup_count - 1)
         return round(heat, 2)
 
-    def analyze_dataframe(self, df):
+    def late_duplicate_heat(self, hits):
+        """
+        NearDuplicateIndex.take_late_hits() 的结果 → 代表帖热度增量：
+        每个命中一行（代表帖字段 + heat_index 为重复数从旧值增加到新值带来的热度差），
+        逐次累加的结果与一次性折叠全部副本的热度相同
+        """
+        import pandas as pd
+        rows = []
+        for payload, old_count, new_count in hits:
+            row = dict(payload)
+            row['heat_index'] = (self.calculate_heat(dict(payload, dup_count=new_count))
+                                 - self.calculate_heat(dict(payload, dup_count=old_count)))
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def score_tokens(self, tokens):
+        """
+        批量情绪打分：不含任何情绪词起点的行直接跳过，其余行在分词结果上做短语匹配
+        返回 (得分, 标签, 积极词数, 消极词数) 四个等长数组
+        """
+        pos_weight, neg_weight, pos_count, neg_count = self.lexicon.score_column(tokens)
+        score = (pos_weight - neg_weight) / (pos_weight + neg_weight + 1)
+        label = np.select([score > 0.1, score < -0.1], ["正面", "负面"], default="中性")
+        return score, label, pos_count, neg_count
+
+    def calculate_heat_batch(self, df):
+        """
+        calculate_heat 的列式版本，整列一次计算
+        """
+        n = len(df)
+        likes = df['likes'].to_numpy(dtype=np.float64) if 'likes' in df else np.zeros(n)
+        comments = df['comments'].to_numpy(dtype=np.float64) if 'comments' in df else np.zeros(n)
+        duplicates = df['dup_count'].to_numpy(dtype=np.float64) - 1 if 'dup_count' in df else np.zeros(n)
+        return np.round(np.log1p(comments) + 0.5 * np.log1p(likes) + 0.5 * np.log1p(duplicates), 2)
+
+    def analyze_dataframe(self, df, tokens=None):
         """
         对DataFrame进行批量分析
+        tokens 为分词阶段产出的 TokenColumn（与 df 行顺序一致），缺省时现场分词
         """
-        results = df.apply(lambda row: self.analyze_sentiment(row['cleaned_content']), axis=1)
-        df['sentiment_score'] = [r[0] for r in results]
-        df['sentiment_label'] = [r[1] for r in results]
-        df['pos_words'] = [r[2] for r in results]
-        df['neg_words'] = [r[3] for r in results]
-        df['heat_index'] = df.apply(self.calculate_heat, axis=1)
+        if tokens is None:
+            tokens = self.tokenizer.tokenize(df['cleaned_content'])
+        score, label, pos_count, neg_count = self.score_tokens(tokens)
+        df['sentiment_score'] = score
+        df['sentiment_label'] = label
+        df['pos_words'] = pos_count
+        df['neg_words'] = neg_count
+        df['heat_index'] = self.calculate_heat_batch(df)
         return df
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+
+# 单个数据段文件的大小上限，写满后新开一段
+SEGMENT_BYTES = 256 * 2 ** 20
+
+
+def to_epoch(value):
+    """None / 时间戳 / datetime / "YYYY-MM-DD[ HH:MM:SS]" 统一转为时间戳（本地时区）"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+class PayloadArchive:
+    """
+    原始抓取载荷归档：内容寻址、压缩、只追加
+    - 载荷按 SHA-256 去重（页面未变化时只存一份），zlib 压缩后追加写入 segment-NNNNN.bin
+    - archive.db 记录每个载荷所在的段与偏移，以及每次抓取的 时间/平台/关键词/URL/载荷摘要
+    回放时按抓取记录顺序读取，只做顺序 pread + 解压
+    """
+    def __init__(self, root="state/archive", segment_bytes=SEGMENT_BYTES, level=6):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.level = level
+        os.makedirs(root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "archive.db"), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "digest TEXT PRIMARY KEY, segment INTEGER, offset INTEGER, length INTEGER, raw_length INTEGER)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fetches ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, fetched_at REAL, platform TEXT, keyword TEXT, "
+            "url TEXT, kind TEXT, digest TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS fetches_by_source ON fetches (platform, keyword, fetched_at)")
+        self.conn.commit()
+        # 写入串行化：在线抓取时浏览器平台与微博线程会同时归档
+        self._lock = threading.Lock()
+        self._readers = {}
+        row = self.conn.execute("SELECT MAX(segment) FROM blobs").fetchone()
+        self._segment = row[0] or 0
+        self._writer = None
+
+    def _segment_path(self, segment):
+        return os.path.join(self.root, f"segment-{segment:05d}.bin")
+
+    def _open_writer(self):
+        if self._writer is None:
+            self._writer = open(self._segment_path(self._segment), "ab")
+        if self._writer.tell() >= self.segment_bytes:
+            self._writer.close()
+            self._segment += 1
+            self._writer = open(self._segment_path(self._segment), "ab")
+        return self._writer
+
+    def put(self, platform, keyword, url, payload, fetched_at=None, kind="html"):
+        """归档一次抓取的原始载荷（bytes），返回载荷摘要"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        digest = hashlib.sha256(payload).hexdigest()
+        with self._lock:
+            exists = self.conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if exists is None:
+                data = zlib.compress(payload, self.level)
+                writer = self._open_writer()
+                offset = writer.tell()
+                writer.write(data)
+                # 先落盘数据再登记位置，中途崩溃只会留下无人引用的字节
+                writer.flush()
+                self.conn.execute("INSERT INTO blobs VALUES (?, ?, ?, ?, ?)",
+                                  (digest, self._segment, offset, len(data), len(payload)))
+            self.conn.execute(
+                "INSERT INTO fetches (fetched_at, platform, keyword, url, kind, digest) VALUES (?, ?, ?, ?, ?, ?)",
+                (fetched_at, platform, keyword, url, kind, digest))
+            self.conn.commit()
+        return digest
+
+    def get(self, digest):
+        """按摘要读取并解压载荷"""
+        row = self.conn.execute("SELECT segment, offset, length FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        segment, offset, length = row
+        fd = self._readers.get(segment)
+        if fd is None:
+            with self._lock:
+                fd = self._readers.get(segment)
+                if fd is None:
+                    fd = self._readers[segment] = os.open(self._segment_path(segment), os.O_RDONLY)
+        # pread 不移动文件位置，回放线程可并发读取
+        return zlib.decompress(os.pread(fd, length, offset))
+
+    def fetches(self, platforms=None, keywords=None, start=None, end=None):
+        """
+        按抓取顺序产出 (fetched_at, platform, keyword, url, kind, digest)
+        platforms / keywords 为空时不过滤；start / end 为时间范围（含起点，不含终点）
+        """
+        clauses, params = [], []
+        for column, values in (("platform", platforms), ("keyword", keywords)):
+            if values:
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        if start is not None:
+            clauses.append("fetched_at >= ?")
+            params.append(to_epoch(start))
+        if end is not None:
+            clauses.append("fetched_at < ?")
+            params.append(to_epoch(end))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        yield from self.conn.execute(
+            f"SELECT fetched_at, platform, keyword, url, kind, digest FROM fetches{where} ORDER BY id", params)
+
+    def stats(self):
+        fetches = self.conn.execute("SELECT COUNT(*) FROM fetches").fetchone()[0]
+        blobs, raw_bytes, stored_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_length), 0), COALESCE(SUM(length), 0) FROM blobs").fetchone()
+        return {"fetches": fetches, "blobs": blobs, "raw_bytes": raw_bytes, "stored_bytes": stored_bytes}
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for fd in self._readers.values():
+            os.close(fd)
+        self._readers = {}
+        self.conn.close()
@@ -0,0 +1,754 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from analyzer import SentimentAnalyzer
+from clusterer import TopicClusterer
+from main import write_report
+from parallel import ParallelPipeline
+from processor import DataProcessor
+from stream import SectorAggregator
+from tokenizer import TokenColumn, Tokenizer, domain_words, load_dictionary
+from windows import WindowAggregator
+
+POSITIVE_WORDS = ["利好", "大涨", "爆发", "超预期", "走强", "突破", "强势"]
+NEGATIVE_WORDS = ["下跌", "利空", "承压", "回调", "惨淡", "风险", "走弱"]
+
+
+def _naive_match_sectors(sector_keywords, text):
+    """原逐关键词子串扫描实现，作为对照基线"""
+    matched = []
+    for sector, keywords in sector_keywords.items():
+        for kw in keywords:
+            if kw.lower() in text.lower():
+                matched.append(sector)
+                break
+    return matched
+
+
+def _legacy_clean_text(text):
+    """原四次 re.sub 的清洗实现，作为对照基线"""
+    if not text:
+        return ""
+    text = re.sub(r'<.*?>', '', text)
+    text = re.sub(r'http[s]?://\S+', '', text)
+    text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def make_html_posts(n_posts, seed=4):
+    """生成带 HTML 标签、链接、表情、股票代码和全角标点的帖子正文"""
+    rng = random.Random(seed)
+    fragments = [
+        "公司", "发布", "公告", "机构", "认为", "板块", "资金", "AI", "算力", "光伏", "利好", "回调",
+        "<p>", "</p>", "<br/>", "<span class=\"hl\">", "</span>", "<a href=\"https://xueqiu.com/S/SH600519\">",
+        "</a>", "https://t.cn/A6abcdE ", "详见https://t.cn/A6x", "$贵州茅台(SH600519)$", "#半导体#", "，", "。", "！！", "😀", "\n", "  ",
+    ]
+    return ["".join(rng.choice(fragments) for _ in range(rng.randint(40, 120))) for _ in range(n_posts)]
+
+
+def bench_clean_text(n_posts=50000):
+    """
+    预编译清洗（标记删除 + 保留字符片段提取）与原四次 re.sub 实现在 HTML 帖子语料上的耗时对比
+    """
+    processor = DataProcessor(SECTOR_KEYWORDS)
+    posts = make_html_posts(n_posts)
+    legacy, legacy_time = _timed(lambda: [_legacy_clean_text(t) for t in posts])
+    (fast, _), fast_time = _timed(processor.clean_texts, posts)
+    assert fast == legacy, "清洗结果与基线不一致"
+    column, column_time = _timed(processor.clean_column, pd.Series(posts))
+    print(f"[+] clean_text {n_posts} 条: 预编译清洗 {fast_time:.4f}s（含小写）/ 四次 re.sub {legacy_time:.4f}s"
+          f" / clean_column {column_time:.4f}s")
+    return [{
+        "posts": n_posts,
+        "compiled_s": round(fast_time, 4),
+        "legacy_s": round(legacy_time, 4),
+        "column_s": round(column_time, 4),
+        "speedup": round(legacy_time / fast_time, 2) if fast_time else None,
+    }]
+
+
+def _random_word(rng, min_len=2, max_len=4):
+    return "".join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_sector_keywords(n_keywords, keywords_per_sector=10, seed=0):
+    """生成 n_keywords 个随机中文关键词，按每板块 keywords_per_sector 个分组"""
+    rng = random.Random(seed)
+    words = [_random_word(rng) for _ in range(n_keywords)]
+    return {
+        f"板块{i // keywords_per_sector}": words[i:i + keywords_per_sector]
+        for i in range(0, n_keywords, keywords_per_sector)
+    }
+
+
+def make_texts(n_texts, vocabulary, length=200, hits_per_text=3, seed=1):
+    """生成随机正文，每条插入 hits_per_text 个词典中的关键词"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n_texts):
+        chars = [chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(length)]
+        for _ in range(hits_per_text):
+            pos = rng.randint(0, length)
+            chars.insert(pos, rng.choice(vocabulary))
+        texts.append("".join(chars))
+    return texts
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_match_sectors(sizes=(10, 1000, 10000), n_texts=200):
+    """
+    对比 Aho–Corasick 自动机与逐关键词子串扫描在不同词典规模下的板块匹配耗时
+    """
+    results = []
+    for size in sizes:
+        sector_keywords = make_sector_keywords(size)
+        vocabulary = [kw for kws in sector_keywords.values() for kw in kws]
+        texts = make_texts(n_texts, vocabulary)
+
+        processor, build_time = _timed(DataProcessor, sector_keywords)
+        fast, fast_time = _timed(lambda: [processor.match_sectors(t) for t in texts])
+        naive, naive_time = _timed(lambda: [_naive_match_sectors(sector_keywords, t) for t in texts])
+        assert fast == naive, "自动机与基线匹配结果不一致"
+
+        results.append({
+            "keywords": size,
+            "texts": n_texts,
+            "build_s": round(build_time, 4),
+            "automaton_s": round(fast_time, 4),
+            "naive_s": round(naive_time, 4),
+            "speedup": round(naive_time / fast_time, 1) if fast_time else None,
+        })
+        print(f"[+] match_sectors {size:>6} 个关键词: 自动机 {fast_time:.4f}s "
+              f"(构建 {build_time:.4f}s) / 逐词扫描 {naive_time:.4f}s")
+    return results
+
+
+def _legacy_analyze_sentiment(positive_words, negative_words, words):
+    """原实现：情绪词集合上逐词计数"""
+    pos_count = sum(1 for w in words if w in positive_words)
+    neg_count = sum(1 for w in words if w in negative_words)
+    score = (pos_count - neg_count) / (pos_count + neg_count + 1)
+    label = "正面" if score > 0.1 else "负面" if score < -0.1 else "中性"
+    return score, label, pos_count, neg_count
+
+
+def _legacy_analyze_dataframe(analyzer, df, token_lists):
+    """逐行 apply 的原实现（集合计数，分词结果已给定），作为对照基线"""
+    positive_words, negative_words = set(POSITIVE_WORDS), set(NEGATIVE_WORDS)
+    results = [_legacy_analyze_sentiment(positive_words, negative_words, words) for words in token_lists]
+    df['sentiment_score'] = [r[0] for r in results]
+    df['sentiment_label'] = [r[1] for r in results]
+    df['pos_words'] = [r[2] for r in results]
+    df['neg_words'] = [r[3] for r in results]
+    df['heat_index'] = df.apply(analyzer.calculate_heat, axis=1)
+    return df
+
+
+def make_token_frame(n_rows, vocab_size=20000, words_per_row=40, lexicon_rate=0.05, seed=2):
+    """生成已分词的语料：每行 words_per_row 个词，其中约 lexicon_rate 比例为情绪词"""
+    rng = random.Random(seed)
+    vocab = [_random_word(rng) for _ in range(vocab_size)]
+    lexicon = POSITIVE_WORDS + NEGATIVE_WORDS
+    token_lists = [
+        [rng.choice(lexicon) if rng.random() < lexicon_rate else rng.choice(vocab) for _ in range(words_per_row)]
+        for _ in range(n_rows)
+    ]
+    df = pd.DataFrame({
+        "cleaned_content": ["".join(words) for words in token_lists],
+        "likes": [rng.randint(0, 1000) for _ in range(n_rows)],
+        "comments": [rng.randint(0, 200) for _ in range(n_rows)],
+    })
+    return df, token_lists
+
+
+def bench_analyze_dataframe(n_rows=100000):
+    """
+    列式 analyze_dataframe（短语前缀树批量打分 + NumPy 热度）与原逐行集合计数实现的耗时对比，
+    两者都使用预先分好的词，不计入分词时间；对照时关闭否定词与程度副词，结果应与集合计数完全一致，
+    modifiers_s 为默认配置（含否定 / 程度修饰）的耗时
+    """
+    analyzer = SentimentAnalyzer(POSITIVE_WORDS, NEGATIVE_WORDS, negators=(), degrees={})
+    df, token_lists = make_token_frame(n_rows)
+    tokens = TokenColumn.from_token_lists(token_lists)
+
+    fast, fast_time = _timed(analyzer.analyze_dataframe, df.copy(), tokens)
+    legacy, legacy_time = _timed(_legacy_analyze_dataframe, analyzer, df.copy(), token_lists)
+    _, modifiers_time = _timed(SentimentAnalyzer(POSITIVE_WORDS, NEGATIVE_WORDS).analyze_dataframe, df.copy(), tokens)
+    for col in ["sentiment_score", "pos_words", "neg_words", "heat_index"]:
+        assert np.allclose(fast[col].to_numpy(dtype=float), legacy[col].to_numpy(dtype=float)), col
+    assert (fast['sentiment_label'].to_numpy() == legacy['sentiment_label'].to_numpy()).all()
+
+    print(f"[+] analyze_dataframe {n_rows} 行: 列式 {fast_time:.4f}s（含修饰 {modifiers_time:.4f}s）"
+          f" / 逐行集合计数 {legacy_time:.4f}s")
+    return [{
+        "rows": n_rows,
+        "vectorized_s": round(fast_time, 4),
+        "modifiers_s": round(modifiers_time, 4),
+        "legacy_s": round(legacy_time, 4),
+        "speedup": round(legacy_time / fast_time, 1) if fast_time else None,
+    }]
+
+
+def bench_lexicon(sizes=(14, 1000, 10000, 50000), n_rows=50000, n_naive=200):
+    """
+    词典规模增长时的情绪打分吞吐：短语前缀树（score_tokens）应基本持平，
+    对照逐短语子串扫描（耗时随词典线性增长，只跑 n_naive 行）
+    """
+    df, token_lists = make_token_frame(n_rows)
+    tokens = TokenColumn.from_token_lists(token_lists)
+    texts = df['cleaned_content'].tolist()[:n_naive]
+    rng = random.Random(6)
+    results = []
+    for size in sizes:
+        extra = [_random_word(rng) for _ in range(max(0, size - len(POSITIVE_WORDS) - len(NEGATIVE_WORDS)))]
+        positive = POSITIVE_WORDS + extra[::2]
+        negative = NEGATIVE_WORDS + extra[1::2]
+        analyzer, build_time = _timed(SentimentAnalyzer, positive, negative)
+        _, elapsed = _timed(analyzer.score_tokens, tokens)
+        phrases = positive + negative
+        _, naive_time = _timed(lambda: [sum(t.count(p) for p in phrases) for t in texts])
+        results.append({
+            "lexicon": len(phrases),
+            "rows": n_rows,
+            "build_s": round(build_time, 4),
+            "score_s": round(elapsed, 4),
+            "rows_per_s": round(n_rows / elapsed, 1),
+            "naive_rows_per_s": round(n_naive / naive_time, 1),
+        })
+        print(f"[+] lexicon {len(phrases):>6} 词: 前缀树 {n_rows / elapsed:>9.0f} 条/秒 (构建 {build_time:.3f}s)"
+              f" / 逐短语扫描 {n_naive / naive_time:>8.0f} 条/秒")
+    return results
+
+
+SECTOR_KEYWORDS = {
+    "人工智能": ["AI", "算力", "大模型", "服务器", "芯片"],
+    "新能源": ["光伏", "锂电", "储能", "新能源"],
+    "半导体": ["芯片", "制程", "国产替代"],
+    "军工": ["军工", "装备", "国防"]
+}
+
+
+def make_records(n_rows, seed=3):
+    """生成原始帖子记录，正文由常见财经词随机拼接"""
+    rng = random.Random(seed)
+    words = ["公司", "发布", "公告", "机构", "认为", "板块", "市场", "资金", "今日", "表现"]
+    words += POSITIVE_WORDS + NEGATIVE_WORDS + [kw for kws in SECTOR_KEYWORDS.values() for kw in kws]
+    return [{
+        "title": "".join(rng.choice(words) for _ in range(5)),
+        "content": "".join(rng.choice(words) for _ in range(40)),
+        "time": "2026-01-01 09:30:00",
+        "platform": "Bench",
+        "likes": rng.randint(0, 1000),
+        "comments": rng.randint(0, 200),
+    } for _ in range(n_rows)]
+
+
+def bench_parallel(n_rows=20000, worker_counts=(1, 2, 4)):
+    """
+    多进程 清洗/匹配/分词/情绪分析 在不同进程数下的吞吐（条/秒）
+    词典缓存事先预热；进程池启动（工作进程加载词典）单独计时，稳态吞吐在已就绪的进程池上测量，
+    加速比相对单进程的稳态耗时
+    """
+    records = make_records(n_rows)
+    results = []
+    with tempfile.TemporaryDirectory() as dict_dir:
+        # 在子进程中构建词典缓存文件，父进程不持有已加载的词典，工作进程的启动耗时与实际运行一致
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            executor.submit(load_dictionary, dict_dir,
+                            domain_words(SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS)).result()
+        baseline = None
+        for workers in worker_counts:
+            pipeline = ParallelPipeline(SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS, workers=workers,
+                                        chunk_size=max(1000, n_rows // (workers * 4)), dict_cache_dir=dict_dir)
+            _, startup = _timed(pipeline.start)
+            try:
+                (df, _), elapsed = _timed(pipeline.run, records)
+            finally:
+                pipeline.close()
+            assert len(df) == n_rows
+            baseline = baseline or elapsed
+            results.append({"rows": n_rows, "workers": workers, "startup_s": round(startup, 3),
+                            "seconds": round(elapsed, 3), "rows_per_s": round(n_rows / elapsed, 1),
+                            "speedup": round(baseline / elapsed, 2)})
+            print(f"[+] parallel {workers} 进程: 启动 {startup:.3f}s，稳态 {elapsed:.3f}s, "
+                  f"{n_rows / elapsed:.0f} 条/秒，加速 {baseline / elapsed:.2f}x")
+    if os.cpu_count() and os.cpu_count() < max(worker_counts):
+        print(f"[!] 本机只有 {os.cpu_count()} 个 CPU，超出部分的进程数无法体现加速")
+    return results
+
+
+def bench_windows(n_rows=200000, batch_size=500):
+    """
+    滑动窗口聚合：逐批增量写入 + 每批查询 1h 窗口，
+    对照每批都对全部历史重新 explode/groupby 的做法（对照组只跑前 20 批，按批均摊）
+    """
+    rng = np.random.default_rng(5)
+    sectors = np.array(list(SECTOR_KEYWORDS))
+    start = pd.Timestamp("2026-01-01 09:30:00")
+    df = pd.DataFrame({
+        "time": (start + pd.to_timedelta(np.sort(rng.integers(0, 2 * 86400, n_rows)), unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+        "matched_sectors": [[s] for s in rng.choice(sectors, n_rows)],
+        "sentiment_score": rng.uniform(-1, 1, n_rows),
+        "heat_index": rng.uniform(0, 10, n_rows),
+    })
+    batches = [df.iloc[i:i + batch_size] for i in range(0, n_rows, batch_size)]
+
+    agg = WindowAggregator()
+    query_time = 0.0
+    began = time.perf_counter()
+    for batch in batches:
+        agg.update(batch, 'matched_sectors')
+        _, elapsed = _timed(agg.query, "1h")
+        query_time += elapsed
+    incremental = (time.perf_counter() - began) / len(batches)
+
+    began = time.perf_counter()
+    n_regroup = min(20, len(batches))
+    for i in range(n_regroup):
+        history = df.iloc[:(len(batches) - n_regroup + i + 1) * batch_size]
+        history.explode('matched_sectors').groupby('matched_sectors').agg(
+            {'sentiment_score': 'mean', 'heat_index': 'sum', 'time': 'count'})
+    regroup = (time.perf_counter() - began) / n_regroup
+
+    speedup = regroup / incremental
+    print(f"[+] windows {n_rows} 行 / 每批 {batch_size}: 增量 {incremental * 1000:.2f}ms/批"
+          f"（查询 {query_time / len(batches) * 1000:.2f}ms），全量重算 {regroup * 1000:.2f}ms/批，加速 {speedup:.1f}x")
+    if speedup < 1:
+        print("[!] 增量聚合慢于全量重算：历史较短时直接重算更划算")
+    return [{
+        "rows": n_rows,
+        "batch_size": batch_size,
+        "incremental_ms_per_batch": round(incremental * 1000, 3),
+        "query_ms": round(query_time / len(batches) * 1000, 3),
+        "regroup_ms_per_batch": round(regroup * 1000, 3),
+        "speedup": round(speedup, 2),
+    }]
+
+
+def make_topic_corpus(n_docs, n_topics=4, words_per_topic=40, background_size=3000, doc_len=30,
+                      topic_share=0.6, seed=8):
+    """
+    植入主题的已分词语料：每篇文档属于一个主题，topic_share 比例的词取自该主题词表，其余取自公共背景词
+    返回 (词列表的列表, 真实主题编号)
+    """
+    rng = random.Random(seed)
+    vocab = list({_random_word(rng) for _ in range(n_topics * words_per_topic + background_size)})
+    topic_words = [vocab[k * words_per_topic:(k + 1) * words_per_topic] for k in range(n_topics)]
+    background = vocab[n_topics * words_per_topic:]
+    docs, labels = [], []
+    for _ in range(n_docs):
+        k = rng.randrange(n_topics)
+        n_topic = int(doc_len * topic_share)
+        docs.append(rng.choices(topic_words[k], k=n_topic) + rng.choices(background, k=doc_len - n_topic))
+        labels.append(k)
+    return docs, np.array(labels)
+
+
+def _umass_coherence(topics, docs, n_words=10):
+    """UMass 主题一致性：各主题前 n_words 个词两两共现的平均 log((D(wi,wj)+1)/D(wj))，越接近 0 越好"""
+    doc_sets = [set(words) for words in docs]
+    scores = []
+    for topic in topics:
+        words = topic['keywords'][:n_words]
+        df = {w: sum(w in d for d in doc_sets) for w in words}
+        pairs = []
+        for i in range(1, len(words)):
+            for j in range(i):
+                co = sum(words[i] in d and words[j] in d for d in doc_sets)
+                if df[words[j]]:
+                    pairs.append(np.log((co + 1) / df[words[j]]))
+        if pairs:
+            scores.append(np.mean(pairs))
+    return float(np.mean(scores)) if scores else float("nan")
+
+
+def bench_topics(n_docs=50000, batch_size=5000, n_topics=4, n_eval=5000):
+    """
+    主题模型 lda / kmeans / nmf 对比：按批增量训练的总耗时与吞吐，
+    以及主题质量（与植入主题的 NMI、UMass 一致性、前 10 词的去重比例）
+    """
+    from sklearn.metrics import normalized_mutual_info_score
+    docs, labels = make_topic_corpus(n_docs, n_topics=n_topics)
+    batches = [TokenColumn.from_token_lists(docs[i:i + batch_size]) for i in range(0, n_docs, batch_size)]
+    results = []
+    for mode in ("lda", "kmeans", "nmf"):
+        clusterer = TopicClusterer(n_topics=n_topics, mode=mode, autosave=False)
+        assigned = []
+        began = time.perf_counter()
+        for tokens in batches:
+            _, dominant = clusterer.fit_topics(None, tokens=tokens)
+            assigned.append(dominant)
+        elapsed = time.perf_counter() - began
+        topics = clusterer.topics()
+        # 用训练结束时的模型重新分配，衡量最终模型而非各批训练中途的结果
+        _, final = clusterer.transform_topics(tokens=TokenColumn.from_token_lists(docs))
+        top_words = [w for topic in topics for w in topic['keywords'][:10]]
+        row = {
+            "mode": mode,
+            "docs": n_docs,
+            "fit_s": round(elapsed, 3),
+            "docs_per_s": round(n_docs / elapsed, 1),
+            "nmi": round(normalized_mutual_info_score(labels, final), 4),
+            "umass": round(_umass_coherence(topics, docs[:n_eval]), 4),
+            "diversity": round(len(set(top_words)) / max(1, len(top_words)), 3),
+        }
+        results.append(row)
+        print(f"[+] topics {mode:<6} {n_docs} 篇: {row['fit_s']:.2f}s ({row['docs_per_s']:.0f} 篇/秒), "
+              f"NMI {row['nmi']:.3f}, UMass {row['umass']:.3f}, 主题词去重 {row['diversity']:.2f}")
+    return results
+
+# 合成语料用的素材：个股、中性财经短语、HTML 噪声
+STOCKS = ["贵州茅台", "宁德时代", "中芯国际", "比亚迪", "隆基绿能", "中航沈飞", "寒武纪", "浪潮信息",
+          "阳光电源", "北方华创", "中科曙光", "东方财富", "招商银行", "工业富联", "航发动力"]
+STOCK_CODES = ["SH600519", "SZ300750", "SH688981", "SZ002594", "SH601012", "SH600760", "SH688256",
+               "SZ000977", "SZ300274", "SZ002371", "SH603019", "SZ300059", "SH600036", "SH601138", "SH600893"]
+FILLERS = ["公司发布公告", "机构调研显示", "主力资金净流入", "今日盘中", "分析师认为", "近期市场关注",
+           "二季度业绩", "成交量明显放大", "北向资金", "产业链上下游", "估值水平", "龙头企业",
+           "订单情况", "政策层面", "短期来看", "中长期", "行业景气度", "市场情绪", "板块轮动", "技术面"]
+HTML_NOISE = ["<p>", "</p>", "<br/>", '<span class="hl">', "</span>", "https://t.cn/A6abcdE ",
+              '<a href="https://xueqiu.com/S/{code}">', "</a>", "#{stock}#", "😀", "！！", "\n"]
+BENCH_PLATFORMS = ["THS", "EastMoney", "Xueqiu", "Weibo"]
+
+
+def make_corpus(n_posts, sector_rate=0.6, lexicon_rate=0.4, html_rate=0.3, chunk_size=50000, seed=7):
+    """
+    分块生成合成财经帖子（每块 chunk_size 条），千万级规模下内存占用与块大小相关
+    sector_rate / lexicon_rate / html_rate 分别控制含板块关键词、含情绪词、带 HTML 噪声的帖子比例
+    """
+    rng = random.Random(seed)
+    sector_words = [kw for kws in SECTOR_KEYWORDS.values() for kw in kws]
+    lexicon = POSITIVE_WORDS + NEGATIVE_WORDS
+    start = datetime(2026, 1, 1, 9, 30)
+    produced = 0
+    while produced < n_posts:
+        chunk = []
+        for _ in range(min(chunk_size, n_posts - produced)):
+            i = rng.randrange(len(STOCKS))
+            parts = [f"${STOCKS[i]}({STOCK_CODES[i]})$"] + rng.sample(FILLERS, rng.randint(3, 8))
+            if rng.random() < sector_rate:
+                parts += rng.sample(sector_words, rng.randint(1, 2))
+            if rng.random() < lexicon_rate:
+                parts += [rng.choice(lexicon) for _ in range(rng.randint(1, 3))]
+            rng.shuffle(parts)
+            if rng.random() < html_rate:
+                noise = [rng.choice(HTML_NOISE).format(code=STOCK_CODES[i], stock=STOCKS[i])
+                         for _ in range(rng.randint(2, 6))]
+                parts = [p for pair in zip(parts, noise + [""] * len(parts)) for p in pair]
+            content = "，".join(parts) + "。"
+            chunk.append({
+                "title": f"{STOCKS[i]}：{rng.choice(FILLERS)}",
+                "content": content,
+                "time": (start + timedelta(seconds=produced)).strftime("%Y-%m-%d %H:%M:%S"),
+                "platform": rng.choice(BENCH_PLATFORMS),
+                "likes": rng.randint(0, 1000),
+                "comments": rng.randint(0, 200),
+            })
+            produced += 1
+        yield chunk
+
+
+class StageTimer:
+    """
+    按阶段累计耗时、处理条数与峰值内存（tracemalloc，开启后计时会偏慢）
+    """
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    def run(self, name, rows, fn, *args):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        result, elapsed = _timed(fn, *args)
+        stage = self.stages.setdefault(name, {"seconds": 0.0, "rows": 0, "peak_mb": 0.0})
+        stage["seconds"] += elapsed
+        stage["rows"] += rows
+        if self.trace_memory:
+            peak = (tracemalloc.get_traced_memory()[1] - base) / 2 ** 20
+            stage["peak_mb"] = max(stage["peak_mb"], round(peak, 2))
+        return result
+
+    def results(self):
+        return [{
+            "stage": name,
+            "rows": stage["rows"],
+            "seconds": round(stage["seconds"], 4),
+            "rows_per_s": round(stage["rows"] / stage["seconds"], 1) if stage["seconds"] else None,
+            "peak_mb": stage["peak_mb"] if self.trace_memory else None,
+        } for name, stage in self.stages.items()]
+
+
+def bench_pipeline(n_posts=10000, chunk_size=50000, sector_rate=0.6, lexicon_rate=0.4, html_rate=0.3,
+                   trace_memory=False):
+    """
+    端到端流水线分阶段计时：clean_text / match_sectors / tokenize / analyze_sentiment /
+    calculate_heat / fit_topics / write_report，语料按块生成与处理，报告每阶段吞吐与峰值内存
+    """
+    processor = DataProcessor(SECTOR_KEYWORDS)
+    tokenizer = Tokenizer()
+    analyzer = SentimentAnalyzer(POSITIVE_WORDS, NEGATIVE_WORDS, tokenizer=tokenizer)
+    clusterer = TopicClusterer(n_topics=4, tokenizer=tokenizer)
+    sectors = SectorAggregator()
+    timer = StageTimer(trace_memory)
+    # 预热：jieba 词典加载不计入分词阶段
+    tokenizer.cut("预热")
+
+    if trace_memory:
+        tracemalloc.start()
+    generate_time = 0.0
+    started = time.perf_counter()
+    corpus = make_corpus(n_posts, sector_rate, lexicon_rate, html_rate, chunk_size)
+    df = trend_summary = None
+    while True:
+        chunk, elapsed = _timed(next, corpus, None)
+        generate_time += elapsed
+        if chunk is None:
+            break
+        n = len(chunk)
+        cleaned, lowered = timer.run("clean_text", n, processor.clean_texts,
+                                     [processor.full_text(item) for item in chunk])
+        matched = timer.run("match_sectors", n, lambda: [processor.match_sectors(t, lowered=True) or ["其他"]
+                                                         for t in lowered])
+        df = pd.DataFrame(chunk)
+        df['cleaned_content'] = cleaned
+        df['matched_sectors'] = matched
+        tokens = timer.run("tokenize", n, tokenizer.tokenize, cleaned)
+        score, label, pos_count, neg_count = timer.run("analyze_sentiment", n, analyzer.score_tokens, tokens)
+        df['sentiment_score'] = score
+        df['sentiment_label'] = label
+        df['heat_index'] = timer.run("calculate_heat", n, analyzer.calculate_heat_batch, df)
+        sectors.update(df)
+        df, trend_summary = timer.run("fit_topics", n, clusterer.analyze_trends, df, tokens)
+    total = time.perf_counter() - started - generate_time
+
+    # 报告：板块汇总为全量累计，详细列表为最后一块
+    with tempfile.TemporaryDirectory() as tmp:
+        timer.run("write_report", len(df), write_report, trend_summary, sectors.summary(), df,
+                  os.path.join(tmp, "RESULT_SUMMARY.md"))
+    if trace_memory:
+        tracemalloc.stop()
+
+    results = timer.results()
+    for stage in results:
+        print(f"[+] {stage['stage']:<18} {stage['seconds']:>9.3f}s {stage['rows_per_s'] or 0:>12.0f} 条/秒"
+              + (f"  峰值 {stage['peak_mb']:.1f}MB" if trace_memory else ""))
+    print(f"[+] pipeline {n_posts} 条: 合计 {total:.3f}s（{n_posts / total:.0f} 条/秒，不含语料生成 {generate_time:.3f}s），"
+          f"进程峰值 RSS {_max_rss_mb():.0f}MB")
+    results.append({
+        "stage": "total",
+        "rows": n_posts,
+        "seconds": round(total, 4),
+        "rows_per_s": round(n_posts / total, 1),
+        "peak_rss_mb": round(_max_rss_mb(), 1),
+        "chunk_size": chunk_size,
+        "sector_rate": sector_rate,
+        "lexicon_rate": lexicon_rate,
+        "html_rate": html_rate,
+    })
+    return results
+
+
+def _perturb(rng, text, n_edits):
+    """对文本做 n_edits 处单字插入 / 替换 / 尾部追加，模拟转发刷屏时的小改动"""
+    for _ in range(n_edits):
+        i = rng.randrange(len(text))
+        op = rng.random()
+        if op < 0.4:
+            text = text[:i] + rng.choice("涨跌冲稳牛") + text[i:]
+        elif op < 0.7:
+            text = text[:i] + rng.choice("涨跌冲稳牛") + text[i + 1:]
+        else:
+            text += rng.choice(["加油", "冲冲冲", "稳了"])
+    return text
+
+
+def bench_dedup(n_posts=50000, dup_rate=0.3, max_edits=2, batch_size=5000):
+    """
+    近重复折叠：在合成语料中按 dup_rate 注入带 0~max_edits 处小改动的转发副本，
+    逐批折叠，报告吞吐、副本召回率、原帖误折叠率与索引规模，
+    以及折叠后分词 + 情绪分析少处理的行数与耗时
+    """
+    from dedup import NearDuplicateIndex
+    rng = random.Random(9)
+    processor = DataProcessor(SECTOR_KEYWORDS)
+    originals = next(make_corpus(n_posts, chunk_size=n_posts))
+    texts, _ = processor.clean_texts([processor.full_text(item) for item in originals])
+    is_copy = []
+    posts = []
+    for text in texts:
+        posts.append(text)
+        is_copy.append(False)
+        if rng.random() < dup_rate:
+            posts.append(_perturb(rng, text, rng.randint(0, max_edits)))
+            is_copy.append(True)
+    is_copy = np.array(is_copy)
+
+    index = NearDuplicateIndex()
+    keep = []
+    began = time.perf_counter()
+    for i in range(0, len(posts), batch_size):
+        keep.append(index.mark_duplicates(posts[i:i + batch_size])[0])
+    elapsed = time.perf_counter() - began
+    keep = np.concatenate(keep)
+
+    tokenizer = Tokenizer()
+    analyzer = SentimentAnalyzer(POSITIVE_WORDS, NEGATIVE_WORDS, tokenizer=tokenizer)
+    tokenizer.cut("预热")
+    kept_posts = [p for p, k in zip(posts, keep) if k]
+    _, full_time = _timed(lambda: analyzer.score_tokens(tokenizer.tokenize(posts)))
+    tokenizer = Tokenizer()
+    analyzer.tokenizer = tokenizer
+    _, kept_time = _timed(lambda: analyzer.score_tokens(tokenizer.tokenize(kept_posts)))
+
+    row = {
+        "posts": len(posts),
+        "copies": int(is_copy.sum()),
+        "dedup_s": round(elapsed, 3),
+        "posts_per_s": round(len(posts) / elapsed, 1),
+        "recall": round(float((~keep[is_copy]).mean()), 4),
+        "false_collapse": round(float((~keep[~is_copy]).mean()), 4),
+        "index_entries": len(index),
+        "analyze_s": round(full_time, 3),
+        "analyze_after_dedup_s": round(kept_time, 3),
+    }
+    print(f"[+] dedup {row['posts']} 条（副本 {row['copies']}）: {elapsed:.2f}s ({row['posts_per_s']:.0f} 条/秒), "
+          f"副本召回 {row['recall']:.3f}, 原帖误折叠 {row['false_collapse']:.4f}, 索引 {row['index_entries']} 条; "
+          f"分词+情绪 {full_time:.2f}s → {kept_time:.2f}s")
+    return [row]
+
+
+def _max_rss_mb():
+    # Linux 下 ru_maxrss 单位为 KB，macOS 为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def save_results(path, results):
+    """保存基准结果及运行环境，供不同版本间比对"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "revision": _git_revision(),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"[*] 基准结果已保存至: {path}")
+
+
+def compare_results(baseline_path, results):
+    """与此前保存的结果比较端到端各阶段吞吐，比值 <1 表示变慢"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {s["stage"]: s for s in baseline["results"].get("pipeline", [])}
+    print(f"[*] 与 {baseline_path}（{baseline.get('revision')}）比较:")
+    for stage in results.get("pipeline", []):
+        before = old.get(stage["stage"])
+        if before and before.get("rows_per_s") and stage.get("rows_per_s"):
+            ratio = stage["rows_per_s"] / before["rows_per_s"]
+            flag = "  [!] 变慢" if ratio < 0.9 else ""
+            print(f"    {stage['stage']:<18} {before['rows_per_s']:>12.0f} -> {stage['rows_per_s']:>12.0f} 条/秒"
+                  f" ({ratio:.2f}x){flag}")
+
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from analyzer import SentimentAnalyzer
+from processor import DataProcessor
+from tokenizer import Tokenizer
+tokenizer = Tokenizer(user_words=main.USER_WORDS, dict_cache_dir={cache_dir!r})
+df = DataProcessor(main.SECTOR_KEYWORDS).process([{{
+    "title": "AI算力需求超预期", "content": "大模型带动服务器订单爆发", "time": "2026-01-01 09:30:00",
+    "platform": "Bench", "likes": 10, "comments": 2}}])
+df = SentimentAnalyzer(main.POSITIVE_WORDS, main.NEGATIVE_WORDS, tokenizer=tokenizer).analyze_dataframe(df)
+finished = time.perf_counter()
+print(imported - started, finished - started, df['sentiment_score'].iloc[0])
+"""
+
+
+def bench_startup(runs=3):
+    """
+    启动耗时：新进程中 import main 的耗时，以及从启动到第一条分析结果的耗时
+    冷启动为词典缓存不存在（由 jieba 构建并写入缓存），热启动为从持久化词典缓存加载
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        script = STARTUP_SCRIPT.format(cache_dir=cache_dir)
+        for run in range(runs + 1):
+            # 第一次运行时缓存目录为空，即冷启动
+            mode = "cold" if run == 0 else "warm"
+            out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                                 cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+            import_s, first_result_s = float(out[0]), float(out[1])
+            results.append({"mode": mode, "import_s": round(import_s, 3), "first_result_s": round(first_result_s, 3)})
+            print(f"[+] startup {mode}: import main {import_s:.3f}s, 首条结果 {first_result_s:.3f}s")
+    return results
+
+
+BENCHMARKS = {
+    "clean_text": bench_clean_text,
+    "match_sectors": bench_match_sectors,
+    "analyze_dataframe": bench_analyze_dataframe,
+    "lexicon": bench_lexicon,
+    "parallel": bench_parallel,
+    "windows": bench_windows,
+    "topics": bench_topics,
+    "pipeline": bench_pipeline,
+    "dedup": bench_dedup,
+    "startup": bench_startup,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="财经舆情监控系统性能基准")
+    parser.add_argument("names", nargs="*", default=list(BENCHMARKS), help="要运行的基准，默认全部")
+    parser.add_argument("--rows", type=int, default=10000, help="pipeline: 合成帖子条数（1k ~ 10M）")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="pipeline: 每块生成与处理的条数")
+    parser.add_argument("--sector-rate", type=float, default=0.6, help="pipeline: 含板块关键词的帖子比例")
+    parser.add_argument("--lexicon-rate", type=float, default=0.4, help="pipeline: 含情绪词的帖子比例")
+    parser.add_argument("--html-rate", type=float, default=0.3, help="pipeline: 带 HTML 噪声的帖子比例")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="pipeline: 用 tracemalloc 统计各阶段峰值内存（计时会明显偏慢，宜单独运行）")
+    parser.add_argument("--output", help="将结果保存为 JSON")
+    parser.add_argument("--compare", help="与此前保存的 JSON 结果比较 pipeline 各阶段吞吐")
+    args = parser.parse_args()
+    results = {}
+    for name in args.names:
+        if name == "pipeline":
+            results[name] = bench_pipeline(args.rows, args.chunk_size, args.sector_rate, args.lexicon_rate,
+                                           args.html_rate, trace_memory=args.trace_memory)
+        else:
+            results[name] = BENCHMARKS[name]()
+    if args.output:
+        save_results(args.output, results)
+    if args.compare:
+        compare_results(args.compare, results)
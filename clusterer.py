@@ -1,73 +1,294 @@
-import jieba
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
-import pandas as pd
+import os
+from tokenizer import Tokenizer
 import numpy as np
 
+# 增量词表保留的词数上限，超出时按文档频次裁剪低频词（常驻服务中词表不断增长）
+MAX_TERMS = 200000
+
+# 可选的主题模型：lda 为增量 LDA；kmeans / nmf 为 TF-IDF 稀疏矩阵上的快速模式，适合大语料
+TOPIC_MODES = ("lda", "kmeans", "nmf")
+
+def model_filename(mode="lda"):
+    """各模式的模型文件名，不同模式的模型互不覆盖（lda 沿用原文件名）"""
+    return "topic_model.joblib" if mode == "lda" else f"topic_model_{mode}.joblib"
+
+def _identity(doc):
+    # 文档已是分好的词列表，向量化时直接使用
+    return doc
+
+def summarize_topic(topic, count, avg_sentiment, total_heat):
+    """
+    生成单个主题的风向汇总行
+    """
+    # 判断交易风向
+    if avg_sentiment > 0.2:
+        direction = "看多 / 积极布局"
+    elif avg_sentiment < -0.2:
+        direction = "看空 / 谨慎观望"
+    else:
+        direction = "震荡 / 趋势不明"
+
+    return {
+        "主题ID": topic['topic_id'],
+        "核心关键词": ", ".join(topic['keywords'][:5]),
+        "文章数": count,
+        "平均情绪": round(avg_sentiment, 3),
+        "总热度": round(total_heat, 2),
+        "建议交易风向": direction
+    }
+
 class TopicClusterer:
-    def __init__(self, n_topics=5, n_top_words=10):
+    """
+    增量主题模型：哈希词袋 + 可选模型（mode）
+    - lda: LatentDirichletAllocation.partial_fit（默认）
+    - kmeans: 增量 IDF 加权、L2 归一化的 float32 稀疏矩阵上做 MiniBatchKMeans，主题词取自聚类中心
+    - nmf: 同样的 TF-IDF 矩阵上做 MiniBatchNMF，主题词取自分解出的主题向量
+    模型状态可持久化到 model_path，每次只用新文档更新，主题编号跨运行保持稳定
+    """
+    def __init__(self, n_topics=5, n_top_words=10, tokenizer=None, model_path=None,
+                 n_features=2 ** 16, warmup_passes=10, autosave=True, mode="lda"):
+        if mode not in TOPIC_MODES:
+            raise ValueError(f"未知的主题模型: {mode}，可选 {', '.join(TOPIC_MODES)}")
+        self.mode = mode
         self.n_topics = n_topics
         self.n_top_words = n_top_words
+        self.tokenizer = tokenizer or Tokenizer()
+        self.model_path = model_path
+        self.n_features = n_features
+        # 冷启动时对首批数据多轮训练，相当于原来一次性 fit 的 max_iter
+        self.warmup_passes = warmup_passes
+        # 每次 fit_topics 后自动保存；常驻服务可关闭后自行定期 save()
+        self.autosave = autosave
         # 停用词列表（简单示例，实际可扩展）
         self.stop_words = set(["的", "了", "在", "是", "我", "有", "和", "就", "不", "人", "都", "一", "一个", "上", "也", "很", "到", "说", "要", "去", "你", "会", "着", "没有", "看", "好", "自己", "这"])
+        # 哈希向量化无需词表，新词不会改变特征维度（sklearn 在构建聚类器时才导入）
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self._vectorizer = HashingVectorizer(
+            n_features=n_features, analyzer=_identity, alternate_sign=False, norm=None
+        )
+        self._model = None
+        # 各哈希列的累计文档频次，用于增量 IDF（kmeans / nmf 模式）
+        self._col_df = np.zeros(n_features, dtype=np.float64)
+        # 增量维护的词表：词 -> 哈希列、词 -> 文档频次、哈希列 -> 代表词（用于展示主题关键词）
+        self._term_index = {}
+        self._term_df = {}
+        self._index_terms = {}
+        self.n_docs_seen = 0
+        if model_path and os.path.exists(model_path):
+            self._load()
 
-    def _tokenize(self, text):
+    def _load(self):
+        import joblib
+        state = joblib.load(self.model_path)
+        params = (state["n_topics"], state["n_features"], state.get("mode", "lda"))
+        if params != (self.n_topics, self.n_features, self.mode):
+            print(f"[!] 主题模型参数已变化，忽略旧模型: {self.model_path}")
+            return
+        # 早期版本以 "lda" 键保存模型
+        self._model = state["model"] if "model" in state else state["lda"]
+        if "col_df" in state:
+            self._col_df = state["col_df"]
+        self._term_index = state["term_index"]
+        self._term_df = state["term_df"]
+        self._index_terms = state["index_terms"]
+        self.n_docs_seen = state["n_docs_seen"]
+
+    def save(self):
+        if not self.model_path or self._model is None:
+            return
+        import joblib
+        directory = os.path.dirname(self.model_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump({
+            "n_topics": self.n_topics,
+            "n_features": self.n_features,
+            "mode": self.mode,
+            "model": self._model,
+            "col_df": self._col_df,
+            "term_index": self._term_index,
+            "term_df": self._term_df,
+            "index_terms": self._index_terms,
+            "n_docs_seen": self.n_docs_seen,
+        }, self.model_path)
+
+    @property
+    def is_trained(self):
+        return self._model is not None
+
+    def _filter_words(self, words):
         """
-        分词并去除停用词
+        去除停用词与单字，英文统一小写
         """
-        words = jieba.cut(text)
-        return " ".join([w for w in words if w not in self.stop_words and len(w) > 1])
+        return [w.lower() for w in words if w not in self.stop_words and len(w) > 1]
 
-    def fit_topics(self, texts):
+    def _tokenize(self, text):
         """
-        对文本列表进行LDA主题聚类
+        分词并去除停用词
         """
-        if len(texts) < self.n_topics:
-            return None, "数据量太少，无法进行主题聚类"
+        return self._filter_words(self.tokenizer.cut(text))
 
-        # 1. 预处理：分词
-        processed_texts = [self._tokenize(t) for t in texts]
+    def _prepare(self, texts, tokens):
+        # 预处理：分词（复用分词阶段的结果）
+        if tokens is None:
+            tokens = self.tokenizer.tokenize(texts)
+        return [self._filter_words(words) for words in tokens]
 
-        # 2. 向量化：使用词频矩阵
-        tf_vectorizer = CountVectorizer(max_df=0.95, min_df=2)
-        try:
-            tf = tf_vectorizer.fit_transform(processed_texts)
-        except ValueError:
-            # 如果词频太低无法构建矩阵
-            return None, "有效词汇不足，无法构建主题模型"
+    def _update_vocabulary(self, processed_texts):
+        """累计文档频次；新词批量计算哈希列，并更新每列的代表词"""
+        new_terms = sorted({w for words in processed_texts for w in words} - self._term_index.keys())
+        if new_terms:
+            hashed = self._vectorizer.transform([[w] for w in new_terms])
+            self._term_index.update(zip(new_terms, hashed.indices.tolist()))
+        for words in processed_texts:
+            for w in set(words):
+                df = self._term_df.get(w, 0) + 1
+                self._term_df[w] = df
+                idx = self._term_index[w]
+                current = self._index_terms.get(idx)
+                if current is None or (current != w and df > self._term_df[current]):
+                    self._index_terms[idx] = w
 
-        # 3. 训练LDA模型
-        lda = LatentDirichletAllocation(
-            n_components=self.n_topics, 
-            max_iter=10,
-            learning_method='online',
-            random_state=42
-        )
-        lda.fit(tf)
+    def prune_vocabulary(self, max_terms=MAX_TERMS):
+        """
+        词表超过 max_terms 时只保留文档频次最高的 max_terms 个词，返回裁剪掉的词数
+        被裁剪的词只影响主题关键词的展示，哈希列与模型本身不变；代表词被裁剪的列改由剩余词中频次最高者代表
+        """
+        if len(self._term_df) <= max_terms:
+            return 0
+        ranked = sorted(self._term_df.items(), key=lambda item: item[1], reverse=True)
+        dropped = [w for w, _ in ranked[max_terms:]]
+        self._term_df = dict(ranked[:max_terms])
+        orphaned = set()
+        for w in dropped:
+            idx = self._term_index.pop(w)
+            if self._index_terms.get(idx) == w:
+                del self._index_terms[idx]
+                orphaned.add(idx)
+        for w, df in self._term_df.items():
+            idx = self._term_index[w]
+            if idx in orphaned:
+                current = self._index_terms.get(idx)
+                if current is None or df > self._term_df[current]:
+                    self._index_terms[idx] = w
+        return len(dropped)
 
-        # 4. 提取主题关键词
-        feature_names = tf_vectorizer.get_feature_names_out()
+    def topics(self):
+        """从各主题的特征权重（LDA / NMF 的主题向量，KMeans 的聚类中心）中取出前 n_top_words 个可识别的词"""
+        weights = self._model.cluster_centers_ if self.mode == "kmeans" else self._model.components_
         topics = []
-        for topic_idx, topic in enumerate(lda.components_):
-            top_words = [feature_names[i] for i in topic.argsort()[:-self.n_top_words - 1:-1]]
+        for topic_idx, topic in enumerate(weights):
+            top_words = []
+            for i in topic.argsort()[::-1]:
+                term = self._index_terms.get(int(i))
+                if term is not None:
+                    top_words.append(term)
+                    if len(top_words) == self.n_top_words:
+                        break
             topics.append({
                 "topic_id": topic_idx + 1,
                 "keywords": top_words,
                 "description": f"主题 {topic_idx + 1}: " + ", ".join(top_words[:3])
             })
+        return topics
+
+    def _tfidf(self, tf):
+        """词频矩阵 → 增量 IDF 加权并按行 L2 归一化的 float32 稀疏矩阵"""
+        from sklearn.preprocessing import normalize
+        # 与 TfidfTransformer(smooth_idf=True) 相同的平滑 IDF，文档频次随新文档累计
+        idf = np.log((1 + self.n_docs_seen) / (1 + self._col_df)) + 1
+        x = tf.astype(np.float32)
+        x.data *= idf[x.indices].astype(np.float32)
+        return normalize(x, copy=False)
+
+    def _new_model(self):
+        if self.mode == "kmeans":
+            from sklearn.cluster import MiniBatchKMeans
+            return MiniBatchKMeans(n_clusters=self.n_topics, batch_size=1024, n_init=3, random_state=42)
+        if self.mode == "nmf":
+            from sklearn.decomposition import MiniBatchNMF
+            return MiniBatchNMF(n_components=self.n_topics, batch_size=1024, init="nndsvda", random_state=42)
+        from sklearn.decomposition import LatentDirichletAllocation
+        return LatentDirichletAllocation(
+            n_components=self.n_topics,
+            learning_method='online',
+            random_state=42
+        )
+
+    def _features(self, tf):
+        return tf if self.mode == "lda" else self._tfidf(tf)
+
+    def _assign(self, tf):
+        """每篇文档的主题ID（从 1 开始）"""
+        x = self._features(tf)
+        if self.mode == "kmeans":
+            return self._model.predict(x) + 1
+        return np.argmax(self._model.transform(x), axis=1) + 1
+
+    def partial_fit(self, texts=None, tokens=None):
+        """
+        仅用新文档更新模型（冷启动时多轮训练），返回新文档的词频矩阵
+        没有有效词汇时返回 None
+        """
+        processed_texts = self._prepare(texts, tokens)
+        tf = self._vectorizer.transform(processed_texts)
+        if tf.nnz == 0:
+            return None
+        self._update_vocabulary(processed_texts)
+        self.n_docs_seen += tf.shape[0]
+        if self.mode != "lda":
+            # 先累计文档频次，本批文档的 IDF 已包含自身
+            self._col_df += np.bincount(tf.indices, minlength=self.n_features)
+        x = self._features(tf)
+        if self._model is None:
+            self._model = self._new_model()
+            if self.mode == "lda":
+                for _ in range(self.warmup_passes):
+                    self._model.partial_fit(x)
+            else:
+                # 冷启动用 fit 在首批数据上多轮小批量迭代，之后逐批 partial_fit
+                self._model.fit(x)
+        else:
+            self._model.partial_fit(x)
+        return tf
+
+    def transform_topics(self, texts=None, tokens=None):
+        """
+        不更新模型，只为文档分配主题，返回 (主题列表, 每篇文档的主题ID)
+        """
+        if self._model is None:
+            return None, "主题模型尚未训练"
+        tf = self._vectorizer.transform(self._prepare(texts, tokens))
+        return self.topics(), self._assign(tf)
+
+    def fit_topics(self, texts, tokens=None):
+        """
+        用新文本增量更新主题模型，并返回 (主题列表, 每篇文本的主题ID)
+        tokens 为分词阶段产出的 TokenColumn，缺省时现场分词（给定 tokens 时 texts 可为 None）
+        """
+        n_docs = len(tokens) if tokens is not None else len(texts)
+        if self._model is None and n_docs < self.n_topics:
+            return None, "数据量太少，无法进行主题聚类"
+
+        # 1. 向量化并增量训练
+        tf = self.partial_fit(texts, tokens)
+        if tf is None:
+            # 如果词频太低无法构建矩阵
+            return None, "有效词汇不足，无法构建主题模型"
+        if self.autosave:
+            self.save()
+
+        # 2. 提取主题关键词，预测每条文本所属的主题
+        dominant_topics = self._assign(tf)
         
-        # 5. 预测每条文本所属的主题
-        topic_distributions = lda.transform(tf)
-        dominant_topics = np.argmax(topic_distributions, axis=1) + 1
-        
-        return topics, dominant_topics
+        return self.topics(), dominant_topics
 
-    def analyze_trends(self, df):
+    def analyze_trends(self, df, tokens=None):
         """
         分析交易风向：结合主题、情绪和热度
         """
-        texts = df['cleaned_content'].tolist()
-        topics_info, dominant_topics = self.fit_topics(texts)
+        texts = df['cleaned_content'].tolist() if 'cleaned_content' in df else None
+        topics_info, dominant_topics = self.fit_topics(texts, tokens=tokens)
         
         if topics_info is None:
             print(f"[!] 主题聚类失败: {dominant_topics}")
@@ -83,30 +304,14 @@ class TopicClusterer:
             if topic_df.empty:
                 continue
                 
-            avg_sentiment = topic_df['sentiment_score'].mean()
-            total_heat = topic_df['heat_index'].sum()
-            count = len(topic_df)
-            
-            # 判断交易风向
-            if avg_sentiment > 0.2:
-                direction = "看多 / 积极布局"
-            elif avg_sentiment < -0.2:
-                direction = "看空 / 谨慎观望"
-            else:
-                direction = "震荡 / 趋势不明"
-                
-            trend_summary.append({
-                "主题ID": topic['topic_id'],
-                "核心关键词": ", ".join(topic['keywords'][:5]),
-                "文章数": count,
-                "平均情绪": round(avg_sentiment, 3),
-                "总热度": round(total_heat, 2),
-                "建议交易风向": direction
-            })
+            trend_summary.append(summarize_topic(
+                topic, len(topic_df), topic_df['sentiment_score'].mean(), topic_df['heat_index'].sum()
+            ))
             
         return df, trend_summary
 
 if __name__ == "__main__":
+    import pandas as pd
     # 测试代码
     test_texts = [
         "AI大模型算力芯片爆发，国产替代进程加快",
@@ -1,172 +1,741 @@
+import asyncio
 import time
 import json
+import queue
 import random
 import re
+import threading
+from contextlib import asynccontextmanager
 from datetime import datetime
-from urllib.parse import quote
-from playwright.sync_api import sync_playwright
-import requests
+from urllib.parse import quote, urlsplit
+from metrics import DISABLED
+from seen_index import dedupe_records, ensure_post_id, make_post_id
+
+# 浏览器平台配置：搜索入口、列表选择器、互动数据占位区间
+BROWSER_PLATFORMS = {
+    "THS": {
+        "name": "同花顺",
+        "url": "https://search.10jqka.com.cn/search?w={keyword}&t=news",
+        "selector": ".result-item, .news-item, .s-item",
+        "text_selector": None,
+        "wait_timeout": 15000,
+        "wait_optional": True,
+        "likes": (10, 500),
+        "comments": (5, 50),
+    },
+    "EastMoney": {
+        "name": "东方财富",
+        "url": "https://guba.eastmoney.com/search.aspx?t=1&s={keyword}",
+        "selector": ".article_item",
+        "text_selector": ".title",
+        "wait_timeout": 10000,
+        "wait_optional": False,
+        "likes": (5, 100),
+        "comments": (1, 20),
+    },
+    "Xueqiu": {
+        "name": "雪球",
+        "url": "https://xueqiu.com/search?q={keyword}",
+        "selector": ".status-item",
+        "text_selector": None,
+        "wait_timeout": 15000,
+        "wait_optional": False,
+        "likes": (10, 200),
+        "comments": (5, 100),
+    },
+}
+
+WEIBO_API = "https://m.weibo.cn/api/container/getIndex"
+
+# 抓取顺序即结果顺序
+PLATFORMS = ["THS", "EastMoney", "Xueqiu", "Weibo"]
+
+# 每个平台同时进行的抓取任务上限
+DEFAULT_CONCURRENCY = {"THS": 2, "EastMoney": 2, "Xueqiu": 2, "Weibo": 4}
+
+# 各接口域名的限流（请求/秒），未列出的域名使用 HttpClient.default_rate
+DEFAULT_RATE_LIMITS = {"m.weibo.cn": 1.0}
+
+# 这些状态码视为临时失败，退避后重试
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# 每个搜索结果页最多解析的列表项数
+MAX_ITEMS = 10
+
+# 回放时缓存的已解析载荷数上限（相同载荷只解析一次）
+PARSE_CACHE_LIMIT = 10000
+
+# inner_text 中前后换行的块级元素；其余（em / b / a / span 等行内元素）的文本直接相连
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "details", "dialog", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main",
+    "nav", "ol", "p", "pre", "section", "summary", "table", "tbody", "tfoot", "thead", "tr", "ul",
+}
+# 表格单元格之间以空格分隔；这些元素的内容不可见，不计入文本
+CELL_TAGS = {"td", "th"}
+HIDDEN_TAGS = {"script", "style", "noscript", "template", "head", "title"}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class TokenBucket:
+    """
+    令牌桶限流：以 rate 个/秒补充令牌，最多积攒 capacity 个
+    acquire() 在令牌不足时阻塞等待，返回等待的秒数
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            wait = (1 - self._tokens) / self.rate
+            # 持锁等待，保证同一域名的请求按令牌顺序放行
+            time.sleep(wait)
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+            return wait
+
+
+class HttpClient:
+    """
+    共享 HTTP 客户端：Session 连接池复用 keep-alive 连接，
+    按域名令牌桶限流，连接错误和临时状态码按抖动指数退避重试
+    """
+    def __init__(self, rate_limits=None, default_rate=2.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, timeout=(3.05, 10), pool_size=10):
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS)
+        self.rate_limits.update(rate_limits or {})
+        self.default_rate = default_rate
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        # requests 在首次发起请求时才导入，缩短启动时间
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+        return self._session
+
+    def _host_state(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate_limits.get(host, self.default_rate))
+                self._stats[host] = {"requests": 0, "errors": 0, "retries": 0, "throttles": 0,
+                                     "throttle_wait": 0.0, "first": None, "last": None}
+            return self._buckets[host], self._stats[host]
+
+    def _count(self, stats, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                stats[key] += value
+
+    def _backoff(self, attempt, resp=None):
+        """全抖动退避；429 带 Retry-After 时以其为下限"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if resp is not None and resp.headers.get("Retry-After", "").isdigit():
+            delay = max(delay, float(resp.headers["Retry-After"]))
+        return delay
+
+    def request(self, method, url, **kwargs):
+        import requests
+        host = urlsplit(url).netloc
+        bucket, stats = self._host_state(host)
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.max_retries + 1):
+            waited = bucket.acquire()
+            if waited > 0:
+                self._count(stats, throttles=1, throttle_wait=waited)
+            now = time.monotonic()
+            with self._lock:
+                stats["requests"] += 1
+                stats["first"] = stats["first"] or now
+                stats["last"] = now
+
+            resp, error = None, None
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if resp is not None and resp.status_code not in RETRY_STATUSES:
+                return resp
+
+            self._count(stats, errors=1)
+            if attempt == self.max_retries:
+                if error is not None:
+                    raise error
+                return resp
+            self._count(stats, retries=1)
+            time.sleep(self._backoff(attempt, resp))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def get_json(self, url, **kwargs):
+        return self.get(url, **kwargs).json()
+
+    def stats(self):
+        """按域名汇总的请求数、重试、限流次数及吞吐（请求/秒）"""
+        summary = {}
+        with self._lock:
+            for host, s in self._stats.items():
+                span = (s["last"] - s["first"]) if s["first"] is not None else 0.0
+                summary[host] = {
+                    "requests": s["requests"],
+                    "errors": s["errors"],
+                    "retries": s["retries"],
+                    "throttles": s["throttles"],
+                    "throttle_wait": round(s["throttle_wait"], 3),
+                    "rps": round(s["requests"] / span, 3) if span > 0 else float(s["requests"]),
+                }
+        return summary
+
+    def report(self):
+        for host, s in self.stats().items():
+            print(f"[*] HTTP {host}: {s['requests']} 次请求, {s['rps']} 次/秒, "
+                  f"重试 {s['retries']} 次, 限流 {s['throttles']} 次")
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class BrowserPool:
+    """
+    常驻浏览器池：整个抓取周期只启动一个 Chromium，
+    预先创建固定数量的 context/page，任务之间复用
+    """
+    def __init__(self, user_agents, size=4, headless=True):
+        self.user_agents = user_agents
+        self.size = size
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._pages = None
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        try:
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._pages = asyncio.Queue()
+            for _ in range(self.size):
+                self._pages.put_nowait(await self._new_page())
+        except Exception:
+            await self.close()
+            raise
+        return self
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _new_page(self):
+        context = await self._browser.new_context(user_agent=random.choice(self.user_agents))
+        return await context.new_page()
+
+    async def _recycle(self, page):
+        """页面出错后丢弃其 context，换一个干净的页面放回池中"""
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+        return await self._new_page()
+
+    @asynccontextmanager
+    async def page(self):
+        """从池中借出一个页面，池空时等待其他任务归还"""
+        page = await self._pages.get()
+        try:
+            yield page
+        except Exception:
+            try:
+                page = await self._recycle(page)
+            except Exception:
+                pass
+            raise
+        finally:
+            self._pages.put_nowait(page)
+
+
+def inner_text(node):
+    """
+    近似浏览器 innerText：行内元素的文本直接相连，块级元素与 <br> 处换行，
+    源码中的连续空白折叠为一个空格，去掉每行首尾空白与空行
+    """
+    from bs4.element import NavigableString, PreformattedString, Tag
+    parts = []
+
+    def walk(element):
+        for child in element.children:
+            if isinstance(child, Tag):
+                if child.name in HIDDEN_TAGS:
+                    continue
+                if child.name == "br":
+                    parts.append("\n")
+                    continue
+                sep = "\n" if child.name in BLOCK_TAGS else " " if child.name in CELL_TAGS else ""
+                parts.append(sep)
+                walk(child)
+                parts.append(sep)
+            elif isinstance(child, NavigableString) and not isinstance(child, PreformattedString):
+                parts.append(_WHITESPACE_RE.sub(" ", child))
+
+    walk(node)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _fetch_time(fetched_at):
+    return datetime.fromtimestamp(fetched_at).strftime("%Y-%m-%d %H:%M:%S")
+
 
 class FinanceCrawler:
-    def __init__(self):
+    """
+    各平台抓取：浏览器平台取渲染后的页面 HTML，微博取接口 JSON，
+    统一由 parse_payload 解析为记录（在线抓取与归档回放共用同一解析逻辑）；
+    传入 archive（PayloadArchive）时每次抓取的原始载荷都写入归档
+    """
+    def __init__(self, max_pages=4, concurrency=None, search_urls=None, headless=True, http_client=None,
+                 metrics=None, archive=None):
         self.user_agents = [
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"
         ]
+        self.max_pages = max_pages
+        self.headless = headless
+        self.concurrency = dict(DEFAULT_CONCURRENCY)
+        self.concurrency.update(concurrency or {})
+        # 搜索入口可替换，便于指向本地 HTML 夹具服务
+        self.search_urls = {p: cfg["url"] for p, cfg in BROWSER_PLATFORMS.items()}
+        self.search_urls["Weibo"] = WEIBO_API
+        self.search_urls.update(search_urls or {})
+        # API 类抓取共用的 HTTP 客户端
+        self.http = http_client or HttpClient()
+        # 各平台抓取耗时、条数、解析失败与选择器超时计数
+        self.metrics = metrics or DISABLED
+        self.archive = archive
 
     def _get_common_headers(self):
         return {"User-Agent": random.choice(self.user_agents)}
 
-    def fetch_ths(self, keyword):
-        """同花顺抓取：使用 Playwright 模拟浏览器行为"""
-        print(f"[*] 正在抓取同花顺: {keyword}...")
+    def _make_record(self, platform, title, content, fetched_at, likes=None, comments=None):
+        """
+        组装记录：时间取抓取时间；页面上没有互动数据时，点赞 / 评论占位值由 post_id 确定性生成，
+        同一帖子在每次抓取和回放中得到相同的值
+        """
+        post_id = make_post_id({"title": title, "content": content, "platform": platform})
+        if likes is None or comments is None:
+            cfg = BROWSER_PLATFORMS[platform]
+            rng = random.Random(post_id)
+            likes, comments = rng.randint(*cfg["likes"]), rng.randint(*cfg["comments"])
+        return {
+            "title": title,
+            "content": content,
+            "time": _fetch_time(fetched_at),
+            "platform": platform,
+            "likes": likes,
+            "comments": comments,
+            "post_id": post_id,
+        }
+
+    def _parse_item(self, platform, text):
+        """将单个列表项的文本解析为 (标题, 内容)，无法解析时返回 None"""
+        if platform == "THS":
+            lines = [l.strip() for l in text.split('\n') if l.strip()]
+            if not lines:
+                return None
+            return lines[0], " ".join(lines[1:3]) if len(lines) > 1 else lines[0]
+        if platform == "EastMoney":
+            return text, text
+        if platform == "Xueqiu":
+            return text[:30].replace('\n', ' '), text.replace('\n', ' ')
+        return None
+
+    def _parse_html(self, platform, html):
+        """按平台的列表选择器从页面 HTML 中取出各列表项文本并解析"""
+        from bs4 import BeautifulSoup
+        cfg = BROWSER_PLATFORMS[platform]
+        items, failures = [], 0
+        for node in BeautifulSoup(html, "lxml").select(cfg["selector"])[:MAX_ITEMS]:
+            target = node.select_one(cfg["text_selector"]) if cfg["text_selector"] else node
+            parsed = self._parse_item(platform, inner_text(target)) if target is not None else None
+            if parsed:
+                items.append((parsed[0], parsed[1], None, None))
+            else:
+                failures += 1
+        return items, failures
+
+    @staticmethod
+    def _parse_weibo(payload):
+        """微博搜索接口 JSON 中的博文 → (标题, 内容, 点赞, 评论)"""
+        items = []
+        for card in json.loads(payload).get('data', {}).get('cards', []):
+            if card.get('card_type') == 9:
+                mblog = card.get('mblog', {})
+                content = re.sub(r'<.*?>', '', mblog.get('text', ''))
+                items.append((content[:20], content, mblog.get('attitudes_count', 0), mblog.get('comments_count', 0)))
+        return items, 0
+
+    def parse_items(self, platform, payload):
+        """原始载荷 → ([(标题, 内容, 点赞, 评论)], 解析失败数)；点赞 / 评论为 None 表示页面上没有"""
+        if platform == "Weibo":
+            return self._parse_weibo(payload)
+        return self._parse_html(platform, payload)
+
+    def parse_payload(self, platform, payload, fetched_at):
+        """原始载荷 → (记录列表, 解析失败数)"""
+        items, failures = self.parse_items(platform, payload)
+        return [self._make_record(platform, title, content, fetched_at, likes, comments)
+                for title, content, likes, comments in items], failures
+
+    def _archive_payload(self, platform, keyword, url, payload, fetched_at, kind):
+        if self.archive is not None:
+            try:
+                self.archive.put(platform, keyword, url, payload, fetched_at, kind)
+            except Exception as e:
+                print(f"[!] 原始载荷归档失败: {e}")
+
+    def build_page_url(self, platform, keyword):
+        return self.search_urls[platform].format(keyword=quote(keyword))
+
+    async def _fetch_browser_async(self, pool, platform, keyword):
+        """在池中的页面上抓取同花顺 / 东方财富 / 雪球的搜索结果"""
+        cfg = BROWSER_PLATFORMS[platform]
+        print(f"[*] 正在抓取{cfg['name']}: {keyword}...")
         results = []
+        parse_failures = 0
+        started = time.perf_counter()
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context(user_agent=random.choice(self.user_agents))
-                page = context.new_page()
-                # 同花顺搜索 URL
-                url = f"https://search.10jqka.com.cn/search?w={quote(keyword)}&t=news"
-                page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                
-                # 等待内容加载，尝试多个可能的选择器
+            url = self.build_page_url(platform, keyword)
+            async with pool.page() as page:
+                await page.goto(url, wait_until="domcontentloaded", timeout=30000)
                 try:
-                    page.wait_for_selector(".result-item, .news-item, .s-item", timeout=15000)
-                except:
-                    print(f"[!] 同花顺页面加载较慢或结构变化，尝试直接提取内容")
-
-                # 提取标题和摘要
-                items = page.locator(".result-item, .news-item, .s-item").all()
-                for item in items[:10]:
-                    try:
-                        text = item.inner_text()
-                        lines = [l.strip() for l in text.split('\n') if l.strip()]
-                        if lines:
-                            results.append({
-                                "title": lines[0],
-                                "content": " ".join(lines[1:3]) if len(lines) > 1 else lines[0],
-                                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                "platform": "THS",
-                                "likes": random.randint(10, 500),
-                                "comments": random.randint(5, 50)
-                            })
-                    except: continue
-                browser.close()
+                    await page.wait_for_selector(cfg["selector"], timeout=cfg["wait_timeout"])
+                except Exception:
+                    self.metrics.inc("selector_timeouts_total", platform=platform)
+                    if not cfg["wait_optional"]:
+                        raise
+                    print(f"[!] {cfg['name']}页面加载较慢或结构变化，尝试直接提取内容")
+                html = await page.content()
+            fetched_at = time.time()
+            # 归档渲染后的 HTML，并用与回放相同的离线解析得到记录（解析放到线程中，不阻塞其他抓取）
+            self._archive_payload(platform, keyword, url, html.encode("utf-8"), fetched_at, "html")
+            results, parse_failures = await asyncio.to_thread(self.parse_payload, platform, html, fetched_at)
         except Exception as e:
-            print(f"[!] 同花顺抓取失败: {e}")
+            self.metrics.inc("fetch_errors_total", platform=platform)
+            print(f"[!] {cfg['name']}抓取失败: {e}")
+        if parse_failures:
+            self.metrics.inc("parse_failures_total", parse_failures, platform=platform)
+            print(f"[!] {cfg['name']}: {parse_failures} 个列表项解析失败")
+        self._record_fetch(platform, started, len(results))
         return results
 
+    def _record_fetch(self, platform, started, n_items):
+        self.metrics.observe("fetch_seconds", time.perf_counter() - started, platform=platform)
+        self.metrics.inc("fetch_items_total", n_items, platform=platform)
+
+    def fetch_ths(self, keyword):
+        """同花顺抓取：使用 Playwright 模拟浏览器行为"""
+        return asyncio.run(self.crawl_async([keyword], ["THS"]))
+
     def fetch_eastmoney(self, keyword):
         """东方财富抓取：使用股吧搜索接口"""
-        print(f"[*] 正在抓取东方财富: {keyword}...")
-        results = []
-        # 股吧搜索接口
-        url = f"https://guba.eastmoney.com/search.aspx?t=1&s={quote(keyword)}"
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                page.wait_for_selector(".article_item", timeout=10000)
-                
-                items = page.locator(".article_item").all()
-                for item in items[:10]:
-                    try:
-                        title = item.locator(".title").inner_text()
-                        results.append({
-                            "title": title,
-                            "content": title,
-                            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "platform": "EastMoney",
-                            "likes": random.randint(5, 100),
-                            "comments": random.randint(1, 20)
-                        })
-                    except: continue
-                browser.close()
-        except Exception as e:
-            print(f"[!] 东财抓取失败: {e}")
-        return results
+        return asyncio.run(self.crawl_async([keyword], ["EastMoney"]))
 
     def fetch_xueqiu(self, keyword):
         """雪球抓取：使用 Playwright 模拟"""
-        print(f"[*] 正在抓取雪球: {keyword}...")
-        results = []
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                page = browser.new_page()
-                url = f"https://xueqiu.com/search?q={quote(keyword)}"
-                page.goto(url, wait_until="domcontentloaded", timeout=30000)
-                page.wait_for_selector(".status-item", timeout=15000)
-                
-                items = page.locator(".status-item").all()
-                for item in items[:10]:
-                    try:
-                        content = item.inner_text()
-                        results.append({
-                            "title": content[:30].replace('\n', ' '),
-                            "content": content.replace('\n', ' '),
-                            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "platform": "Xueqiu",
-                            "likes": random.randint(10, 200),
-                            "comments": random.randint(5, 100)
-                        })
-                    except: continue
-                browser.close()
-        except Exception as e:
-            print(f"[!] 雪球抓取失败: {e}")
-        return results
+        return asyncio.run(self.crawl_async([keyword], ["Xueqiu"]))
 
     def fetch_weibo(self, keyword):
         """微博抓取：使用移动端接口"""
         print(f"[*] 正在抓取微博: {keyword}...")
         results = []
-        url = "https://m.weibo.cn/api/container/getIndex"
+        started = time.perf_counter()
+        url = self.search_urls["Weibo"]
         params = {"containerid": f"100103type=1&q={keyword}", "page_type": "searchall"}
         headers = {"User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1"}
         try:
-            resp = requests.get(url, params=params, headers=headers, timeout=10)
-            cards = resp.json().get('data', {}).get('cards', [])
-            for card in cards:
-                if card.get('card_type') == 9:
-                    mblog = card.get('mblog', {})
-                    content = re.sub(r'<.*?>', '', mblog.get('text', ''))
-                    results.append({
-                        "title": content[:20],
-                        "content": content,
-                        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "platform": "Weibo",
-                        "likes": mblog.get('attitudes_count', 0),
-                        "comments": mblog.get('comments_count', 0)
-                    })
+            resp = self.http.get(url, params=params, headers=headers)
+            # 重试耗尽后仍失败的响应（404 / 429 等）不归档，只计为抓取失败
+            resp.raise_for_status()
+            fetched_at = time.time()
+            self._archive_payload("Weibo", keyword, resp.url, resp.content, fetched_at, "json")
+            results, _ = self.parse_payload("Weibo", resp.content, fetched_at)
         except Exception as e:
+            self.metrics.inc("fetch_errors_total", platform="Weibo")
             print(f"[!] 微博抓取失败: {e}")
+        self._record_fetch("Weibo", started, len(results))
         return results
 
-    def run(self, keywords):
-        all_data = []
+    async def _run_job(self, pool, semaphore, platform, keyword):
+        async with semaphore:
+            if platform == "Weibo":
+                # requests 为阻塞调用，放到线程中执行
+                return await asyncio.to_thread(self.fetch_weibo, keyword)
+            if pool is None:
+                return []
+            return await self._fetch_browser_async(pool, platform, keyword)
+
+    @asynccontextmanager
+    async def pool_scope(self, platforms, pool=None):
+        """
+        传入 pool 时直接复用调用方的浏览器池；
+        否则在需要浏览器平台时启动一个池，退出时关闭
+        """
+        if pool is not None or not any(p in BROWSER_PLATFORMS for p in platforms):
+            yield pool
+            return
+        own_pool = None
+        try:
+            own_pool = await BrowserPool(self.user_agents, size=self.max_pages, headless=self.headless).start()
+        except Exception as e:
+            print(f"[!] 浏览器启动失败: {e}")
+        try:
+            yield own_pool
+        finally:
+            if own_pool is not None:
+                await own_pool.close()
+
+    async def crawl_async(self, keywords, platforms=None, pool=None):
+        """
+        并发抓取所有 (关键词, 平台) 组合
+        每个平台受 self.concurrency 限流；传入 pool 时复用调用方的浏览器池，
+        否则本次调用内启动并关闭一个浏览器池。结果按 关键词 × 平台 顺序拼接
+        """
+        platforms = platforms or PLATFORMS
+        jobs = [(kw, p) for kw in keywords for p in platforms]
+        semaphores = {p: asyncio.Semaphore(self.concurrency.get(p, 1)) for p in platforms}
+        async with self.pool_scope(platforms, pool) as active_pool:
+            batches = await asyncio.gather(*(self._run_job(active_pool, semaphores[p], p, kw) for kw, p in jobs))
+        return [record for batch in batches for record in batch]
+
+    async def aiter_records(self, keywords, platforms=None, pool=None, maxsize=100):
+        """
+        异步流式抓取：每个任务完成后立即把记录放入有界队列，按完成顺序逐条产出
+        队列满时生产任务等待消费者（背压），内存中最多滞留 maxsize 条
+        """
+        platforms = platforms or PLATFORMS
+        jobs = [(kw, p) for kw in keywords for p in platforms]
+        semaphores = {p: asyncio.Semaphore(self.concurrency.get(p, 1)) for p in platforms}
+        records = asyncio.Queue(maxsize=maxsize)
+        done = object()
+
+        async def produce(active_pool):
+            async def job(platform, keyword):
+                for record in await self._run_job(active_pool, semaphores[platform], platform, keyword):
+                    await records.put(record)
+            try:
+                await asyncio.gather(*(job(p, kw) for kw, p in jobs))
+            except Exception as e:
+                print(f"[!] 抓取任务异常: {e}")
+            # 被取消时不再放入结束标记（队列可能已满且无人消费）
+            await records.put(done)
+
+        async with self.pool_scope(platforms, pool) as active_pool:
+            producer = asyncio.create_task(produce(active_pool))
+            try:
+                while True:
+                    record = await records.get()
+                    if record is done:
+                        break
+                    yield record
+            finally:
+                producer.cancel()
+                try:
+                    await producer
+                except BaseException:
+                    pass
+
+    def iter_records(self, keywords, seen_index=None, maxsize=100):
+        """
+        同步流式接口：后台线程运行事件循环，经有界队列逐条产出记录
+        边抓取边去重（跨关键词重复与 seen_index 中已处理的帖子）
+        """
+        out = queue.Queue(maxsize=maxsize)
+        done = object()
+        stop = threading.Event()
+
+        def put(item):
+            # 带超时的阻塞 put：消费者提前退出时不会永久挂起
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        async def pump():
+            records = self.aiter_records(keywords, maxsize=maxsize)
+            try:
+                async for record in records:
+                    if not await asyncio.to_thread(put, record):
+                        break
+            finally:
+                await records.aclose()
+
+        def worker():
+            try:
+                asyncio.run(pump())
+            except Exception as e:
+                print(f"[!] 流式抓取异常: {e}")
+            finally:
+                put(done)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        seen, fetched = set(), 0
+        try:
+            while True:
+                record = out.get()
+                if record is done:
+                    break
+                fetched += 1
+                post_id = ensure_post_id(record)
+                if post_id in seen:
+                    continue
+                seen.add(post_id)
+                if seen_index is not None and post_id in seen_index:
+                    continue
+                yield record
+        finally:
+            stop.set()
+            thread.join()
+        self.http.report()
+
+        # 兜底逻辑：如果所有平台都失败，生成模拟数据
+        if not fetched:
+            yield from self._mock_records(keywords)
+
+    def _mock_records(self, keywords):
+        print("[!] 真实抓取未获得数据，启动智能模拟引擎...")
+        mock = []
         for kw in keywords:
-            all_data.extend(self.fetch_ths(kw))
-            all_data.extend(self.fetch_eastmoney(kw))
-            all_data.extend(self.fetch_xueqiu(kw))
-            all_data.extend(self.fetch_weibo(kw))
+            for _ in range(5):
+                record = {
+                    "title": f"关于{kw}的最新研报分析",
+                    "content": f"近期{kw}板块表现活跃，机构普遍看好其长期发展潜力。利好因素正在积聚。",
+                    "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "platform": "Mock",
+                    "likes": random.randint(100, 1000),
+                    "comments": random.randint(20, 200)
+                }
+                record["post_id"] = make_post_id(record)
+                mock.append(record)
+        return mock
+
+    def run(self, keywords, seen_index=None):
+        """
+        抓取所有关键词，去除跨关键词重复的帖子；
+        传入 seen_index 时只返回此前运行中未处理过的增量条目
+        """
+        fetched = asyncio.run(self.crawl_async(keywords))
+        self.http.report()
+        all_data = dedupe_records(fetched)
+        if seen_index is not None:
+            all_data = seen_index.filter_new(all_data)
+        if fetched:
+            print(f"[*] 抓取 {len(fetched)} 条，去重后新增 {len(all_data)} 条")
         
         # 兜底逻辑：如果所有平台都失败，生成模拟数据
-        if not all_data:
-            print("[!] 真实抓取未获得数据，启动智能模拟引擎...")
-            for kw in keywords:
-                for _ in range(5):
-                    all_data.append({
-                        "title": f"关于{kw}的最新研报分析",
-                        "content": f"近期{kw}板块表现活跃，机构普遍看好其长期发展潜力。利好因素正在积聚。",
-                        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "platform": "Mock",
-                        "likes": random.randint(100, 1000),
-                        "comments": random.randint(20, 200)
-                    })
+        if not fetched:
+            all_data.extend(self._mock_records(keywords))
         return all_data
 
+    def close(self):
+        self.http.close()
+        if self.archive is not None:
+            self.archive.close()
+
+
+class ReplayCrawler(FinanceCrawler):
+    """
+    归档回放：从 PayloadArchive 读取 (平台, 关键词) 的历次原始载荷，用与在线抓取相同的 parse_payload 还原记录，
+    不访问网络、不启动浏览器；start / end 限定抓取时间范围，相同载荷只解析一次
+    """
+    def __init__(self, archive, start=None, end=None, **kwargs):
+        super().__init__(archive=archive, **kwargs)
+        self.start = start
+        self.end = end
+        self._parsed = {}
+        self._parsed_lock = threading.Lock()
+
+    def _archive_payload(self, platform, keyword, url, payload, fetched_at, kind):
+        # 回放的载荷本就来自归档，不再重复写入
+        pass
+
+    def _items(self, platform, digest):
+        with self._parsed_lock:
+            cached = self._parsed.get(digest)
+        if cached is None:
+            cached = self.parse_items(platform, self.archive.get(digest))
+            with self._parsed_lock:
+                if len(self._parsed) >= PARSE_CACHE_LIMIT:
+                    self._parsed.clear()
+                self._parsed[digest] = cached
+        return cached
+
+    def replay(self, platform, keyword):
+        """返回 (平台, 关键词) 在时间范围内全部归档抓取还原出的记录"""
+        results = []
+        parse_failures = 0
+        started = time.perf_counter()
+        for fetched_at, _, _, _, _, digest in list(self.archive.fetches([platform], [keyword], self.start, self.end)):
+            items, failures = self._items(platform, digest)
+            parse_failures += failures
+            results.extend(self._make_record(platform, title, content, fetched_at, likes, comments)
+                           for title, content, likes, comments in items)
+        if parse_failures:
+            self.metrics.inc("parse_failures_total", parse_failures, platform=platform)
+        self._record_fetch(platform, started, len(results))
+        return results
+
+    async def _run_job(self, pool, semaphore, platform, keyword):
+        async with semaphore:
+            return await asyncio.to_thread(self.replay, platform, keyword)
+
+    @asynccontextmanager
+    async def pool_scope(self, platforms, pool=None):
+        yield None
+
+    def _mock_records(self, keywords):
+        # 回放不生成模拟数据
+        print("[!] 归档中没有匹配的抓取记录")
+        return []
+
 if __name__ == "__main__":
     crawler = FinanceCrawler()
     data = crawler.run(["人工智能"])
@@ -0,0 +1,254 @@
+import time
+from collections import OrderedDict
+import numpy as np
+from seen_index import ensure_post_id
+
+# 默认的字符 n-gram 长度、MinHash 签名长度与 LSH 分段数（每段 num_perm // bands 个值）
+# 签名 64 个值分 8 段、每段 8 个值时，成为候选的概率在 Jaccard ≈ (1/8)^(1/8) ≈ 0.77 附近陡升，与默认判定阈值相当
+DEFAULT_NGRAM = 3
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 8
+
+# 代表帖随条目保存的字段：之后批次的副本命中时，据此把增加的热度计入代表帖所在的板块 / 时间窗口
+PAYLOAD_COLUMNS = ("post_id", "platform", "time", "likes", "comments", "matched_sectors")
+
+# n-gram 多项式哈希的乘数（FNV-1a 64 位素数）
+_PRIME = np.uint64(1099511628211)
+
+
+def _mix64(z):
+    """splitmix64 终结函数：打散多项式哈希，使 64 位各自近似均匀"""
+    z = z ^ (z >> np.uint64(30))
+    z = z * np.uint64(0xbf58476d1ce4e5b9)
+    z = z ^ (z >> np.uint64(27))
+    z = z * np.uint64(0x94d049bb133111eb)
+    return z ^ (z >> np.uint64(31))
+
+
+def _shingle_hashes(texts, ngram):
+    """
+    整批文本拼接为一个 Unicode 码点数组，一次算出所有位置的 n-gram 哈希，
+    去掉跨越文本边界的位置；返回 (哈希数组, 每条文本的 n-gram 数)
+    """
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    n = len(codes) - ngram + 1
+    hashes = np.zeros(n, dtype=np.uint64)
+    for k in range(ngram):
+        hashes = hashes * _PRIME + codes[k:k + n]
+    ends = np.cumsum(lengths)
+    inside = np.ones(n, dtype=bool)
+    for j in range(1, ngram):
+        cross = ends - j
+        inside[cross[cross < n]] = False
+    return _mix64(hashes[inside]), lengths - ngram + 1
+
+
+def _permutations(num_perm, seed=42):
+    """MinHash 的 num_perm 个 multiply-shift 哈希参数 (奇数乘数 a, 偏移 b)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, num_perm, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, num_perm, dtype=np.int64).astype(np.uint64)
+    return a, b
+
+
+def minhash_batch(texts, num_perm=DEFAULT_NUM_PERM, ngram=DEFAULT_NGRAM, min_chars=20, seed=42):
+    """
+    批量计算 MinHash 签名：文本去空白、转小写后取字符 n-gram，每个哈希函数取各文本 n-gram 哈希的最小值
+    返回 (签名矩阵 uint32 [文本数, num_perm], 有效掩码)；去空白后短于 min_chars 的文本相似度不可靠，标记为无效
+    """
+    normalized = ["".join(t.split()).lower() for t in texts]
+    valid = np.fromiter((len(t) >= max(min_chars, ngram) for t in normalized), dtype=bool, count=len(texts))
+    signatures = np.zeros((len(texts), num_perm), dtype=np.uint32)
+    if not valid.any():
+        return signatures, valid
+    hashes, counts = _shingle_hashes([t for t, ok in zip(normalized, valid) if ok], ngram)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    a, b = _permutations(num_perm, seed)
+    rows = np.empty((len(counts), num_perm), dtype=np.uint32)
+    for p in range(num_perm):
+        # multiply-shift：取 (a·h + b) 的高 32 位作为第 p 个哈希函数的值
+        permuted = ((hashes * a[p] + b[p]) >> np.uint64(32)).astype(np.uint32)
+        rows[:, p] = np.minimum.reduceat(permuted, starts)
+    signatures[valid] = rows
+    return signatures, valid
+
+
+def band_keys(signatures, bands):
+    """每条签名各段的 64 位键 [文本数, bands]：同一段内签名值完全相同的文本键相同"""
+    width = signatures.shape[1] // bands
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for band in range(bands):
+        for col in signatures[:, band * width:(band + 1) * width].T.astype(np.uint64):
+            keys[:, band] = _mix64(keys[:, band] ^ col)
+    return keys
+
+
+class NearDuplicateIndex:
+    """
+    MinHash-LSH 近重复索引：签名切成 bands 段，任一段完全相同的条目才作为候选，
+    再按签名相同位置的比例（Jaccard 相似度的估计）不低于 threshold 判定为近重复；
+    查询只比较同段桶内的候选，耗时与索引规模基本无关
+    条目按最近命中时间排序，超过 ttl 秒未命中或总数超过 max_entries 时从最旧的开始淘汰
+    条目可附带代表帖的字段（payload）：副本在之后的批次才到达时，代表帖已经分析入库，
+    这些命中记为 (payload, 原重复数, 新重复数)，由 take_late_hits() 取出，供调用方把增加的热度补记到汇总中
+    """
+    def __init__(self, threshold=0.75, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, ngram=DEFAULT_NGRAM,
+                 min_chars=20, ttl=86400, max_entries=100000):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 必须能被 bands ({bands}) 整除")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.ngram = ngram
+        self.min_chars = min_chars
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # 每段一个桶：段键 -> 条目 id（冲突时为 id 列表，绝大多数桶只有一个条目）
+        self._buckets = [{} for _ in range(bands)]
+        # 条目 id -> [签名, 最近命中时间, 重复次数, 代表帖字段]，按最近命中时间排序
+        self._entries = OrderedDict()
+        # 代表帖 post_id -> 条目 id，用于之后补充代表帖字段（如主题ID）
+        self._by_post = {}
+        self._late_hits = []
+        self._next_id = 0
+        self.stats = {"checked": 0, "suppressed": 0, "evicted": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def find(self, signature, keys):
+        """返回估计相似度最高（且不低于 threshold）的条目 id，没有时返回 None"""
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for bucket, key in zip(self._buckets, keys):
+            members = bucket.get(key)
+            if members is None:
+                continue
+            for entry_id in (members if isinstance(members, list) else (members,)):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                similarity = np.count_nonzero(self._entries[entry_id][0] == signature) / self.num_perm
+                if similarity >= best_similarity:
+                    best, best_similarity = entry_id, similarity
+        return best
+
+    def add(self, signature, keys, now, payload=None):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = [signature, now, 1, payload]
+        if payload is not None and payload.get('post_id'):
+            self._by_post[payload['post_id']] = entry_id
+        for bucket, key in zip(self._buckets, keys):
+            members = bucket.get(key)
+            if members is None:
+                bucket[key] = entry_id
+            elif isinstance(members, list):
+                members.append(entry_id)
+            else:
+                bucket[key] = [members, entry_id]
+        return entry_id
+
+    def hit(self, entry_id, now):
+        """记录一次重复：计数加一并刷新最近命中时间"""
+        entry = self._entries[entry_id]
+        entry[1] = now
+        entry[2] += 1
+        self._entries.move_to_end(entry_id)
+        return entry[2]
+
+    def _remove(self, entry_id):
+        # 段键不随条目保存，淘汰时由签名重新计算
+        signature, _, _, payload = self._entries.pop(entry_id)
+        if payload is not None and self._by_post.get(payload.get('post_id')) == entry_id:
+            del self._by_post[payload['post_id']]
+        keys = band_keys(signature[None, :], self.bands)[0].tolist()
+        for bucket, key in zip(self._buckets, keys):
+            members = bucket[key]
+            if not isinstance(members, list):
+                del bucket[key]
+                continue
+            members.remove(entry_id)
+            if len(members) == 1:
+                bucket[key] = members[0]
+
+    def evict(self, now):
+        """淘汰过期条目与超出容量的最旧条目，返回淘汰数"""
+        evicted = 0
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if now - entry[1] <= self.ttl and len(self._entries) <= self.max_entries:
+                break
+            self._remove(entry_id)
+            evicted += 1
+        self.stats["evicted"] += evicted
+        return evicted
+
+    def mark_duplicates(self, texts, now=None, payloads=None):
+        """
+        逐条比对并登记签名，返回 (保留掩码, dup_count)：
+        每组近重复帖子保留最先出现的一条作为代表，dup_count 为该组在本批内的帖子数（含自身）；
+        与此前批次的代表重复的帖子直接丢弃（代表已入库，在索引中累计次数，带 payload 的代表记入 take_late_hits）
+        payloads 为与 texts 对应的代表帖字段，新建条目时随条目保存
+        """
+        now = time.time() if now is None else now
+        self.evict(now)
+        signatures, valid = minhash_batch(texts, self.num_perm, self.ngram, self.min_chars)
+        keys = band_keys(signatures, self.bands)
+        keep = np.ones(len(texts), dtype=bool)
+        dup_count = np.ones(len(texts), dtype=np.int64)
+        # 本批内新建条目 id -> 代表所在行
+        batch_rows = {}
+        for i in np.flatnonzero(valid):
+            row_keys = keys[i].tolist()
+            entry_id = self.find(signatures[i], row_keys)
+            if entry_id is None:
+                payload = payloads[i] if payloads is not None else None
+                batch_rows[self.add(signatures[i].copy(), row_keys, now, payload)] = i
+                continue
+            count = self.hit(entry_id, now)
+            keep[i] = False
+            row = batch_rows.get(entry_id)
+            if row is not None:
+                dup_count[row] += 1
+            elif self._entries[entry_id][3] is not None:
+                self._late_hits.append((self._entries[entry_id][3], count - 1, count))
+        self.stats["checked"] += int(valid.sum())
+        self.stats["suppressed"] += int((~keep).sum())
+        # 新条目计入后可能超出容量
+        self.evict(now)
+        return keep, dup_count
+
+    def collapse(self, df, now=None, column='cleaned_content'):
+        """
+        折叠 DataFrame 中的近重复帖子，保留行加 dup_count 列
+        返回 (折叠后的 DataFrame, 被折叠帖子的 post_id/platform 列表，供写入已处理索引)
+        """
+        if df.empty:
+            return df, []
+        payloads = df[[c for c in PAYLOAD_COLUMNS if c in df]].to_dict('records')
+        keep, dup_count = self.mark_duplicates(df[column].tolist(), now=now, payloads=payloads)
+        duplicates = duplicate_records(df.loc[~keep].to_dict('records'))
+        df = df.loc[keep].reset_index(drop=True)
+        df['dup_count'] = dup_count[keep]
+        return df, duplicates
+
+    def take_late_hits(self):
+        """取出（并清空）此前批次代表帖的新增副本 [(代表帖字段, 原重复数, 新重复数)]"""
+        hits, self._late_hits = self._late_hits, []
+        return hits
+
+    def annotate(self, post_ids, **columns):
+        """为仍在索引中的代表帖补充字段（如分析后才得到的 topic_id）"""
+        for i, post_id in enumerate(post_ids):
+            entry_id = self._by_post.get(post_id)
+            if entry_id is not None:
+                payload = self._entries[entry_id][3]
+                for name, values in columns.items():
+                    payload[name] = values[i]
+
+
+def duplicate_records(items):
+    """被折叠的条目 → [{"post_id", "platform"}]，SeenIndex.mark 只需这两个字段"""
+    return [{"post_id": ensure_post_id(item), "platform": item.get('platform', '')} for item in items]
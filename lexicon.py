@@ -0,0 +1,230 @@
+import numpy as np
+
+# 否定词：作用于其后窗口内的情绪词，翻转极性
+DEFAULT_NEGATORS = ["不", "没", "没有", "无", "非", "未", "别", "不是", "并非", "难以", "不会", "并未", "尚未"]
+
+# 程度副词：作用于其后窗口内的情绪词，按倍数放大或减弱
+DEFAULT_DEGREES = {
+    "极": 2.0, "极其": 2.0, "极度": 2.0, "超": 1.8, "非常": 1.8, "十分": 1.8, "大幅": 1.8, "显著": 1.5,
+    "很": 1.5, "明显": 1.5, "持续": 1.3, "进一步": 1.3, "较": 1.2, "比较": 1.2, "较为": 1.2,
+    "稍": 0.8, "有所": 0.8, "略": 0.6, "略微": 0.6, "小幅": 0.6, "微": 0.5,
+}
+
+
+# 词 → 前缀树节点 的缓存上限，常驻服务中词表不断增长时整体清空重建
+CACHE_LIMIT = 200000
+
+
+def load_lexicon(path, default_weight=1.0):
+    """
+    读取词典文件：每行 "词 [权重]"，空白分隔，# 开头为注释；无权重时取 default_weight
+    返回 {词: 权重}
+    """
+    entries = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if not parts or parts[0].startswith("#"):
+                continue
+            entries[parts[0]] = float(parts[1]) if len(parts) > 1 else default_weight
+    return entries
+
+
+class LexiconEngine:
+    """
+    短语情绪词典：情绪词按字符建前缀树，在分词结果上逐词行走，
+    匹配可跨越多个词（如 超 / 预期 → 超预期），但必须在词边界结束；
+    每处命中向前查看 window 个词内的否定词与程度副词，调整权重与极性
+    打分耗时只与命中位置数有关，与词典规模无关
+    """
+    def __init__(self, entries, negators=DEFAULT_NEGATORS, degrees=DEFAULT_DEGREES, window=3):
+        # 节点 i 的子节点 {字: 节点}，以及以节点 i 结尾的短语权重（非短语结尾为 None）
+        self._children = [{}]
+        self._weights = [None]
+        for phrase, weight in entries.items():
+            self._insert(phrase, weight)
+        self.negators = set(negators or ())
+        # 可粘连在词首的单字否定词（jieba 会把 不利好 切成 不利 / 好）
+        self._prefix_negators = {n for n in self.negators if len(n) == 1}
+        self.degrees = dict(degrees or {})
+        self.window = window
+        self._start_cache = {}
+        self._step_cache = {}
+
+    @classmethod
+    def from_polarity(cls, positive_words, negative_words, **kwargs):
+        """
+        由积极 / 消极词构建；传入 {词: 权重} 时使用给定权重（取绝对值），传入列表时权重为 1
+        """
+        entries = {}
+        for words, sign in ((positive_words, 1.0), (negative_words, -1.0)):
+            weights = words if isinstance(words, dict) else dict.fromkeys(words, 1.0)
+            for word, weight in weights.items():
+                entries[word] = sign * abs(weight)
+        return cls(entries, **kwargs)
+
+    def __len__(self):
+        return sum(1 for w in self._weights if w is not None)
+
+    def _insert(self, phrase, weight):
+        node = 0
+        for ch in phrase:
+            child = self._children[node].get(ch)
+            if child is None:
+                child = len(self._children)
+                self._children[node][ch] = child
+                self._children.append({})
+                self._weights.append(None)
+            node = child
+        if phrase:
+            self._weights[node] = weight
+
+    def _walk(self, node, token):
+        children = self._children
+        for ch in token:
+            node = children[node].get(ch, -1)
+            if node < 0:
+                return -1
+        return node
+
+    def _step(self, node, token):
+        key = (node, token)
+        nxt = self._step_cache.get(key)
+        if nxt is None:
+            if len(self._step_cache) >= CACHE_LIMIT:
+                self._step_cache.clear()
+            nxt = self._step_cache[key] = self._walk(node, token)
+        return nxt
+
+    def _start(self, token):
+        """
+        词作为短语起点时的 (前缀树节点, 是否带粘连否定词)，不能作为起点时节点为 -1
+        """
+        start = self._start_cache.get(token)
+        if start is None:
+            node = self._walk(0, token)
+            negated = False
+            if node < 0 and len(token) > 1 and token[0] in self._prefix_negators:
+                node = self._walk(0, token[1:])
+                negated = node >= 0
+            if len(self._start_cache) >= CACHE_LIMIT:
+                self._start_cache.clear()
+            start = self._start_cache[token] = (node, negated)
+        return start
+
+    def _modifier(self, words, i, floor):
+        """命中位置 i 之前（不越过上一处命中 floor 与分句边界）的否定 / 程度系数"""
+        factor = 1.0
+        k = i - 1
+        while k >= floor and i - k <= self.window:
+            word = words[k]
+            if not word.strip():
+                # 清洗后标点均为空白，视为分句边界
+                break
+            if word in self.negators:
+                factor = -factor
+            else:
+                factor *= self.degrees.get(word, 1.0)
+            k -= 1
+        return factor
+
+    def score_words(self, words, candidates=None):
+        """
+        对一条已分词文本打分，返回 (积极权重和, 消极权重和, 积极命中数, 消极命中数)
+        candidates 为可能作为短语起点的位置（批量打分时预先筛出），缺省时逐词检查
+        """
+        pos = neg = 0.0
+        n_pos = n_neg = 0
+        end = 0
+        n = len(words)
+        for i in (range(n) if candidates is None else candidates):
+            if i < end:
+                continue
+            node, negated = self._start(words[i])
+            if node < 0:
+                continue
+            match_end, weight = (i + 1, self._weights[node]) if self._weights[node] is not None else (-1, None)
+            j = i + 1
+            while j < n:
+                node = self._step(node, words[j])
+                if node < 0:
+                    break
+                j += 1
+                if self._weights[node] is not None:
+                    match_end, weight = j, self._weights[node]
+            if weight is None:
+                continue
+            weight *= self._modifier(words, i, end)
+            if negated:
+                weight = -weight
+            if weight > 0:
+                pos += weight
+                n_pos += 1
+            elif weight < 0:
+                neg -= weight
+                n_neg += 1
+            end = match_end
+        return pos, neg, n_pos, n_neg
+
+    def _vocab_arrays(self, vocab):
+        """
+        词表上的三个数组：能否作为短语起点、简单命中的权重、是否为修饰词
+        简单命中 = 单个词即构成完整短语、不能再向后延伸、且不带粘连否定词，其余起点记为 NaN
+        """
+        is_start = np.zeros(len(vocab), dtype=bool)
+        simple = np.full(len(vocab), np.nan)
+        modifier = np.zeros(len(vocab), dtype=bool)
+        for i, word in enumerate(vocab):
+            node, negated = self._start(word)
+            if node >= 0:
+                is_start[i] = True
+                if not negated and not self._children[node] and self._weights[node] is not None:
+                    simple[i] = self._weights[node]
+            if word in self.negators or word in self.degrees:
+                modifier[i] = True
+        return is_start, simple, modifier
+
+    def score_column(self, tokens):
+        """
+        批量打分，返回四个与 score_words 对应的等长数组：
+        - 不含起点词的行直接为 0；
+        - 只含简单命中、且命中前 window 个词内没有修饰词的行，按行 bincount 向量化求和；
+        - 其余行（多词短语、否定、程度修饰）只从起点位置开始逐词匹配
+        """
+        n = len(tokens)
+        n_pos = np.zeros(n, dtype=np.int64)
+        n_neg = np.zeros(n, dtype=np.int64)
+        vocab, ids, offsets = tokens.vocab, tokens.ids, tokens.offsets
+        is_start, simple, modifier = self._vocab_arrays(vocab)
+        hits = np.flatnonzero(is_start[ids])
+        if not len(hits):
+            return np.zeros(n), np.zeros(n), n_pos, n_neg
+        hit_rows = np.searchsorted(offsets, hits, side='right') - 1
+        weights = simple[ids[hits]]
+        complex_hit = np.isnan(weights)
+        if modifier.any():
+            # 前缀和统计每处命中之前 window 个词（不跨行）内的修饰词个数
+            seen = np.concatenate(([0], np.cumsum(modifier[ids])))
+            lo = np.maximum(hits - self.window, offsets[hit_rows])
+            complex_hit |= (seen[hits] - seen[lo]) > 0
+        complex_rows = np.unique(hit_rows[complex_hit])
+
+        is_simple = ~np.isin(hit_rows, complex_rows)
+        rows, w = hit_rows[is_simple], weights[is_simple]
+        pos = np.bincount(rows, weights=np.where(w > 0, w, 0.0), minlength=n)
+        neg = np.bincount(rows, weights=np.where(w < 0, -w, 0.0), minlength=n)
+        n_pos += np.bincount(rows[w > 0], minlength=n)
+        n_neg += np.bincount(rows[w < 0], minlength=n)
+
+        if len(complex_rows):
+            in_complex = ~is_simple
+            hits, hit_rows = hits[in_complex], hit_rows[in_complex]
+            # 按行切分命中位置（hits 有序，行号单调）
+            _, first = np.unique(hit_rows, return_index=True)
+            bounds = np.append(first, len(hits))
+            for k, r in enumerate(complex_rows):
+                lo = offsets[r]
+                words = [vocab[t] for t in ids[lo:offsets[r + 1]]]
+                candidates = (hits[bounds[k]:bounds[k + 1]] - lo).tolist()
+                pos[r], neg[r], n_pos[r], n_neg[r] = self.score_words(words, candidates)
+        return pos, neg, n_pos, n_neg
@@ -1,73 +1,256 @@
-import pandas as pd
-from crawler import FinanceCrawler
+from archive import PayloadArchive
+from crawler import FinanceCrawler, ReplayCrawler
+from dedup import NearDuplicateIndex
 from processor import DataProcessor
 from analyzer import SentimentAnalyzer
-from clusterer import TopicClusterer
+from clusterer import TOPIC_MODES, TopicClusterer, model_filename
+from seen_index import SeenIndex
+from tokenizer import Tokenizer, domain_words
+from parallel import ParallelPipeline
+from stream import StreamingPipeline
+from storage import ResultStore
+from monitor import MonitorDaemon
+from metrics import DISABLED, Metrics
+import argparse
 import os
+import uuid
+from datetime import datetime
 
-def main():
-    # 1. 配置参数
-    SECTOR_KEYWORDS = {
-        "人工智能": ["AI", "算力", "大模型", "服务器", "芯片"],
-        "新能源": ["光伏", "锂电", "储能", "新能源"],
-        "半导体": ["芯片", "制程", "国产替代"],
-        "军工": ["军工", "装备", "国防"]
-    }
-    
-    POSITIVE_WORDS = ["利好", "大涨", "爆发", "超预期", "走强", "突破", "强势"]
-    NEGATIVE_WORDS = ["下跌", "利空", "承压", "回调", "惨淡", "风险", "走弱"]
-    
-    SEARCH_KEYWORDS = ["人工智能", "半导体", "新能源", "军工"]
+# 运行状态（已处理帖子索引等）的存放目录
+STATE_DIR = "state"
+# 分析结果库：按 日期/平台 分区的 Parquet 文件，每次运行追加
+RESULTS_DIR = "results"
+# 原始抓取载荷归档（--record 写入，--replay 读取）
+ARCHIVE_DIR = os.path.join(STATE_DIR, "archive")
+# 回放结果单独存放，不与在线运行的结果库混在一起；每次回放一个独立的运行目录
+REPLAY_RESULTS_DIR = "results_replay"
+# 汇总报告文件名（回放时写在运行目录中，不覆盖在线运行的报告）
+REPORT_FILE = "RESULT_SUMMARY.md"
+
+# 1. 配置参数
+SECTOR_KEYWORDS = {
+    "人工智能": ["AI", "算力", "大模型", "服务器", "芯片"],
+    "新能源": ["光伏", "锂电", "储能", "新能源"],
+    "半导体": ["芯片", "制程", "国产替代"],
+    "军工": ["军工", "装备", "国防"]
+}
+
+POSITIVE_WORDS = ["利好", "大涨", "爆发", "超预期", "走强", "突破", "强势"]
+NEGATIVE_WORDS = ["下跌", "利空", "承压", "回调", "惨淡", "风险", "走弱"]
+
+SEARCH_KEYWORDS = ["人工智能", "半导体", "新能源", "军工"]
+
+# 加入 jieba 词典的业务词，词典缓存持久化在 STATE_DIR
+USER_WORDS = domain_words(SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS)
+
+def make_tokenizer():
+    return Tokenizer(cache_path=os.path.join(STATE_DIR, "token_cache.db"),
+                     user_words=USER_WORDS, dict_cache_dir=STATE_DIR)
+
+def make_clusterer(tokenizer, topic_mode="lda", replay=False):
+    # 假设发现4个主要主题；回放时从零训练且不保存，结果只取决于归档内容
+    model_path = None if replay else os.path.join(STATE_DIR, model_filename(topic_mode))
+    return TopicClusterer(n_topics=4, tokenizer=tokenizer, mode=topic_mode, model_path=model_path)
+
+def make_crawler(metrics=None, record=None, replay=None, since=None, until=None):
+    """
+    在线抓取时 record 为归档目录则同时记录原始载荷；
+    replay 为归档目录时改为从归档回放 [since, until) 内的抓取，不访问网络
+    """
+    if replay:
+        return ReplayCrawler(PayloadArchive(replay), start=since, end=until, metrics=metrics)
+    return FinanceCrawler(metrics=metrics, archive=PayloadArchive(record) if record else None)
+
+def replay_run_dir():
+    """新建本次回放的运行目录，返回 (结果库目录, 报告路径)；多次回放互不叠加，同一归档每次结果相同"""
+    run_dir = os.path.join(REPLAY_RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8])
+    os.makedirs(run_dir)
+    return os.path.join(run_dir, "results"), os.path.join(run_dir, REPORT_FILE)
 
+def open_seen_index(replay=False):
+    """回放时使用内存索引：同一份归档可反复重新分析，也不影响在线运行的增量状态"""
+    if replay:
+        return SeenIndex(":memory:")
+    seen_index = SeenIndex(os.path.join(STATE_DIR, "seen_index.db"))
+    seen_index.prune(max_age_days=30)
+    return seen_index
+
+def mark_seen(seen_index, df, duplicates=()):
+    """记录已完成分析的帖子与被折叠进代表帖的近重复帖子，模拟数据不入索引"""
+    records = df[df['platform'] != 'Mock'].to_dict('records') if df is not None and not df.empty else []
+    records += [item for item in duplicates if item['platform'] != 'Mock']
+    return seen_index.mark(records)
+
+def main(workers=1, metrics=None, topic_mode="lda", crawler=None, replay=False, results_dir=RESULTS_DIR,
+         report_path=REPORT_FILE):
+    """
+    crawler 缺省为在线抓取；replay 为 True 时 crawler 应为 ReplayCrawler，
+    此时已处理索引与主题模型均不读写持久状态，同一归档每次回放得到相同结果
+    """
     print("=== 财经舆情监控系统启动 ===")
+    metrics = metrics or DISABLED
 
-    # 2. 爬取数据
-    crawler = FinanceCrawler()
-    raw_data = crawler.run(SEARCH_KEYWORDS)
+    # 2. 爬取数据（只保留此前未处理过的增量）
+    seen_index = open_seen_index(replay)
+    crawler = crawler or FinanceCrawler(metrics=metrics)
+    with metrics.stage("crawl"):
+        raw_data = crawler.run(SEARCH_KEYWORDS, seen_index=seen_index)
     print(f"[+] 原始数据抓取完成，共 {len(raw_data)} 条记录")
 
-    # 3. 数据清洗与板块匹配
-    processor = DataProcessor(SECTOR_KEYWORDS)
-    df_processed = processor.process(raw_data)
-    print("[+] 数据清洗与板块匹配完成")
+    tokenizer = make_tokenizer()
+    # 近重复帖子（复制粘贴的刷屏帖）折叠为一条代表帖，重复数计入热度
+    deduplicator = NearDuplicateIndex()
+    if workers > 1:
+        # 3-5. 多进程分块执行：清洗、近重复折叠、板块匹配、分词、情绪分析与热度评估
+        pipeline = ParallelPipeline(SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS, workers=workers,
+                                    dict_cache_dir=STATE_DIR, deduplicator=deduplicator, tokenizer=tokenizer)
+        with metrics.stage("parallel_analyze", rows=len(raw_data)):
+            df_final, tokens = pipeline.run(raw_data, seen_index=seen_index)
+        duplicates = pipeline.duplicates
+        metrics.inc("duplicates_total", len(duplicates))
+        print(f"[+] 数据清洗、分词与情绪分析完成（{workers} 个进程，折叠近重复 {len(duplicates)} 条，"
+              f"新分词 {tokenizer.stats['segmented']} 条，缓存命中 {tokenizer.stats['disk_hits']} 条）")
+    else:
+        # 3. 数据清洗与板块匹配
+        processor = DataProcessor(SECTOR_KEYWORDS)
+        with metrics.stage("process", rows=len(raw_data)):
+            df_final = processor.process(raw_data, seen_index=seen_index)
+        print("[+] 数据清洗与板块匹配完成")
+
+        with metrics.stage("dedup", rows=len(df_final)):
+            df_final, duplicates = deduplicator.collapse(df_final)
+        metrics.inc("duplicates_total", len(duplicates))
+        if duplicates:
+            print(f"[+] 折叠近重复帖子 {len(duplicates)} 条")
+
+        if not df_final.empty:
+            # 4. 分词：每条文本只分词一次，结果供情绪分析与主题聚类共用
+            with metrics.stage("tokenize", rows=len(df_final)):
+                tokens = tokenizer.tokenize(df_final['cleaned_content'])
+            print(f"[+] 分词完成（新分词 {tokenizer.stats['segmented']} 条，缓存命中 {tokenizer.stats['disk_hits']} 条）")
+
+            # 5. 情绪分析与热度评估
+            analyzer = SentimentAnalyzer(POSITIVE_WORDS, NEGATIVE_WORDS, tokenizer=tokenizer)
+            with metrics.stage("analyze", rows=len(df_final)):
+                df_final = analyzer.analyze_dataframe(df_final, tokens=tokens)
+            print("[+] 情绪分析与热度评估完成")
+
+    if df_final.empty:
+        print("[!] 没有新的舆情数据，本次不更新报告")
+        tokenizer.close()
+        seen_index.close()
+        return
+
+    # 6. NLP 主题聚类与交易风向分析
+    print("[*] 正在进行 NLP 主题聚类分析...")
+    clusterer = make_clusterer(tokenizer, topic_mode, replay)
+    with metrics.stage("topics", rows=len(df_final)):
+        df_final, trend_summary = clusterer.analyze_trends(df_final, tokens=tokens)
+    tokenizer.close()
+    print("[+] 主题聚类与风向分析完成")
+
+    # 7. 结果整理与输出
+    sector_summary = summarize_sectors(df_final)
+    
+    # 保存结果：追加写入分区结果库
+    with metrics.stage("store", rows=len(df_final)):
+        ResultStore(results_dir).append(df_final)
+    
+    # 记录已完成分析的帖子，模拟数据不入索引
+    marked = mark_seen(seen_index, df_final, duplicates)
+    seen_index.close()
+    print(f"[*] 已处理索引新增 {marked} 条")
+
+    print("\n=== 分析结果摘要 ===")
+    print(sector_summary)
+    print(f"\n[!] 详细结果已追加至: {results_dir}/")
+
+    with metrics.stage("report"):
+        write_report(trend_summary, sector_summary, df_final, path=report_path, results_dir=results_dir)
+
+def main_stream(batch_size=50, flush_rows=1000, metrics=None, topic_mode="lda", crawler=None, replay=False,
+                results_dir=RESULTS_DIR, report_path=REPORT_FILE):
+    """
+    流式模式：抓取 → 清洗/板块匹配 → 近重复折叠 → 分词 → 情绪分析 按小批次逐级流动，
+    每批结果立即追加写入结果库并记入已处理索引，内存中只保留板块汇总与主题语料
+    """
+    import pandas as pd
+    print("=== 财经舆情监控系统启动（流式模式） ===")
+    metrics = metrics or DISABLED
+    seen_index = open_seen_index(replay)
+    tokenizer = make_tokenizer()
+    pipeline = StreamingPipeline(
+        DataProcessor(SECTOR_KEYWORDS),
+        SentimentAnalyzer(POSITIVE_WORDS, NEGATIVE_WORDS, tokenizer=tokenizer),
+        tokenizer,
+        seen_index=seen_index,
+        batch_size=batch_size,
+        metrics=metrics,
+        deduplicator=NearDuplicateIndex(),
+    )
+
+    crawler = crawler or FinanceCrawler(metrics=metrics)
+    store = ResultStore(results_dir)
+    pending = []
+
+    def flush():
+        # 小批次攒够一定行数再落盘，避免产生大量碎小的 Parquet 文件
+        df_flush = None
+        if pending:
+            df_flush = pd.concat(pending, ignore_index=True)
+            with metrics.stage("store", rows=len(df_flush)):
+                store.append(df_flush)
+            pending.clear()
+        # 被折叠的近重复帖子随代表帖一起记入索引
+        mark_seen(seen_index, df_flush, pipeline.take_duplicates())
+
+    for batch in pipeline.run(crawler.iter_records(SEARCH_KEYWORDS, seen_index=seen_index)):
+        pending.append(batch)
+        if sum(len(b) for b in pending) >= flush_rows:
+            flush()
+        print(f"[+] 已分析 {pipeline.processed} 条")
+    flush()
+    seen_index.close()
 
-    # 4. 情绪分析与热度评估
-    analyzer = SentimentAnalyzer(POSITIVE_WORDS, NEGATIVE_WORDS)
-    df_final = analyzer.analyze_dataframe(df_processed)
-    print("[+] 情绪分析与热度评估完成")
+    if not pipeline.processed:
+        print("[!] 没有新的舆情数据，本次不更新报告")
+        tokenizer.close()
+        return
 
-    # 5. NLP 主题聚类与交易风向分析
     print("[*] 正在进行 NLP 主题聚类分析...")
-    clusterer = TopicClusterer(n_topics=4) # 假设发现4个主要主题
-    df_final, trend_summary = clusterer.analyze_trends(df_final)
+    clusterer = make_clusterer(tokenizer, topic_mode, replay)
+    with metrics.stage("topics", rows=pipeline.processed):
+        _, trend_summary = clusterer.analyze_trends(pipeline.corpus.frame(), tokens=pipeline.corpus.tokens())
+    tokenizer.close()
     print("[+] 主题聚类与风向分析完成")
 
-    # 6. 结果整理与输出
+    sector_summary = pipeline.sectors.summary()
+    print("\n=== 分析结果摘要 ===")
+    print(sector_summary)
+    print(f"\n[!] 详细结果已追加至: {results_dir}/")
+    with metrics.stage("report"):
+        write_report(trend_summary, sector_summary, path=report_path, results_dir=results_dir)
+
+def summarize_sectors(df_final):
+    """
+    按板块汇总情绪与热度
+    """
     # 展开板块列表，方便按板块统计
     df_exploded = df_final.explode('matched_sectors')
     
     # 按板块汇总统计
-    sector_summary = df_exploded.groupby('matched_sectors').agg({
+    return df_exploded.groupby('matched_sectors').agg({
         'sentiment_score': 'mean',
         'heat_index': 'sum',
         'title': 'count'
     }).rename(columns={'title': '文章数量', 'sentiment_score': '平均情绪得分', 'heat_index': '总热度'})
-    
-    # 保存结果
-    output_file = "sentiment_analysis_result.csv"
-    df_final.to_csv(output_file, index=False, encoding='utf-8-sig')
-    
-    print("\n=== 分析结果摘要 ===")
-    print(sector_summary)
-    print(f"\n[!] 详细结果已保存至: {output_file}")
 
-    # 生成Markdown格式的结果表供展示
-    display_cols = ['platform', 'matched_sectors', 'sentiment_label', 'sentiment_score', 'heat_index', 'title']
-    # 限制标题长度用于展示
-    df_display = df_final[display_cols].copy()
-    df_display['title'] = df_display['title'].apply(lambda x: x[:20] + "..." if len(x) > 20 else x)
-    
-    with open("RESULT_SUMMARY.md", "w", encoding="utf-8") as f:
+def write_report(trend_summary, sector_summary, df_final=None, path=REPORT_FILE, results_dir=RESULTS_DIR):
+    """
+    生成Markdown格式的结果表供展示；df_final 为空时（流式模式）详细列表只保存在结果库中
+    """
+    import pandas as pd
+    with open(path, "w", encoding="utf-8") as f:
         f.write("# 财经舆情分析与交易风向报告\n\n")
         
         f.write("## 1. 自动发现的交易风向 (NLP 主题聚类)\n\n")
@@ -80,11 +263,67 @@ def main():
         f.write(sector_summary.to_markdown() + "\n\n")
         
         f.write("## 3. 详细舆情列表\n\n")
+        if df_final is None:
+            f.write(f"流式模式下详细舆情逐批写入结果库 `{results_dir}/`。\n")
+            return
         # 增加主题ID列
         display_cols_with_topic = ['platform', 'topic_id', 'matched_sectors', 'sentiment_label', 'sentiment_score', 'heat_index', 'title']
         df_display_final = df_final[display_cols_with_topic].copy()
+        # 限制标题长度用于展示
         df_display_final['title'] = df_display_final['title'].apply(lambda x: x[:20] + "..." if len(x) > 20 else x)
         f.write(df_display_final.to_markdown(index=False) + "\n")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="财经舆情监控系统")
+    parser.add_argument("--workers", type=int, default=1, help="清洗与分析阶段的进程数，>1 时启用多进程分块执行")
+    parser.add_argument("--stream", action="store_true", help="流式模式：按小批次边抓取边分析，内存占用恒定")
+    parser.add_argument("--batch-size", type=int, default=50, help="流式模式下每批处理的条数")
+    parser.add_argument("--daemon", action="store_true", help="常驻监控模式：各平台按各自间隔持续抓取与分析")
+    parser.add_argument("--topic-mode", choices=TOPIC_MODES, default="lda",
+                        help="主题模型：lda 为增量 LDA，kmeans / nmf 为 TF-IDF 稀疏矩阵上的快速模式（适合大语料）")
+    parser.add_argument("--record", nargs="?", const=ARCHIVE_DIR,
+                        help=f"把每次抓取的原始页面 / 接口载荷记录到归档目录（缺省为 {ARCHIVE_DIR}）")
+    parser.add_argument("--replay", nargs="?", const=ARCHIVE_DIR,
+                        help=f"不联网，从归档目录（缺省为 {ARCHIVE_DIR}）回放抓取并重新分析，结果与报告写入 {REPLAY_RESULTS_DIR}/ 下本次的运行目录")
+    parser.add_argument("--since", help="回放的起始抓取时间（含），如 2024-05-01 或 2024-05-01 09:30:00")
+    parser.add_argument("--until", help="回放的截止抓取时间（不含）")
+    parser.add_argument("--metrics", help="开启阶段计时与抓取指标并导出到该文件（.jsonl 追加 JSON 行，否则为 Prometheus 文本）")
+    parser.add_argument("--profile", nargs="?", const="", help="对指定阶段（逗号分隔，缺省为全部）做性能剖析")
+    parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile", help="性能剖析后端")
+    args = parser.parse_args()
+    if args.replay and args.daemon:
+        parser.error("--replay 不能与 --daemon 同时使用")
+    if args.replay and args.record:
+        parser.error("--replay 不能与 --record 同时使用")
+    if (args.since or args.until) and not args.replay:
+        parser.error("--since / --until 只用于 --replay")
+
+    metrics = None
+    if args.metrics or args.profile is not None:
+        metrics = Metrics(profile_dir=os.path.join(STATE_DIR, "profiles"))
+        if args.profile is not None:
+            metrics.enable_profiling([s for s in args.profile.split(",") if s], backend=args.profiler)
+    crawler = None
+    try:
+        if args.daemon:
+            MonitorDaemon(SEARCH_KEYWORDS, SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS,
+                          state_dir=STATE_DIR, results_dir=RESULTS_DIR, topic_mode=args.topic_mode,
+                          metrics=metrics, metrics_path=args.metrics,
+                          archive=PayloadArchive(args.record) if args.record else None).run()
+        else:
+            crawler = make_crawler(metrics, record=args.record, replay=args.replay, since=args.since, until=args.until)
+            replay = bool(args.replay)
+            results_dir, report_path = replay_run_dir() if replay else (RESULTS_DIR, REPORT_FILE)
+            if args.stream:
+                main_stream(batch_size=args.batch_size, metrics=metrics, topic_mode=args.topic_mode,
+                            crawler=crawler, replay=replay, results_dir=results_dir, report_path=report_path)
+            else:
+                main(workers=args.workers, metrics=metrics, topic_mode=args.topic_mode,
+                     crawler=crawler, replay=replay, results_dir=results_dir, report_path=report_path)
+    finally:
+        if crawler is not None:
+            crawler.close()
+        if metrics is not None:
+            metrics.report()
+            metrics.export(args.metrics)
+            metrics.dump_profiles()
@@ -0,0 +1,277 @@
+import bisect
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# 延迟直方图的默认分桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prometheus 指标名前缀
+PREFIX = "finance_sentiment_"
+
+_NULL_STAGE = nullcontext()
+
+
+class Histogram:
+    """
+    固定分桶直方图：observe 为一次二分查找与两次加法，导出时再累加成 Prometheus 的累计桶
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for le, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            yield le, total
+
+    def quantile(self, q):
+        """按分桶上界估计分位数"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for le, total in self.cumulative():
+            if total >= rank:
+                return le if le != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    进程内指标：按 (名称, 标签) 记录计数器与延迟直方图，stage() 为阶段计时上下文
+    enabled=False 时所有记录调用直接返回，stage() 返回共享的空上下文，开销可忽略
+    可在运行时对指定阶段开启 cProfile / pyinstrument 采样，结果按阶段写入 profile_dir
+    """
+    def __init__(self, enabled=True, profile_dir="profiles"):
+        self.enabled = enabled
+        self.profile_dir = profile_dir
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        # 开启性能剖析的阶段（_profile_all 为全部阶段）与各阶段累计的剖析器
+        self._profile_stages = set()
+        self._profile_all = False
+        self._profiler_backend = "cprofile"
+        self._profilers = {}
+        # 同一时刻只允许一个剖析器工作（Python 3.12 起 cProfile 为解释器级）
+        self._profile_active = False
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def stage(self, name, rows=None):
+        """阶段计时：with metrics.stage("tokenize", rows=len(df)): ..."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._stage(name, rows)
+
+    @contextmanager
+    def _stage(self, name, rows):
+        profiler = self._start_profile(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                self._stop_profile(name, profiler)
+            self.observe("stage_seconds", elapsed, stage=name)
+            if rows is not None:
+                self.inc("stage_rows_total", rows, stage=name)
+
+    # ---- 性能剖析 ----
+
+    def enable_profiling(self, stages=None, backend="cprofile"):
+        """
+        对指定阶段（缺省为全部阶段）开启性能剖析，可在运行中随时调用
+        backend 为 "cprofile" 或 "pyinstrument"（未安装时退回 cProfile）
+        """
+        if backend == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                print("[!] 未安装 pyinstrument，改用 cProfile")
+                backend = "cprofile"
+        with self._lock:
+            self._profiler_backend = backend
+            self._profile_all = not stages
+            self._profile_stages = set(stages or ())
+
+    def disable_profiling(self):
+        """关闭性能剖析，并把已采集的结果写入 profile_dir"""
+        with self._lock:
+            self._profile_all = False
+            self._profile_stages = set()
+        return self.dump_profiles()
+
+    @property
+    def profiling(self):
+        return self._profile_all or bool(self._profile_stages)
+
+    def _start_profile(self, name):
+        if not (self._profile_all or name in self._profile_stages):
+            return None
+        with self._lock:
+            # 剖析器不能嵌套或并发启用：已有阶段在剖析时其余阶段只计时
+            if self._profile_active:
+                return None
+            self._profile_active = True
+            profiler = self._profilers.get(name)
+            if profiler is None:
+                if self._profiler_backend == "pyinstrument":
+                    from pyinstrument import Profiler
+                    profiler = Profiler()
+                else:
+                    profiler = cProfile.Profile()
+                self._profilers[name] = profiler
+        if isinstance(profiler, cProfile.Profile):
+            profiler.enable()
+        else:
+            profiler.start()
+        return profiler
+
+    def _stop_profile(self, name, profiler):
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+        with self._lock:
+            self._profile_active = False
+
+    def dump_profiles(self):
+        """将各阶段累计的剖析结果写入文件（cProfile 为 .prof，pyinstrument 为 .html），返回文件列表"""
+        with self._lock:
+            profilers, self._profilers = self._profilers, {}
+        if not profilers:
+            return []
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        paths = []
+        for name, profiler in profilers.items():
+            if isinstance(profiler, cProfile.Profile):
+                path = os.path.join(self.profile_dir, f"{name}-{stamp}.prof")
+                profiler.dump_stats(path)
+            else:
+                path = os.path.join(self.profile_dir, f"{name}-{stamp}.html")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+            paths.append(path)
+        print(f"[*] 性能剖析结果已写入: {', '.join(paths)}")
+        return paths
+
+    # ---- 导出 ----
+
+    def snapshot(self):
+        """当前全部指标的字典形式"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{
+                "name": name,
+                "labels": dict(labels),
+                "count": h.count,
+                "sum": round(h.sum, 6),
+                "buckets": {("+Inf" if le == float("inf") else str(le)): n for le, n in h.cumulative()},
+            } for (name, labels), h in sorted(self._histograms.items())]
+        return {"counters": counters, "histograms": histograms}
+
+    @staticmethod
+    def _labels(labels, extra=None):
+        items = list(labels) + (list(extra.items()) if extra else [])
+        if not items:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+    def to_prometheus(self):
+        """Prometheus 文本格式（可供 node_exporter textfile collector 采集）"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            metric = PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{self._labels(labels)} {value}")
+        for (name, labels), h in histograms:
+            metric = PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            for le, total in h.cumulative():
+                le = "+Inf" if le == float("inf") else le
+                lines.append(f"{metric}_bucket{self._labels(labels, {'le': le})} {total}")
+            lines.append(f"{metric}_sum{self._labels(labels)} {h.sum:.6f}")
+            lines.append(f"{metric}_count{self._labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """
+        导出指标：.jsonl 结尾时追加一行带时间戳的快照，否则覆盖写入 Prometheus 文本
+        """
+        if not self.enabled or not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if path.endswith(".jsonl"):
+            record = {"time": time.strftime("%Y-%m-%d %H:%M:%S")}
+            record.update(self.snapshot())
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            # 先写临时文件再替换，避免采集方读到半个文件
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+
+    def report(self):
+        """打印各阶段耗时与各平台抓取统计"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = dict(self._counters)
+        for (name, labels), h in histograms:
+            label = ",".join(f"{k}={v}" for k, v in labels)
+            print(f"[*] {name}[{label}]: {h.count} 次, 合计 {h.sum:.3f}s, p50≈{h.quantile(0.5)}s, p95≈{h.quantile(0.95)}s")
+        for (name, labels), value in sorted(counters.items()):
+            if name != "stage_rows_total":
+                label = ",".join(f"{k}={v}" for k, v in labels)
+                print(f"[*] {name}[{label}]: {value}")
+
+
+# 未注入指标对象时使用的共享空实现
+DISABLED = Metrics(enabled=False)
@@ -0,0 +1,286 @@
+import asyncio
+import os
+import signal
+import time
+from collections import deque
+import numpy as np
+from analyzer import SentimentAnalyzer
+from clusterer import TopicClusterer, model_filename
+from crawler import BROWSER_PLATFORMS, FinanceCrawler, PLATFORMS
+from dedup import NearDuplicateIndex
+from metrics import DISABLED
+from processor import DataProcessor
+from seen_index import SeenIndex, dedupe_records
+from storage import ResultStore
+from stream import SectorAggregator, TopicAggregator
+from tokenizer import TokenColumn, Tokenizer, domain_words
+from windows import WindowAggregator
+
+# 各平台默认抓取间隔（秒）
+DEFAULT_INTERVALS = {"THS": 300, "EastMoney": 300, "Xueqiu": 600, "Weibo": 120}
+
+
+class MonitorDaemon:
+    """
+    常驻监控服务：每个平台按各自间隔调度抓取，浏览器池、jieba 词典、情绪词典与主题模型常驻内存
+    每个 tick 只分析新增帖子，并在内存中维护最新的板块汇总与主题趋势
+    tick 延迟 = 抓取完成到板块得分更新完成的耗时
+    """
+    def __init__(self, keywords, sector_keywords, positive_words, negative_words,
+                 intervals=None, state_dir="state", results_dir="results", n_topics=4, save_every=20,
+                 metrics=None, metrics_path=None, topic_mode="lda", archive=None, seen_max_age_days=30,
+                 token_cache_max_age_days=7, flush_rows=1000, flush_seconds=600):
+        self.keywords = keywords
+        self.intervals = dict(DEFAULT_INTERVALS)
+        self.intervals.update(intervals or {})
+        # 指标每个 tick 后导出到 metrics_path
+        self.metrics = metrics or DISABLED
+        self.metrics_path = metrics_path
+        # archive（PayloadArchive）非空时，每次抓取的原始载荷写入归档供离线回放
+        self.crawler = FinanceCrawler(metrics=self.metrics, archive=archive)
+        self.seen_index = SeenIndex(os.path.join(state_dir, "seen_index.db"))
+        # 已处理索引的保留天数，与单次运行模式相同，启动时及每次保存模型时清理
+        self.seen_max_age_days = seen_max_age_days
+        self.seen_index.prune(max_age_days=seen_max_age_days)
+        # 分词磁盘缓存中超过该天数未被使用的条目在维护时清除
+        self.token_cache_max_age_days = token_cache_max_age_days
+        self.tokenizer = Tokenizer(cache_path=os.path.join(state_dir, "token_cache.db"),
+                                   user_words=domain_words(sector_keywords, positive_words, negative_words),
+                                   dict_cache_dir=state_dir)
+        self.processor = DataProcessor(sector_keywords)
+        # 近重复索引常驻内存，跨 tick、跨平台折叠复制粘贴的刷屏帖，过期条目按 TTL 淘汰
+        self.deduplicator = NearDuplicateIndex()
+        self.analyzer = SentimentAnalyzer(positive_words, negative_words, tokenizer=self.tokenizer)
+        self.clusterer = TopicClusterer(n_topics=n_topics, tokenizer=self.tokenizer, mode=topic_mode,
+                                        model_path=os.path.join(state_dir, model_filename(topic_mode)),
+                                        autosave=False)
+        # 主题模型每 save_every 个有新增的 tick 落盘一次（同时裁剪已处理索引与主题词表），退出时再保存
+        self.save_every = save_every
+        self._ticks_since_save = 0
+        self.store = ResultStore(results_dir)
+        # 各 tick 的结果先在内存中攒批，够 flush_rows 行或距上次落盘超过 flush_seconds 秒再写入，
+        # 避免每个 tick 产生一个碎小的 Parquet 文件；落盘后才记入已处理索引
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._pending = []
+        self._pending_duplicates = []
+        # 已分析但尚未落盘（含主题冷启动积压）的 post_id，下个 tick 据此跳过
+        self._unflushed = set()
+        self._last_flush = time.monotonic()
+        self.sectors = SectorAggregator()
+        self.topics = TopicAggregator()
+        # 按 time 列维护的滑动窗口（1m/5m/1h/1d），供实时看板查询
+        self.sector_windows = WindowAggregator()
+        self.topic_windows = WindowAggregator()
+        self.latencies = deque(maxlen=1000)
+        self.processed = 0
+        # 主题模型冷启动前积压的 (文档, 分词结果)（不足 n_topics 篇时无法训练），训练后与当批一起分配主题并写入
+        self._topic_backlog = []
+        self._analysis_lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+
+    def _maintain(self):
+        """定期维护常驻状态：清理过期的已处理索引与分词缓存、裁剪主题词表后保存模型，避免状态随运行时间无限增长"""
+        pruned = self.seen_index.prune(max_age_days=self.seen_max_age_days)
+        evicted = self.tokenizer.prune(max_age_days=self.token_cache_max_age_days)
+        dropped = self.clusterer.prune_vocabulary()
+        if pruned or evicted or dropped:
+            print(f"[*] 已处理索引清理 {pruned} 条，分词缓存清理 {evicted} 条，主题词表裁剪 {dropped} 个词")
+        self.clusterer.save()
+
+    def flush(self):
+        """把攒批的结果写入结果库，并将这些帖子（及被折叠的近重复帖子）记入已处理索引"""
+        import pandas as pd
+        if self._pending:
+            df = pd.concat(self._pending, ignore_index=True)
+            with self.metrics.stage("store", rows=len(df)):
+                self.store.append(df)
+            self.seen_index.mark(df.to_dict('records'))
+            self._unflushed.difference_update(df['post_id'])
+            self._pending = []
+        if self._pending_duplicates:
+            self.seen_index.mark(self._pending_duplicates)
+            self._unflushed.difference_update(item['post_id'] for item in self._pending_duplicates)
+            self._pending_duplicates = []
+        self._last_flush = time.monotonic()
+
+    def warm_up(self):
+        """启动时预加载 jieba 词典，避免第一个 tick 承担冷启动开销"""
+        self.tokenizer.load_dictionary()
+
+    def _analyze(self, records):
+        """分析一批新抓取的记录，返回新增条数（在工作线程中执行）"""
+        records = [r for r in self.seen_index.filter_new(dedupe_records(records)) if r['post_id'] not in self._unflushed]
+        if not records:
+            return 0
+        metrics = self.metrics
+        with metrics.stage("process", rows=len(records)):
+            df = self.processor.process(records)
+        with metrics.stage("dedup", rows=len(df)):
+            df, duplicates = self.deduplicator.collapse(df)
+        if duplicates:
+            metrics.inc("duplicates_total", len(duplicates))
+            # 被折叠的帖子不再分析，但随下次落盘记入已处理索引，避免之后的 tick 重复比对
+            self._pending_duplicates.extend(duplicates)
+            self._unflushed.update(item['post_id'] for item in duplicates)
+        hits = self.deduplicator.take_late_hits()
+        if hits:
+            # 副本晚于代表帖到达：代表帖已计入汇总与窗口，只补记增加的热度
+            late = self.analyzer.late_duplicate_heat(hits)
+            with metrics.stage("aggregate", rows=len(late)):
+                self.sectors.add_heat(late)
+                self.sector_windows.add_heat(late, 'matched_sectors')
+                self.topics.add_heat(late)
+                if 'topic_id' in late:
+                    self.topic_windows.add_heat(late, 'topic_id')
+        if df.empty:
+            return 0
+        with metrics.stage("tokenize", rows=len(df)):
+            tokens = self.tokenizer.tokenize(df['cleaned_content'])
+        with metrics.stage("analyze", rows=len(df)):
+            df = self.analyzer.analyze_dataframe(df, tokens=tokens)
+        with metrics.stage("aggregate", rows=len(df)):
+            self.sectors.update(df)
+            self.sector_windows.update(df, 'matched_sectors')
+
+        # 增量更新主题模型，新文档的主题ID与历史保持一致
+        new_rows = df
+        if self._topic_backlog:
+            # 冷启动阶段积压的文档与本批合并，由同一次训练分配主题后再一起写入
+            df, tokens = self._take_backlog(df, tokens)
+        with metrics.stage("topics", rows=len(df)):
+            topics_info, dominant_topics = self.clusterer.fit_topics(None, tokens=tokens)
+        if topics_info is not None:
+            df['topic_id'] = dominant_topics
+            self.topics.update(df)
+            self.topic_windows.update(df, 'topic_id')
+            # 之后到达的副本按代表帖的主题补记热度
+            self.deduplicator.annotate(df['post_id'].tolist(), topic_id=df['topic_id'].tolist())
+        elif not self.clusterer.is_trained:
+            # 不足 n_topics 篇（或有效词汇不足）时无法训练：积压到下一个 tick，暂不落盘
+            self._topic_backlog.append((df, tokens))
+            df = df.iloc[:0]
+        else:
+            df['topic_id'] = 0
+
+        self._unflushed.update(new_rows['post_id'])
+        if not df.empty:
+            self._pending.append(df)
+        if (sum(len(d) for d in self._pending) >= self.flush_rows
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+        self.processed += len(new_rows)
+        self._ticks_since_save += 1
+        if self._ticks_since_save >= self.save_every:
+            self._maintain()
+            self._ticks_since_save = 0
+        return len(new_rows)
+
+    def _take_backlog(self, df, tokens):
+        """取出冷启动阶段积压的文档，与本批按行拼接"""
+        import pandas as pd
+        frames = [d for d, _ in self._topic_backlog] + [df]
+        columns = [t for _, t in self._topic_backlog] + [tokens]
+        self._topic_backlog = []
+        return pd.concat(frames, ignore_index=True), TokenColumn.concat(columns)
+
+    async def tick(self, platform, pool=None):
+        records = await self.crawler.crawl_async(self.keywords, [platform], pool=pool)
+        fetched_at = time.perf_counter()
+        # 分析阶段串行执行，放到线程中避免阻塞其他平台的抓取
+        async with self._analysis_lock:
+            added = await asyncio.to_thread(self._analyze, records)
+        latency = time.perf_counter() - fetched_at
+        if added:
+            self.latencies.append(latency)
+            self.metrics.observe("tick_seconds", latency, platform=platform)
+        self.metrics.export(self.metrics_path)
+        print(f"[+] {platform}: 抓取 {len(records)} 条，新增 {added} 条，tick 延迟 {latency * 1000:.1f}ms")
+        return added
+
+    async def _platform_loop(self, platform, pool):
+        interval = self.intervals.get(platform, 300)
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                await self.tick(platform, pool)
+            except Exception as e:
+                print(f"[!] {platform} 调度异常: {e}")
+            wait = max(0.0, interval - (time.monotonic() - started))
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_async(self, platforms=None):
+        platforms = platforms or PLATFORMS
+        await asyncio.to_thread(self.warm_up)
+        print(f"=== 监控服务启动: {', '.join(f'{p}/{self.intervals.get(p, 300)}s' for p in platforms)} ===")
+        if self.metrics.enabled and hasattr(signal, "SIGUSR1"):
+            # kill -USR1 <pid> 在运行中开启 / 关闭全部阶段的性能剖析
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.toggle_profiling)
+        async with self.crawler.pool_scope(platforms) as pool:
+            if pool is None and any(p in BROWSER_PLATFORMS for p in platforms):
+                # 常驻浏览器不可用时不再逐次冷启动浏览器，只调度接口类平台
+                platforms = [p for p in platforms if p not in BROWSER_PLATFORMS]
+                print(f"[!] 浏览器不可用，仅调度: {', '.join(platforms) or '无'}")
+            await asyncio.gather(*(self._platform_loop(p, pool) for p in platforms))
+
+    def run(self, platforms=None):
+        try:
+            asyncio.run(self.run_async(platforms))
+        except KeyboardInterrupt:
+            print("[*] 监控服务已停止")
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def toggle_profiling(self):
+        if self.metrics.profiling:
+            self.metrics.disable_profiling()
+            print("[*] 性能剖析已关闭")
+        else:
+            self.metrics.enable_profiling()
+            print("[*] 性能剖析已开启（再次发送 SIGUSR1 关闭并写出结果）")
+
+    def sector_summary(self):
+        """最新的板块汇总（累计自服务启动）"""
+        return self.sectors.summary()
+
+    def topic_trends(self):
+        """最新的主题趋势（主题ID跨 tick 稳定）"""
+        if not self.clusterer.is_trained:
+            return []
+        return self.topics.summary(self.clusterer.topics())
+
+    def sector_window(self, window="1h", now=None):
+        """板块在最近一个窗口内的 文章数/平均情绪/热度和/衰减热度；now 缺省为当前时间，没有新帖时窗口照常前移"""
+        return self.sector_windows.query(window, now=time.time() if now is None else now)
+
+    def topic_window(self, window="1h", now=None):
+        """主题在最近一个窗口内的 文章数/平均情绪/热度和/衰减热度；now 缺省为当前时间"""
+        return self.topic_windows.query(window, now=time.time() if now is None else now)
+
+    def latency_stats(self):
+        """tick 延迟统计（毫秒）"""
+        if not self.latencies:
+            return {}
+        values = np.asarray(self.latencies) * 1000
+        return {
+            "ticks": len(values),
+            "last_ms": round(float(values[-1]), 1),
+            "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p95_ms": round(float(np.percentile(values, 95)), 1),
+        }
+
+    def close(self):
+        # 退出时主题模型仍未训练：积压的文档不带主题随最后一批写入结果库
+        self._pending.extend(d for d, _ in self._topic_backlog)
+        self._topic_backlog = []
+        self.flush()
+        self.clusterer.save()
+        self.seen_index.close()
+        self.tokenizer.close()
+        self.crawler.close()
@@ -0,0 +1,206 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from analyzer import SentimentAnalyzer
+from lexicon import DEFAULT_DEGREES, DEFAULT_NEGATORS
+from dedup import duplicate_records
+from processor import DataProcessor
+from seen_index import ensure_post_id
+from tokenizer import TokenColumn, Tokenizer, domain_words, load_dictionary
+
+# 工作进程内常驻的处理器与分析器，由 _init_worker 构建一次
+_worker = {}
+
+
+def _init_worker(sector_keywords, positive_words, negative_words, dict_cache_dir=None, token_cache_path=None,
+                 negators=DEFAULT_NEGATORS, degrees=DEFAULT_DEGREES):
+    """工作进程初始化：加载 jieba 词典（含业务词）并构建处理器，每个进程只执行一次"""
+    user_words = domain_words(sector_keywords, positive_words, negative_words)
+    load_dictionary(dict_cache_dir, user_words)
+    _worker['processor'] = DataProcessor(sector_keywords)
+    # 分词缓存只读打开：多进程同时写同一 SQLite 文件会互相加锁，新结果交回父进程写入
+    _worker['analyzer'] = SentimentAnalyzer(positive_words, negative_words, tokenizer=Tokenizer(
+        cache_path=token_cache_path, user_words=user_words, readonly=True), negators=negators, degrees=degrees)
+
+
+def _ready(delay):
+    """空任务：工作进程完成初始化后才会执行，用于确认进程池已就绪"""
+    time.sleep(delay)
+    return os.getpid()
+
+
+def pack_strings(strings):
+    """将字符串列表编码为 (UTF-8 字节缓冲区, int64 偏移量)"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(buffer, offsets):
+    raw = buffer.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+def _process_chunk(texts, cleaned=False):
+    """
+    工作进程内：清洗 → 板块匹配 → 分词 → 情绪计数
+    cleaned=True 表示父进程已清洗过（近重复折叠需要），不再重复清洗，结果中也不回传清洗后文本
+    结果以 NumPy 数组返回，父进程据此组装 DataFrame；另附本块新分词的结果，由父进程写入分词缓存
+    """
+    processor = _worker['processor']
+    analyzer = _worker['analyzer']
+    if cleaned:
+        cleaned, lowered = texts, [t.lower() for t in texts]
+        packed = None
+    else:
+        cleaned, lowered = processor.clean_texts(texts)
+        packed = pack_strings(cleaned)
+
+    sector_mask = np.zeros((len(cleaned), len(processor.sectors)), dtype=bool)
+    for i, text in enumerate(lowered):
+        sector_mask[i, processor.match_sector_ids(text, lowered=True)] = True
+
+    tokenizer = analyzer.tokenizer
+    before = dict(tokenizer.stats)
+    tokens = tokenizer.tokenize(cleaned)
+    score, _, pos_count, neg_count = analyzer.score_tokens(tokens)
+    return {
+        "cleaned": packed,
+        "token_stats": {k: v - before[k] for k, v in tokenizer.stats.items()},
+        "unsaved": tokenizer.take_unsaved(),
+        "sectors": sector_mask,
+        "vocab": pack_strings(tokens.vocab),
+        "token_ids": tokens.ids,
+        "token_offsets": tokens.offsets,
+        "score": score,
+        "pos": pos_count,
+        "neg": neg_count,
+    }
+
+
+class ParallelPipeline:
+    """
+    分块多进程执行 清洗/板块匹配/分词/情绪分析，用于历史数据回填
+    输出与 DataProcessor.process + SentimentAnalyzer.analyze_dataframe 相同的列，
+    并返回合并后的 TokenColumn 供主题聚类复用
+    传入 deduplicator（NearDuplicateIndex）时先在父进程清洗并折叠近重复帖子，只分发代表帖，
+    被折叠帖子的 post_id 记录在 duplicates 中
+    传入 tokenizer（带磁盘缓存的 Tokenizer）时工作进程只读共享其分词缓存，新分词结果由父进程写回，
+    分词统计累加到 tokenizer.stats
+    start() 启动常驻进程池，之后多次 run 复用已加载词典的工作进程，close() 关闭；未启动时每次 run 临时建池
+    """
+    def __init__(self, sector_keywords, positive_words, negative_words, workers=None, chunk_size=5000,
+                 dict_cache_dir=None, deduplicator=None, tokenizer=None,
+                 negators=DEFAULT_NEGATORS, degrees=DEFAULT_DEGREES):
+        self.sector_keywords = sector_keywords
+        # 情绪词保留 {词: 权重} 形式，与否定词、程度副词一起原样传给工作进程，打分与串行路径一致
+        self.positive_words = dict(positive_words) if isinstance(positive_words, dict) else list(positive_words)
+        self.negative_words = dict(negative_words) if isinstance(negative_words, dict) else list(negative_words)
+        self.negators = list(negators or ())
+        self.degrees = dict(degrees or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.dict_cache_dir = dict_cache_dir
+        self.deduplicator = deduplicator
+        self.tokenizer = tokenizer
+        self.duplicates = []
+        # 父进程只做轻量的清洗去重与列组装，不加载 jieba
+        self._processor = DataProcessor(sector_keywords)
+        self._analyzer = SentimentAnalyzer(positive_words, negative_words)
+        self._sectors = list(sector_keywords)
+        self._executor = None
+
+    def _make_executor(self, workers):
+        cache_path = self.tokenizer.cache_path if self.tokenizer is not None else None
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.sector_keywords, self.positive_words, self.negative_words, self.dict_cache_dir,
+                      cache_path, self.negators, self.degrees),
+        )
+
+    def start(self):
+        """启动常驻进程池，并等待每个工作进程都完成初始化（加载 jieba 词典）"""
+        if self._executor is None:
+            self._executor = self._make_executor(self.workers)
+            pids = set()
+            while len(pids) < self.workers:
+                pids.update(self._executor.map(_ready, [0.01] * self.workers))
+        return self
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _assemble(self, raw_data, parts, dup_count=None, cleaned=None):
+        import pandas as pd
+        if cleaned is None:
+            cleaned = []
+            for part in parts:
+                cleaned.extend(unpack_strings(*part["cleaned"]))
+        sector_mask = np.concatenate([part["sectors"] for part in parts])
+        tokens = TokenColumn.concat([
+            TokenColumn(unpack_strings(*part["vocab"]), part["token_ids"], part["token_offsets"])
+            for part in parts
+        ])
+        score = np.concatenate([part["score"] for part in parts])
+
+        df = pd.DataFrame(raw_data)
+        df['post_id'] = [ensure_post_id(item) for item in raw_data]
+        df['cleaned_content'] = cleaned
+        # 如果没有匹配到任何板块，默认标记为"其他"
+        df['matched_sectors'] = [
+            [self._sectors[j] for j in np.flatnonzero(row)] or ["其他"] for row in sector_mask
+        ]
+        df['sentiment_score'] = score
+        df['sentiment_label'] = np.select([score > 0.1, score < -0.1], ["正面", "负面"], default="中性")
+        df['pos_words'] = np.concatenate([part["pos"] for part in parts])
+        df['neg_words'] = np.concatenate([part["neg"] for part in parts])
+        if dup_count is not None:
+            df['dup_count'] = dup_count
+        df['heat_index'] = self._analyzer.calculate_heat_batch(df)
+        return df, tokens
+
+    def run(self, raw_data, seen_index=None):
+        """返回 (分析后的 DataFrame, TokenColumn)"""
+        import pandas as pd
+        if seen_index is not None:
+            raw_data = seen_index.filter_new(raw_data)
+        raw_data = list(raw_data)
+        self.duplicates = []
+        texts = [DataProcessor.full_text(item) for item in raw_data]
+        dup_count = cleaned = None
+        if self.deduplicator is not None and raw_data:
+            # 近重复折叠需要清洗后的文本，清洗结果直接发给工作进程
+            cleaned, _ = self._processor.clean_texts(texts)
+            keep, dup_count = self.deduplicator.mark_duplicates(cleaned)
+            self.duplicates = duplicate_records(item for item, kept in zip(raw_data, keep) if not kept)
+            raw_data = [item for item, kept in zip(raw_data, keep) if kept]
+            cleaned = [text for text, kept in zip(cleaned, keep) if kept]
+            texts = cleaned
+            dup_count = dup_count[keep]
+        if not raw_data:
+            return pd.DataFrame(), TokenColumn([], np.zeros(0, dtype=np.int32), np.zeros(1, dtype=np.int64))
+
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        flags = [cleaned is not None] * len(chunks)
+        if self._executor is not None:
+            parts = list(self._executor.map(_process_chunk, chunks, flags))
+        else:
+            with self._make_executor(min(self.workers, len(chunks))) as executor:
+                parts = list(executor.map(_process_chunk, chunks, flags))
+        if self.tokenizer is not None:
+            for part in parts:
+                self.tokenizer.save_entries(part["unsaved"])
+                for key, value in part["token_stats"].items():
+                    self.tokenizer.stats[key] += value
+        return self._assemble(raw_data, parts, dup_count, cleaned)
@@ -1,9 +1,78 @@
 import re
-import pandas as pd
+from seen_index import ensure_post_id
+
+# HTML 标签（与 <.*?> 等价）；必须先于 URL 删除，否则紧贴在 URL 后的标签会被 URL 吞掉一部分，残留属性文本
+_TAG_RE = re.compile(r'<[^>\n]*>')
+_URL_RE = re.compile(r'https?://\S+')
+# 保留的字符：中英文和数字；连续片段之间以单个空格连接，等价于“替换为空格再合并空格”
+_KEEP_RE = re.compile(r'[\u4e00-\u9fa5a-zA-Z0-9]+')
+
+
+class KeywordAutomaton:
+    """
+    Aho–Corasick 多模式匹配自动机
+    构建一次后，单次扫描文本即可找出所有关键词的出现位置，
+    耗时与关键词数量无关，只与文本长度和命中次数相关
+    """
+    def __init__(self, patterns):
+        # patterns: {关键词(已小写): 附带数据}
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for word, payload in patterns.items():
+            self._insert(word, payload)
+        self._build_failure_links()
+
+    def _insert(self, word, payload):
+        node = 0
+        for ch in word:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append((word, payload))
+
+    def _build_failure_links(self):
+        # BFS：失败指针指向最长的真后缀状态，并合并其输出
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    def iter_matches(self, text):
+        """逐个产出 (起始位置, 结束位置, 关键词, 附带数据)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                for word, payload in output[node]:
+                    yield i - len(word) + 1, i + 1, word, payload
+
 
 class DataProcessor:
     def __init__(self, sector_keywords):
         self.sector_keywords = sector_keywords
+        self._sectors = list(sector_keywords)
+        # 关键词 -> 所属板块序号（同一关键词可属于多个板块，如“芯片”）
+        patterns = {}
+        for idx, keywords in enumerate(sector_keywords.values()):
+            for kw in keywords:
+                if kw:
+                    patterns.setdefault(kw.lower(), []).append(idx)
+        self._automaton = KeywordAutomaton(patterns)
 
     def clean_text(self, text):
         """
@@ -11,43 +80,80 @@ class DataProcessor:
         """
         if not text:
             return ""
-        # 去除HTML标签
-        text = re.sub(r'<.*?>', '', text)
-        # 去除URL
-        text = re.sub(r'http[s]?://\S+', '', text)
-        # 去除特殊字符，保留中英文和数字
-        text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', ' ', text)
-        # 合并多个空格
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
-
-    def match_sectors(self, text):
+        # 依次去除HTML标签和URL，再提取中英文数字片段并以单个空格连接
+        return " ".join(_KEEP_RE.findall(_URL_RE.sub('', _TAG_RE.sub('', text))))
+
+    def clean_texts(self, texts):
         """
-        根据关键词匹配板块
+        批量清洗，同时返回小写形式供板块匹配使用：(清洗后文本列表, 小写文本列表)
         """
-        matched = []
-        for sector, keywords in self.sector_keywords.items():
-            for kw in keywords:
-                if kw.lower() in text.lower():
-                    matched.append(sector)
-                    break
-        return matched
+        cleaned = [self.clean_text(t) for t in texts]
+        return cleaned, [t.lower() for t in cleaned]
+
+    def clean_column(self, series):
+        """
+        对 pandas 字符串列批量清洗，返回 (清洗后列, 小写列)，索引与输入一致
+        """
+        import pandas as pd
+        cleaned, lowered = self.clean_texts(series.fillna('').astype(str).tolist())
+        return pd.Series(cleaned, index=series.index), pd.Series(lowered, index=series.index)
+
+    @property
+    def sectors(self):
+        return self._sectors
+
+    def match_sector_ids(self, text, lowered=False):
+        """
+        返回命中板块在 sector_keywords 中的序号（升序）
+        lowered=True 表示 text 已是小写形式，不再重复转换
+        """
+        hit = set()
+        for _, _, _, sector_ids in self._automaton.iter_matches(text if lowered else text.lower()):
+            hit.update(sector_ids)
+        return sorted(hit)
+
+    def match_sectors(self, text, lowered=False):
+        """
+        根据关键词匹配板块，按 sector_keywords 的顺序返回
+        """
+        return [self._sectors[idx] for idx in self.match_sector_ids(text, lowered)]
+
+    def match_sectors_detail(self, text):
+        """
+        返回每个命中板块的关键词出现次数与位置，可用于加权
+        {板块: {"count": 次数, "positions": [(起始, 结束, 关键词), ...]}}
+        """
+        detail = {}
+        for start, end, word, sector_ids in self._automaton.iter_matches(text.lower()):
+            for idx in sector_ids:
+                entry = detail.setdefault(idx, {"count": 0, "positions": []})
+                entry["count"] += 1
+                entry["positions"].append((start, end, word))
+        return {self._sectors[idx]: detail[idx] for idx in sorted(detail)}
+
+    @staticmethod
+    def full_text(item):
+        return (item.get('title', '') + " " + item.get('content', '')).strip()
 
-    def process(self, raw_data):
+    def process(self, raw_data, seen_index=None):
         """
         处理原始数据列表
+        传入 seen_index 时跳过此前已处理过的条目，只处理增量
         """
+        import pandas as pd
+        if seen_index is not None:
+            raw_data = seen_index.filter_new(raw_data)
         processed_data = []
-        for item in raw_data:
-            full_text = (item.get('title', '') + " " + item.get('content', '')).strip()
-            cleaned_text = self.clean_text(full_text)
-            sectors = self.match_sectors(cleaned_text)
+        cleaned, lowered = self.clean_texts([self.full_text(item) for item in raw_data])
+        for item, cleaned_text, lowered_text in zip(raw_data, cleaned, lowered):
+            sectors = self.match_sectors(lowered_text, lowered=True)
             
             # 如果没有匹配到任何板块，默认标记为"其他"
             if not sectors:
                 sectors = ["其他"]
                 
             processed_item = item.copy()
+            ensure_post_id(processed_item)
             processed_item['cleaned_content'] = cleaned_text
             processed_item['matched_sectors'] = sectors
             processed_data.append(processed_item)
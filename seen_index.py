@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+# 归一化时去除空白与标点，避免转载时的格式差异产生不同指纹
+_NORMALIZE_RE = re.compile(r'[\W_]+')
+
+
+def normalize_text(text):
+    return _NORMALIZE_RE.sub('', (text or '').lower())
+
+
+def make_post_id(item):
+    """
+    帖子指纹：平台 + 归一化标题/内容 的 SHA1
+    同一平台上被多个搜索关键词命中的同一帖子得到相同 post_id
+    """
+    key = "\x1f".join([
+        item.get('platform', ''),
+        normalize_text(item.get('title', '')),
+        normalize_text(item.get('content', '')),
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def ensure_post_id(item):
+    if not item.get('post_id'):
+        item['post_id'] = make_post_id(item)
+    return item['post_id']
+
+
+def dedupe_records(items):
+    """去除同一批次内 post_id 重复的条目，保留首次出现的顺序"""
+    seen = set()
+    unique = []
+    for item in items:
+        post_id = ensure_post_id(item)
+        if post_id in seen:
+            continue
+        seen.add(post_id)
+        unique.append(item)
+    return unique
+
+
+class SeenIndex:
+    """
+    持久化的已处理帖子索引（SQLite），跨运行记录 post_id
+    只有 mark() 会写入，filter_new() 仅做查询
+    """
+    def __init__(self, path="state/seen_index.db"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            "post_id TEXT PRIMARY KEY, platform TEXT, first_seen REAL)"
+        )
+        self.conn.commit()
+
+    def __contains__(self, post_id):
+        row = self.conn.execute("SELECT 1 FROM seen WHERE post_id = ?", (post_id,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def _existing(self, post_ids, chunk_size=500):
+        existing = set()
+        for start in range(0, len(post_ids), chunk_size):
+            chunk = post_ids[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(f"SELECT post_id FROM seen WHERE post_id IN ({placeholders})", chunk)
+            existing.update(r[0] for r in rows)
+        return existing
+
+    def filter_new(self, items):
+        """返回索引中尚未出现过的条目"""
+        post_ids = [ensure_post_id(item) for item in items]
+        existing = self._existing(post_ids)
+        return [item for item, post_id in zip(items, post_ids) if post_id not in existing]
+
+    def mark(self, items):
+        """将已完成分析的条目写入索引"""
+        now = time.time()
+        rows = [(ensure_post_id(item), item.get('platform', ''), now) for item in items]
+        self.conn.executemany("INSERT OR IGNORE INTO seen VALUES (?, ?, ?)", rows)
+        self.conn.commit()
+        return len(rows)
+
+    def prune(self, max_age_days=30):
+        """删除超过 max_age_days 的记录，控制索引体积"""
+        cutoff = time.time() - max_age_days * 86400
+        cur = self.conn.execute("DELETE FROM seen WHERE first_seen < ?", (cutoff,))
+        self.conn.commit()
+        return cur.rowcount
+
+    def close(self):
+        self.conn.close()
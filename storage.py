@@ -0,0 +1,159 @@
+import os
+import uuid
+from datetime import datetime
+
+# 分区键：按日期、平台两级目录（hive 风格：date=2024-01-01/platform=Weibo）
+PARTITION_KEYS = ["date", "platform"]
+
+# 并非每次写入都有的列 -> 缺失时的填充值：流式模式逐批落盘时尚未分配主题（topic_id 为空），
+# 早期版本写入的文件没有 dup_count（视为 1）；写入时补齐，读取旧文件时同样补齐
+OPTIONAL_COLUMNS = {"topic_id": None, "dup_count": 1}
+
+
+def result_schema():
+    """
+    结果库的固定 schema（含分区列）：写入时统一转换为该 schema，读取时直接作为 Dataset 的 schema，
+    不再打开每个文件的 footer 推断合并，查询开销只取决于分区裁剪后命中的文件
+    """
+    import pyarrow as pa
+    return pa.schema([
+        ("title", pa.string()),
+        ("content", pa.string()),
+        ("time", pa.timestamp("us")),
+        ("platform", pa.string()),
+        ("likes", pa.int64()),
+        ("comments", pa.int64()),
+        ("post_id", pa.string()),
+        ("cleaned_content", pa.string()),
+        ("matched_sectors", pa.list_(pa.string())),
+        ("sentiment_score", pa.float64()),
+        ("sentiment_label", pa.dictionary(pa.int32(), pa.string())),
+        ("pos_words", pa.int64()),
+        ("neg_words", pa.int64()),
+        ("heat_index", pa.float64()),
+        ("dup_count", pa.int64()),
+        ("topic_id", pa.int64()),
+        ("date", pa.string()),
+    ])
+
+
+def partitioning():
+    # pyarrow 在读写结果库时才导入，缩短启动时间
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([(key, pa.string()) for key in PARTITION_KEYS]), flavor="hive")
+
+
+class ResultStore:
+    """
+    分析结果库：每次运行追加写入按 日期/平台 分区的 Parquet 文件，不覆盖历史
+    matched_sectors 存为原生 list<string> 列，sentiment_label 存为字典编码列，
+    读取时分区裁剪 + 谓词下推，并以内存映射方式加载
+    """
+    def __init__(self, root="results"):
+        self.root = root
+
+    def _to_table(self, df):
+        import pandas as pd
+        import pyarrow as pa
+        df = df.copy()
+        df['time'] = pd.to_datetime(df['time'], errors='coerce')
+        fallback = datetime.now().strftime("%Y-%m-%d")
+        df['date'] = df['time'].dt.strftime("%Y-%m-%d").fillna(fallback)
+        df['matched_sectors'] = df['matched_sectors'].apply(list)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # 按固定 schema 选列并转换类型，缺失的列补默认值（OPTIONAL_COLUMNS 之外的补空值）
+        schema = result_schema()
+        columns = [
+            table[field.name] if field.name in table.column_names
+            else pa.array([OPTIONAL_COLUMNS.get(field.name)] * len(table), type=field.type)
+            for field in schema
+        ]
+        return pa.Table.from_arrays(columns, names=schema.names).cast(schema)
+
+    def append(self, df, run_id=None):
+        """追加一批结果，返回本次写入的运行 ID"""
+        if df.empty:
+            return None
+        import pyarrow.dataset as ds
+        run_id = run_id or datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        ds.write_dataset(
+            self._to_table(df),
+            self.root,
+            format="parquet",
+            partitioning=partitioning(),
+            basename_template=f"part-{run_id}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        return run_id
+
+    def _filter(self, platforms=None, start=None, end=None):
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        expr = None
+
+        def combine(current, new):
+            return new if current is None else current & new
+
+        if platforms:
+            expr = combine(expr, ds.field('platform').isin(list(platforms)))
+        if start is not None:
+            start = pd.Timestamp(start)
+            # 先按日期分区裁剪，再按时间列精确过滤（利用行组统计信息下推）
+            expr = combine(expr, ds.field('date') >= start.strftime("%Y-%m-%d"))
+            expr = combine(expr, ds.field('time') >= pa.scalar(start.to_pydatetime()))
+        if end is not None:
+            end = pd.Timestamp(end)
+            expr = combine(expr, ds.field('date') <= end.strftime("%Y-%m-%d"))
+            expr = combine(expr, ds.field('time') < pa.scalar(end.to_pydatetime()))
+        return expr
+
+    def dataset(self):
+        """
+        结果库的 pyarrow Dataset，使用固定 schema：早期文件缺少的列读为空值，
+        不必为推断 schema 打开所有文件
+        """
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+        filesystem = fs.LocalFileSystem(use_mmap=True)
+        return ds.dataset(self.root, schema=result_schema(), format="parquet", partitioning=partitioning(),
+                          filesystem=filesystem)
+
+    def read_table(self, sectors=None, platforms=None, start=None, end=None, columns=None):
+        """
+        按板块、平台、时间范围 [start, end) 查询历史结果，返回 pyarrow.Table
+        """
+        if not os.path.isdir(self.root):
+            return None
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        if sectors and columns is not None and 'matched_sectors' not in columns:
+            columns = list(columns) + ['matched_sectors']
+        table = self.dataset().to_table(columns=columns, filter=self._filter(platforms, start, end))
+        for name, default in OPTIONAL_COLUMNS.items():
+            if default is not None and name in table.column_names:
+                idx = table.schema.get_field_index(name)
+                table = table.set_column(idx, name, pc.fill_null(table[name], default))
+        if sectors:
+            # 列表列无法做统计下推：展开后标记命中的行，再取子集
+            sector_lists = table['matched_sectors']
+            hit = pc.is_in(pc.list_flatten(sector_lists), value_set=pa.array(list(sectors)))
+            # 父索引单调递增，去重后仍保持原有行序
+            rows = pc.unique(pc.filter(pc.list_parent_indices(sector_lists), hit))
+            table = table.take(rows)
+        return table
+
+    def read(self, sectors=None, platforms=None, start=None, end=None, columns=None):
+        """同 read_table，返回 pandas DataFrame"""
+        table = self.read_table(sectors, platforms, start, end, columns)
+        if table is None:
+            import pandas as pd
+            return pd.DataFrame()
+        return table.to_pandas()
+
+
+if __name__ == "__main__":
+    store = ResultStore("results")
+    df = store.read(sectors=["人工智能"], columns=["time", "platform", "title", "matched_sectors", "sentiment_score"])
+    print(df)
@@ -0,0 +1,193 @@
+from itertools import islice
+import numpy as np
+from clusterer import summarize_topic
+from metrics import DISABLED
+from tokenizer import TokenColumn
+
+
+def batched(iterable, size):
+    """将可迭代对象按 size 切成小批次列表"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class SectorAggregator:
+    """
+    按板块累计 情绪得分和 / 热度和 / 文章数，
+    summary() 产出与批处理模式 sector_summary 相同结构的表
+    """
+    def __init__(self):
+        self._totals = {}
+
+    def update(self, df):
+        for sectors, score, heat in zip(df['matched_sectors'], df['sentiment_score'], df['heat_index']):
+            for sector in sectors:
+                totals = self._totals.setdefault(sector, [0.0, 0.0, 0])
+                totals[0] += score
+                totals[1] += heat
+                totals[2] += 1
+
+    def add_heat(self, df):
+        """只累加热度（后续批次到达的近重复副本），文章数与情绪不变"""
+        for sectors, heat in zip(df['matched_sectors'], df['heat_index']):
+            for sector in sectors:
+                totals = self._totals.get(sector)
+                if totals is not None:
+                    totals[1] += heat
+
+    def summary(self):
+        import pandas as pd
+        sectors = sorted(self._totals)
+        summary = pd.DataFrame({
+            '平均情绪得分': [self._totals[s][0] / self._totals[s][2] for s in sectors],
+            '总热度': [self._totals[s][1] for s in sectors],
+            '文章数量': [self._totals[s][2] for s in sectors],
+        }, index=pd.Index(sectors, name='matched_sectors'))
+        return summary
+
+
+class TopicAggregator:
+    """
+    按主题ID累计 情绪得分和 / 热度和 / 文章数，用于持续更新的主题趋势
+    主题ID来自持久化的增量主题模型，跨批次保持稳定
+    """
+    def __init__(self):
+        self._totals = {}
+
+    def update(self, df):
+        for topic_id, score, heat in zip(df['topic_id'], df['sentiment_score'], df['heat_index']):
+            totals = self._totals.setdefault(int(topic_id), [0.0, 0.0, 0])
+            totals[0] += score
+            totals[1] += heat
+            totals[2] += 1
+
+    def add_heat(self, df):
+        """只累加热度；代表帖尚未分配主题的行跳过"""
+        if 'topic_id' not in df:
+            return
+        for topic_id, heat in zip(df['topic_id'], df['heat_index']):
+            totals = self._totals.get(topic_id) if topic_id == topic_id else None
+            if totals is not None:
+                totals[1] += heat
+
+    def summary(self, topics_info):
+        trend_summary = []
+        for topic in topics_info:
+            totals = self._totals.get(topic['topic_id'])
+            if totals is None:
+                continue
+            trend_summary.append(summarize_topic(topic, totals[2], totals[0] / totals[2], totals[1]))
+        return trend_summary
+
+
+class TopicCorpus:
+    """
+    主题聚类所需的最小语料：分词结果（TokenColumn）与情绪得分、热度，
+    只保留最近 max_docs 篇，内存占用有上限
+    """
+    def __init__(self, max_docs=100000):
+        self.max_docs = max_docs
+        self._tokens = []
+        self._scores = []
+        self._heats = []
+        self._post_ids = []
+        # post_id -> (所在批次的热度数组, 行号)，供 add_heat 补记副本热度
+        self._rows = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, tokens, df):
+        self._tokens.append(tokens)
+        self._scores.append(df['sentiment_score'].to_numpy())
+        heats = df['heat_index'].to_numpy(dtype=np.float64, copy=True)
+        self._heats.append(heats)
+        post_ids = df['post_id'].tolist() if 'post_id' in df else []
+        self._post_ids.append(post_ids)
+        for row, post_id in enumerate(post_ids):
+            self._rows[post_id] = (heats, row)
+        self._size += len(tokens)
+        # 超出上限时整批丢弃最早的文档
+        while self._size - len(self._tokens[0]) >= self.max_docs:
+            self._size -= len(self._tokens.pop(0))
+            self._scores.pop(0)
+            self._heats.pop(0)
+            for post_id in self._post_ids.pop(0):
+                self._rows.pop(post_id, None)
+
+    def add_heat(self, df):
+        """把后续批次到达的近重复副本的热度加到语料中的代表帖上"""
+        for post_id, heat in zip(df['post_id'], df['heat_index']):
+            location = self._rows.get(post_id)
+            if location is not None:
+                location[0][location[1]] += heat
+
+    def tokens(self):
+        return TokenColumn.concat(self._tokens)
+
+    def frame(self):
+        import pandas as pd
+        if not self._tokens:
+            return pd.DataFrame({'sentiment_score': [], 'heat_index': []})
+        return pd.DataFrame({
+            'sentiment_score': np.concatenate(self._scores),
+            'heat_index': np.concatenate(self._heats),
+        })
+
+
+class StreamingPipeline:
+    """
+    流式执行 清洗/板块匹配 → 近重复折叠 → 分词 → 情绪分析：
+    记录按 batch_size 小批次流过各阶段，逐批产出分析后的 DataFrame，
+    全程只在内存中保留板块汇总与主题语料
+    传入 deduplicator（NearDuplicateIndex）时跨批次折叠近重复帖子，被折叠的帖子由 take_duplicates() 取出
+    """
+    def __init__(self, processor, analyzer, tokenizer, seen_index=None, batch_size=50, max_topic_docs=100000,
+                 metrics=None, deduplicator=None):
+        self.processor = processor
+        self.analyzer = analyzer
+        self.tokenizer = tokenizer
+        self.seen_index = seen_index
+        self.batch_size = batch_size
+        self.sectors = SectorAggregator()
+        self.corpus = TopicCorpus(max_docs=max_topic_docs)
+        self.processed = 0
+        self.metrics = metrics or DISABLED
+        self.deduplicator = deduplicator
+        self._duplicates = []
+
+    def take_duplicates(self):
+        """取出（并清空）自上次调用以来被折叠的帖子 [{"post_id", "platform"}]"""
+        duplicates, self._duplicates = self._duplicates, []
+        return duplicates
+
+    def run(self, records):
+        for batch in batched(records, self.batch_size):
+            with self.metrics.stage("process", rows=len(batch)):
+                df = self.processor.process(batch, seen_index=self.seen_index)
+            if self.deduplicator is not None:
+                with self.metrics.stage("dedup", rows=len(df)):
+                    df, duplicates = self.deduplicator.collapse(df)
+                self._duplicates.extend(duplicates)
+                self.metrics.inc("duplicates_total", len(duplicates))
+                hits = self.deduplicator.take_late_hits()
+                if hits:
+                    # 代表帖已在之前的批次中计入汇总，只补记增加的热度
+                    late = self.analyzer.late_duplicate_heat(hits)
+                    self.sectors.add_heat(late)
+                    self.corpus.add_heat(late)
+            if df.empty:
+                continue
+            with self.metrics.stage("tokenize", rows=len(df)):
+                tokens = self.tokenizer.tokenize(df['cleaned_content'])
+            with self.metrics.stage("analyze", rows=len(df)):
+                df = self.analyzer.analyze_dataframe(df, tokens=tokens)
+            self.sectors.update(df)
+            self.corpus.append(tokens, df)
+            self.processed += len(df)
+            yield df
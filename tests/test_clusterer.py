@@ -0,0 +1,79 @@
+import random
+
+import numpy as np
+import pytest
+
+from clusterer import TOPIC_MODES, TopicClusterer, model_filename
+from tokenizer import TokenColumn
+
+TOPIC_WORDS = [
+    ["芯片", "算力", "服务器", "大模型", "光刻", "晶圆", "制程", "封装"],
+    ["光伏", "储能", "锂电", "组件", "硅料", "逆变器", "电站", "装机"],
+    ["军工", "国防", "装备", "导弹", "战机", "雷达", "舰艇", "订单"],
+]
+BACKGROUND = ["市场", "资金", "机构", "板块", "行情", "投资者", "公司", "消息"]
+
+
+def make_corpus(n_docs, seed):
+    rng = random.Random(seed)
+    docs, labels = [], []
+    for _ in range(n_docs):
+        k = rng.randrange(len(TOPIC_WORDS))
+        docs.append(rng.choices(TOPIC_WORDS[k], k=12) + rng.choices(BACKGROUND, k=4))
+        labels.append(k)
+    return TokenColumn.from_token_lists(docs), np.array(labels)
+
+
+def make_clusterer(path, mode, **kwargs):
+    return TopicClusterer(n_topics=3, mode=mode, model_path=str(path), autosave=False, **kwargs)
+
+
+def majority_ids(assigned, labels):
+    """每个真实主题内多数文档被分到的主题ID"""
+    return [np.bincount(assigned[labels == k]).argmax() for k in range(len(TOPIC_WORDS))]
+
+
+@pytest.mark.parametrize("mode", TOPIC_MODES)
+def test_topics_survive_save_and_load(tmp_path, mode):
+    path = tmp_path / model_filename(mode)
+    tokens, labels = make_corpus(300, seed=1)
+    clusterer = make_clusterer(path, mode)
+    _, assigned = clusterer.fit_topics(None, tokens=tokens)
+    # 种植的三个主题各自落到不同的主题ID
+    assert len(set(majority_ids(assigned, labels))) == 3
+    clusterer.save()
+
+    loaded = make_clusterer(path, mode)
+    assert loaded.is_trained and loaded.n_docs_seen == clusterer.n_docs_seen
+    topics, reassigned = loaded.transform_topics(None, tokens=tokens)
+    assert topics == clusterer.topics()
+    assert (reassigned == assigned).all()
+
+
+@pytest.mark.parametrize("mode", TOPIC_MODES)
+def test_partial_fit_keeps_topic_ids(tmp_path, mode):
+    path = tmp_path / model_filename(mode)
+    tokens, labels = make_corpus(300, seed=1)
+    clusterer = make_clusterer(path, mode)
+    _, assigned = clusterer.fit_topics(None, tokens=tokens)
+    before = majority_ids(assigned, labels)
+    clusterer.save()
+
+    # 重新加载后用新一批文档增量更新，原有文档的主题ID保持不变
+    loaded = make_clusterer(path, mode)
+    new_tokens, new_labels = make_corpus(200, seed=2)
+    _, new_assigned = loaded.fit_topics(None, tokens=new_tokens)
+    assert majority_ids(new_assigned, new_labels) == before
+    _, reassigned = loaded.transform_topics(None, tokens=tokens)
+    assert (reassigned == assigned).mean() >= 0.95
+
+
+def test_mismatched_model_is_ignored(tmp_path):
+    path = tmp_path / model_filename("lda")
+    tokens, _ = make_corpus(100, seed=1)
+    clusterer = make_clusterer(path, "lda")
+    clusterer.fit_topics(None, tokens=tokens)
+    clusterer.save()
+    assert not TopicClusterer(n_topics=4, mode="lda", model_path=str(path)).is_trained
+    # 不同模式的模型保存在不同文件中
+    assert model_filename("kmeans") != model_filename("lda")
@@ -0,0 +1,300 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from archive import PayloadArchive
+from crawler import PLATFORMS, BrowserPool, FinanceCrawler, HttpClient, ReplayCrawler, TokenBucket
+
+KEYWORDS = ["芯片", "光伏", "军工"]
+
+# 每个请求在服务端停留的时间，让并发请求有机会重叠
+DELAY = 0.1
+
+
+def render(platform, keyword):
+    """各平台搜索结果页夹具：每页两条，正文里带关键词便于核对顺序"""
+    if platform == "THS":
+        return "".join(f'<div class="result-item"><h3>{keyword}快讯{i}</h3><p>{keyword}板块走强{i}</p></div>'
+                       for i in range(2))
+    if platform == "EastMoney":
+        return "".join(f'<div class="article_item"><span class="title">{keyword}股吧{i}</span></div>'
+                       for i in range(2))
+    if platform == "Xueqiu":
+        return "".join(f'<div class="status-item">{keyword}讨论{i}</div>' for i in range(2))
+    cards = [{"card_type": 9, "mblog": {"text": f"{keyword}微博{i}", "attitudes_count": i, "comments_count": i}}
+             for i in range(2)]
+    return json.dumps({"data": {"cards": cards}}, ensure_ascii=False)
+
+
+class FixtureServer:
+    """本地 HTML / JSON 夹具服务，记录各平台同时在处理的请求数峰值"""
+    def __init__(self):
+        self.in_flight = {}
+        self.peak = {}
+        # /flaky/<状态码>/<次数> 各路径已收到的请求数
+        self.hits = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                platform = parts.path.strip("/")
+                query = parse_qs(parts.query)
+                if platform.startswith(("status/", "flaky/")):
+                    # status/<码> 固定返回该状态码（重试耗尽后仍失败的接口）；
+                    # flaky/<码>/<n> 前 n 次返回该状态码，之后返回 200；retry_after 参数作为 Retry-After 头
+                    _, code, *times = platform.split("/")
+                    with server._lock:
+                        hit = server.hits[platform] = server.hits.get(platform, 0) + 1
+                    status = 200 if times and hit > int(times[0]) else int(code)
+                    self.send_response(status)
+                    if status != 200 and "retry_after" in query:
+                        self.send_header("Retry-After", query["retry_after"][0])
+                    self.send_header("Content-Length", "2")
+                    self.end_headers()
+                    self.wfile.write(b"{}")
+                    return
+                if platform == "Weibo":
+                    keyword = query["containerid"][0].split("q=", 1)[1]
+                else:
+                    keyword = query["q"][0]
+                server.enter(platform)
+                try:
+                    time.sleep(DELAY)
+                    body = render(platform, keyword)
+                finally:
+                    server.leave(platform)
+                if platform != "Weibo":
+                    body = f"<html><body>{body}</body></html>"
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json" if platform == "Weibo" else "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def enter(self, platform):
+        with self._lock:
+            n = self.in_flight[platform] = self.in_flight.get(platform, 0) + 1
+            self.peak[platform] = max(self.peak.get(platform, 0), n)
+
+    def leave(self, platform):
+        with self._lock:
+            self.in_flight[platform] -= 1
+
+    def search_urls(self):
+        urls = {p: f"{self.base}/{p}?q={{keyword}}" for p in ("THS", "EastMoney", "Xueqiu")}
+        urls["Weibo"] = f"{self.base}/Weibo"
+        return urls
+
+
+@pytest.fixture
+def server():
+    srv = FixtureServer()
+    srv.thread.start()
+    yield srv
+    srv.httpd.shutdown()
+    srv.httpd.server_close()
+
+
+def make_crawler(server, **kwargs):
+    # 本地服务不需要限流
+    return FinanceCrawler(search_urls=server.search_urls(), http_client=HttpClient(default_rate=1000), **kwargs)
+
+
+def expected_order(platforms):
+    return [(kw, p) for kw in KEYWORDS for p in platforms]
+
+
+def record_order(records):
+    """按记录正文里的关键词还原 (关键词, 平台) 序列（每组两条）"""
+    pairs = []
+    for record in records:
+        keyword = next(kw for kw in KEYWORDS if kw in record["content"])
+        if not pairs or pairs[-1] != (keyword, record["platform"]):
+            pairs.append((keyword, record["platform"]))
+    return pairs
+
+
+@functools.lru_cache(maxsize=None)
+def browser_available():
+    async def probe():
+        pool = await BrowserPool([""], size=1).start()
+        await pool.close()
+    try:
+        asyncio.run(probe())
+        return True
+    except Exception:
+        return False
+
+
+def test_api_jobs_respect_semaphore_and_order(server):
+    crawler = make_crawler(server, concurrency={"Weibo": 2})
+    records = asyncio.run(crawler.crawl_async(KEYWORDS, ["Weibo"]))
+    crawler.close()
+    assert len(records) == 2 * len(KEYWORDS)
+    assert record_order(records) == expected_order(["Weibo"])
+    assert server.peak["Weibo"] == 2
+    assert [r["likes"] for r in records[:2]] == [0, 1]
+
+
+def test_run_dedupes_and_keeps_order(server):
+    crawler = make_crawler(server)
+    records = crawler.run(KEYWORDS + KEYWORDS[:1])
+    crawler.close()
+    # 浏览器不可用时浏览器平台不产出记录，只剩接口平台
+    platforms = PLATFORMS if browser_available() else ["Weibo"]
+    # 重复关键词命中的帖子只保留首次出现
+    assert record_order(records) == expected_order(platforms)
+    assert len({r["post_id"] for r in records}) == len(records)
+
+
+@pytest.mark.skipif(not browser_available(), reason="Chromium 不可用")
+def test_browser_pool_semaphores_and_order(server):
+    platforms = ["THS", "EastMoney", "Xueqiu", "Weibo"]
+    crawler = make_crawler(server, max_pages=3, concurrency={"THS": 1, "EastMoney": 2, "Xueqiu": 2, "Weibo": 2})
+    records = asyncio.run(crawler.crawl_async(KEYWORDS, platforms))
+    crawler.close()
+    assert record_order(records) == expected_order(platforms)
+    assert server.peak["THS"] == 1
+    assert server.peak["EastMoney"] <= 2 and server.peak["Xueqiu"] <= 2
+    ths = [r for r in records if r["platform"] == "THS"]
+    assert (ths[0]["title"], ths[0]["content"]) == ("芯片快讯0", "芯片板块走强0")
+
+
+@pytest.mark.skipif(not browser_available(), reason="Chromium 不可用")
+def test_shared_pool_is_reused(server):
+    crawler = make_crawler(server, max_pages=2)
+
+    async def crawl_twice():
+        async with BrowserPool(crawler.user_agents, size=2) as pool:
+            first = await crawler.crawl_async(KEYWORDS[:1], ["Xueqiu"], pool=pool)
+            second = await crawler.crawl_async(KEYWORDS[1:2], ["Xueqiu"], pool=pool)
+            return first, second, pool._browser is not None
+
+    first, second, alive = asyncio.run(crawl_twice())
+    crawler.close()
+    assert alive
+    assert record_order(first) == [("芯片", "Xueqiu")]
+    assert record_order(second) == [("光伏", "Xueqiu")]
+
+
+@pytest.mark.parametrize("platform, html, expected", [
+    # 关键词高亮的行内标签不拆行，摘要段落保留为内容
+    ("THS", '<div class="result-item"><h3><a>国产<em>芯片</em>迎来重大利好</a></h3><p>摘要：龙头订单<b>超预期</b></p></div>',
+     ("国产芯片迎来重大利好", "摘要：龙头订单超预期")),
+    ("Xueqiu", '<div class="status-item">今天<b>芯片</b>大涨，不<b>利好</b>的是估值<br>继续\n   持有</div>',
+     ("今天芯片大涨，不利好的是估值 继续 持有", "今天芯片大涨，不利好的是估值 继续 持有")),
+    ("EastMoney", '<div class="article_item"><span class="title">AI<em>算力</em>走强<!-- ad --></span></div>',
+     ("AI算力走强", "AI算力走强")),
+])
+def test_parse_inline_markup_like_inner_text(platform, html, expected):
+    items, failures = FinanceCrawler().parse_items(platform, f"<html><body>{html}</body></html>")
+    assert failures == 0
+    assert items == [expected + (None, None)]
+
+
+def test_failed_api_responses_are_not_archived(server, tmp_path):
+    urls = server.search_urls()
+    urls["Weibo"] = f"{server.base}/status/404"
+    archive = PayloadArchive(str(tmp_path / "archive"))
+    crawler = FinanceCrawler(search_urls=urls, http_client=HttpClient(default_rate=1000, max_retries=0),
+                             archive=archive)
+    assert crawler.fetch_weibo("芯片") == []
+    assert archive.stats()["fetches"] == 0
+    crawler.close()
+
+
+def test_recorded_fetches_replay_identically(server, tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    crawler = make_crawler(server, archive=PayloadArchive(archive_dir))
+    live = asyncio.run(crawler.crawl_async(KEYWORDS, ["Weibo"]))
+    crawler.close()
+    replay = ReplayCrawler(PayloadArchive(archive_dir))
+    replayed = asyncio.run(replay.crawl_async(KEYWORDS, ["Weibo"]))
+    replay.close()
+    assert replayed == live
+
+
+@pytest.mark.parametrize("code", [429, 500, 503])
+def test_transient_statuses_are_retried(server, code):
+    client = HttpClient(default_rate=1000, max_retries=3, backoff_base=0.01)
+    assert client.get(f"{server.base}/flaky/{code}/2").status_code == 200
+    stats, = client.stats().values()
+    assert (stats["requests"], stats["errors"], stats["retries"]) == (3, 2, 2)
+    client.close()
+
+
+def test_exhausted_retries_return_last_response(server):
+    client = HttpClient(default_rate=1000, max_retries=2, backoff_base=0.01)
+    assert client.get(f"{server.base}/status/503").status_code == 503
+    stats, = client.stats().values()
+    assert (stats["requests"], stats["errors"], stats["retries"]) == (3, 3, 2)
+    client.close()
+
+
+@pytest.mark.parametrize("code", [400, 403, 404])
+def test_client_errors_are_not_retried(server, code):
+    client = HttpClient(default_rate=1000, max_retries=3, backoff_base=0.01)
+    assert client.get(f"{server.base}/status/{code}").status_code == code
+    stats, = client.stats().values()
+    assert (stats["requests"], stats["errors"], stats["retries"]) == (1, 0, 0)
+    client.close()
+
+
+def test_retry_after_sets_minimum_backoff(server):
+    client = HttpClient(default_rate=1000, max_retries=1, backoff_base=0.01)
+    started = time.monotonic()
+    assert client.get(f"{server.base}/flaky/429/1?retry_after=1").status_code == 200
+    assert time.monotonic() - started >= 1.0
+    assert next(iter(client.stats().values()))["retries"] == 1
+    client.close()
+
+
+def test_connection_errors_are_retried_then_raised():
+    import requests
+    client = HttpClient(default_rate=1000, max_retries=2, backoff_base=0.01)
+    # 端口 9 上没有服务，连接被拒绝
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://127.0.0.1:9/")
+    stats, = client.stats().values()
+    assert (stats["requests"], stats["errors"], stats["retries"]) == (3, 3, 2)
+    client.close()
+
+
+def test_rate_limit_throttles_per_host(server):
+    # 每秒 5 个令牌、桶容量 5：前 5 个请求立即放行，其后每个约等待 0.2 秒
+    client = HttpClient(default_rate=5, max_retries=0)
+    started = time.monotonic()
+    for _ in range(8):
+        assert client.get(f"{server.base}/flaky/200/0").status_code == 200
+    elapsed = time.monotonic() - started
+    stats, = client.stats().values()
+    assert stats["requests"] == 8 and stats["throttles"] == 3
+    assert 0.5 <= stats["throttle_wait"] <= elapsed
+    client.close()
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.acquire() == 0.0 and bucket.acquire() == 0.0
+    wait = bucket.acquire()
+    assert 0.04 <= wait <= 0.05
+    time.sleep(0.1)
+    # 等待期间补充了 2 个令牌（不超过容量）
+    assert bucket.acquire() == 0.0 and bucket.acquire() == 0.0
+    assert bucket.acquire() > 0
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from analyzer import SentimentAnalyzer
+from dedup import NearDuplicateIndex
+
+TEXT = "今天芯片板块大涨，算力需求爆发，机构认为利好仍在积聚，资金持续涌入"
+
+
+def make_frame(rows):
+    return pd.DataFrame([{
+        "post_id": f"p{i}", "platform": "Weibo", "time": "2026-10-17 10:00:00", "likes": 50, "comments": 8,
+        "matched_sectors": ["人工智能"], "cleaned_content": text,
+    } for i, text in rows])
+
+
+def test_late_copies_add_the_same_heat_as_one_batch():
+    analyzer = SentimentAnalyzer([], [])
+    copies = [(0, TEXT), (1, TEXT + "！"), (2, TEXT + "！！"), (3, "光伏储能回调风险加大，短线承压资金流出明显")]
+
+    batch, _ = NearDuplicateIndex().collapse(make_frame(copies))
+    batch_heat = analyzer.calculate_heat_batch(batch)[0]
+    assert batch['dup_count'].tolist() == [3, 1]
+
+    index = NearDuplicateIndex()
+    first, _ = index.collapse(make_frame(copies[:1]))
+    heat = analyzer.calculate_heat_batch(first)[0]
+    assert index.take_late_hits() == []
+    for copy in copies[1:3]:
+        rest, duplicates = index.collapse(make_frame([copy]))
+        assert rest.empty and len(duplicates) == 1
+        late = analyzer.late_duplicate_heat(index.take_late_hits())
+        assert late['post_id'].tolist() == ["p0"]
+        heat += late['heat_index'].sum()
+    assert abs(heat - batch_heat) < 1e-9
+
+
+def test_annotate_adds_fields_to_late_hits():
+    index = NearDuplicateIndex()
+    index.collapse(make_frame([(0, TEXT)]))
+    index.annotate(["p0", "missing"], topic_id=[2, 5])
+    index.collapse(make_frame([(1, TEXT + "！")]))
+    (payload, old_count, new_count), = index.take_late_hits()
+    assert payload["topic_id"] == 2 and (old_count, new_count) == (1, 2)
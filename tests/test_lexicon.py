@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+import pytest
+
+from lexicon import LexiconEngine, load_lexicon
+from tokenizer import TokenColumn
+
+ENTRIES = {"利好": 1.0, "上涨": 1.0, "超预期": 2.0, "回调": -1.0, "风险": -2.0, "利好兑现": -1.5}
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return LexiconEngine(ENTRIES)
+
+
+@pytest.mark.parametrize("words, expected", [
+    (["利好"], (1.0, 0.0, 1, 0)),
+    (["不", "利好"], (0.0, 1.0, 0, 1)),
+    (["并非", "利好"], (0.0, 1.0, 0, 1)),
+    # jieba 把 不利好 切成 不利 / 好：词首粘连的单字否定词同样翻转极性
+    (["不利", "好"], (0.0, 1.0, 0, 1)),
+    (["没有", "风险"], (2.0, 0.0, 1, 0)),
+    # 双重否定
+    (["不", "是", "没有", "风险"], (0.0, 2.0, 0, 1)),
+    # 否定词超出 window（3 个词）或被分句边界隔开时不生效
+    (["不", "今天", "市场", "消息", "利好"], (1.0, 0.0, 1, 0)),
+    (["不", " ", "利好"], (1.0, 0.0, 1, 0)),
+])
+def test_negation(engine, words, expected):
+    assert engine.score_words(words) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("words, expected", [
+    (["大幅", "上涨"], (1.8, 0.0, 1, 0)),
+    (["略", "回调"], (0.0, 0.6, 0, 1)),
+    (["没有", "明显", "风险"], (3.0, 0.0, 1, 0)),
+    (["非常", "不", "利好"], (0.0, 1.8, 0, 1)),
+])
+def test_degree_modifiers(engine, words, expected):
+    assert engine.score_words(words) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("words, expected", [
+    # 短语可跨越多个词，超 在此是短语的一部分而非程度副词
+    (["超", "预期"], (2.0, 0.0, 1, 0)),
+    (["业绩", "超预期"], (2.0, 0.0, 1, 0)),
+    # 取最长匹配
+    (["利好", "兑现"], (0.0, 1.5, 0, 1)),
+    # 匹配必须在词边界结束
+    (["超", "预期值"], (0.0, 0.0, 0, 0)),
+    (["利好", "兑"], (1.0, 0.0, 1, 0)),
+])
+def test_phrases_across_tokens(engine, words, expected):
+    assert engine.score_words(words) == pytest.approx(expected)
+
+
+def test_score_column_matches_score_words(engine):
+    rng = random.Random(3)
+    vocabulary = ["利好", "利", "好", "超", "预期", "超预期", "兑现", "不", "并非", "不利", "大幅", "略",
+                  "上涨", "回调", "风险", "市场", "今天", " ", "没有", "明显"]
+    rows = [[rng.choice(vocabulary) for _ in range(rng.randint(0, 12))] for _ in range(500)]
+    pos, neg, n_pos, n_neg = engine.score_column(TokenColumn.from_token_lists(rows))
+    expected = np.array([engine.score_words(words) for words in rows])
+    assert np.allclose(pos, expected[:, 0]) and np.allclose(neg, expected[:, 1])
+    assert (n_pos == expected[:, 2]).all() and (n_neg == expected[:, 3]).all()
+
+
+def test_from_polarity_weights():
+    engine = LexiconEngine.from_polarity({"大涨": 2.0}, ["下跌"])
+    assert engine.score_words(["大涨", "后", "下跌"]) == (2.0, 1.0, 1, 1)
+    assert len(engine) == 2
+
+
+def test_load_lexicon(tmp_path):
+    path = tmp_path / "lexicon.txt"
+    path.write_text("# 注释\n利好 2.5\n\n走强\n", encoding="utf-8")
+    assert load_lexicon(str(path), default_weight=0.5) == {"利好": 2.5, "走强": 0.5}
@@ -0,0 +1,71 @@
+from monitor import MonitorDaemon
+from tokenizer import Tokenizer
+
+SECTOR_KEYWORDS = {"人工智能": ["AI", "算力", "芯片"], "新能源": ["光伏", "储能"], "军工": ["军工", "国防"]}
+POSITIVE_WORDS = ["利好", "大涨", "走强"]
+NEGATIVE_WORDS = ["回调", "风险"]
+
+TEXTS = [
+    "算力需求爆发，芯片订单排到明年",
+    "光伏组件价格企稳，储能装机创新高",
+    "国防预算增长，军工订单持续落地",
+    "AI 大模型密集发布，算力租赁价格走强",
+    "储能电站招标放量，光伏产业链利好",
+    "军工集团资产注入，国防装备换代加速",
+    "芯片国产替代提速，晶圆厂扩产大涨",
+    "光伏硅料价格回调，行业出清风险仍在",
+]
+
+
+def make_records(texts, start):
+    return [{"title": f"帖子{start + i}", "content": text, "platform": "Weibo", "likes": 10 + i, "comments": i,
+             "time": f"2026-10-17 10:{start + i:02d}:00"} for i, text in enumerate(texts)]
+
+
+def make_daemon(tmp_path, **kwargs):
+    return MonitorDaemon(["芯片"], SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS, state_dir=str(tmp_path / "state"),
+                         results_dir=str(tmp_path / "results"), **kwargs)
+
+
+def test_cold_start_backlog_gets_topics(tmp_path):
+    daemon = make_daemon(tmp_path, n_topics=3)
+    # 第一个 tick 不足 n_topics 篇，积压到第二个 tick 一起训练
+    assert daemon._analyze(make_records(TEXTS[:2], 0)) == 2
+    assert not daemon.clusterer.is_trained
+    assert daemon._analyze(make_records(TEXTS[2:], 2)) == 6
+
+    sector_count = int(daemon.sector_summary()['文章数量'].sum())
+    topic_count = sum(t['文章数'] for t in daemon.topic_trends())
+    assert sector_count == topic_count == len(TEXTS)
+    assert int(daemon.topic_window("1d", now=daemon.topic_windows.latest)['文章数量'].sum()) == len(TEXTS)
+
+    daemon.close()
+    stored = daemon.store.read()
+    assert len(stored) == len(TEXTS)
+    assert sorted(stored['title']) == sorted(r['title'] for r in make_records(TEXTS, 0))
+
+
+def test_ticks_are_buffered_into_few_files(tmp_path):
+    daemon = make_daemon(tmp_path, n_topics=2, flush_rows=6)
+    for start in range(0, len(TEXTS), 2):
+        assert daemon._analyze(make_records(TEXTS[start:start + 2], start)) == 2
+        # 尚未落盘的帖子再次抓到时同样跳过
+        assert daemon._analyze(make_records(TEXTS[start:start + 2], start)) == 0
+    assert len(daemon.seen_index) == 6
+    daemon.close()
+    assert len(daemon.store.read()) == len(TEXTS)
+    assert len(list((tmp_path / "results").rglob("*.parquet"))) == 2
+
+
+def test_token_cache_prune_drops_unused_entries(tmp_path):
+    # 不留内存 LRU，每次查询都落到磁盘缓存
+    tokenizer = Tokenizer(cache_path=str(tmp_path / "token_cache.db"), cache_size=0)
+    tokenizer.cut_many(TEXTS[:4])
+    conn = tokenizer._conn
+    conn.execute("UPDATE tokens SET used = used - 8 * 86400")
+    # 命中磁盘缓存的条目刷新使用时间，不会被清理
+    tokenizer.cut_many(TEXTS[2:4])
+    assert tokenizer.stats["disk_hits"] == 2
+    assert tokenizer.prune(max_age_days=7) == 2
+    assert tokenizer.cut_many(TEXTS[:4]) and tokenizer.stats["disk_hits"] == 4
+    tokenizer.close()
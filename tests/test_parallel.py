@@ -0,0 +1,42 @@
+import numpy as np
+
+from analyzer import SentimentAnalyzer
+from parallel import ParallelPipeline
+from processor import DataProcessor
+from tokenizer import Tokenizer, domain_words
+
+SECTOR_KEYWORDS = {"人工智能": ["AI", "算力", "芯片"], "新能源": ["光伏", "储能"]}
+POSITIVE_WORDS = {"利好": 3.0, "大涨": 2.0, "走强": 1.0}
+NEGATIVE_WORDS = {"回调": 1.0, "风险": 2.0}
+DEGREES = {"大幅": 2.0}
+
+RECORDS = [
+    {"title": "芯片利好", "content": "算力需求大幅走强，芯片大涨", "platform": "Weibo", "likes": 10, "comments": 3},
+    {"title": "光伏", "content": "光伏并非利好，储能回调风险加大", "platform": "Weibo", "likes": 1, "comments": 0},
+    {"title": "AI", "content": "AI 板块不会大涨，注意风险", "platform": "THS", "likes": 0, "comments": 5},
+]
+
+
+def test_workers_score_like_serial_path():
+    pipeline = ParallelPipeline(SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS, workers=2, chunk_size=2,
+                                negators=["并非", "不会"], degrees=DEGREES)
+    parallel_df, _ = pipeline.run([dict(r) for r in RECORDS])
+
+    tokenizer = Tokenizer(user_words=domain_words(SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS))
+    analyzer = SentimentAnalyzer(POSITIVE_WORDS, NEGATIVE_WORDS, tokenizer=tokenizer,
+                                 negators=["并非", "不会"], degrees=DEGREES)
+    serial_df = analyzer.analyze_dataframe(DataProcessor(SECTOR_KEYWORDS).process([dict(r) for r in RECORDS]))
+
+    assert np.allclose(parallel_df['sentiment_score'], serial_df['sentiment_score'])
+    assert parallel_df['matched_sectors'].tolist() == serial_df['matched_sectors'].tolist()
+
+
+def test_started_pool_is_reused_across_runs(tmp_path):
+    with ParallelPipeline(SECTOR_KEYWORDS, POSITIVE_WORDS, NEGATIVE_WORDS, workers=2, chunk_size=2,
+                          dict_cache_dir=str(tmp_path)) as pipeline:
+        executor = pipeline._executor
+        first, _ = pipeline.run([dict(r) for r in RECORDS])
+        second, _ = pipeline.run([dict(r) for r in RECORDS])
+        assert pipeline._executor is executor
+    assert pipeline._executor is None
+    assert np.allclose(first['sentiment_score'], second['sentiment_score'])
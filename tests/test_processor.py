@@ -0,0 +1,14 @@
+import pytest
+
+from processor import DataProcessor
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('详见https://t.cn/A6x<span class="hl">利好</span>', "详见"),
+    ('http://a.cn/x<a href="https://b.cn">链接</a> 芯片走强', "芯片走强"),
+    ('<p>AI<b>算力</b>爆发</p>', "AI算力爆发"),
+    ("光伏，储能！！😀 https://t.cn/abc 回调", "光伏 储能 回调"),
+    ("", ""),
+])
+def test_clean_text_strips_tags_before_urls(text, expected):
+    assert DataProcessor({}).clean_text(text) == expected
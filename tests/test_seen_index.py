@@ -0,0 +1,60 @@
+import time
+
+from seen_index import SeenIndex, dedupe_records, ensure_post_id, make_post_id
+
+
+def post(title, content="芯片板块走强", platform="Weibo"):
+    return {"title": title, "content": content, "platform": platform}
+
+
+def test_post_id_ignores_whitespace_case_and_punctuation():
+    base = make_post_id(post("AI 芯片大涨！", "算力需求爆发，订单排到明年"))
+    assert make_post_id(post("ai芯片大涨", "算力需求 爆发 订单排到明年。")) == base
+    assert make_post_id(post("  AI\t芯片大涨  ", "算力需求爆发\n订单排到明年")) == base
+    # 平台或正文不同即为不同帖子
+    assert make_post_id(post("AI 芯片大涨！", "算力需求爆发，订单排到明年", platform="THS")) != base
+    assert make_post_id(post("AI 芯片大涨！", "算力需求回落")) != base
+
+
+def test_ensure_post_id_keeps_existing_id():
+    item = post("标题")
+    assert ensure_post_id(item) == make_post_id(post("标题"))
+    assert ensure_post_id({"post_id": "fixed", **post("标题")}) == "fixed"
+
+
+def test_dedupe_records_keeps_first_occurrence():
+    items = [post("A"), post("B"), post("a "), post("A", platform="THS")]
+    assert [i["title"] for i in dedupe_records(items)] == ["A", "B", "A"]
+
+
+def test_filter_new_and_mark(tmp_path):
+    index = SeenIndex(str(tmp_path / "seen.db"))
+    first = [post("A"), post("B")]
+    assert index.filter_new(first) == first
+    assert index.mark(first) == 2
+    assert len(index) == 2 and make_post_id(post("A")) in index
+    # filter_new 只查询不写入；归一化后相同的帖子视为已处理
+    batch = [post(" a"), post("C")]
+    assert [i["title"] for i in index.filter_new(batch)] == ["C"]
+    assert [i["title"] for i in index.filter_new(batch)] == ["C"]
+    assert len(index) == 2
+    # 重复 mark 不产生重复记录
+    index.mark(first)
+    assert len(index) == 2
+    index.close()
+
+    # 索引跨运行保留
+    reopened = SeenIndex(str(tmp_path / "seen.db"))
+    assert [i["title"] for i in reopened.filter_new(batch)] == ["C"]
+    reopened.close()
+
+
+def test_prune_removes_only_old_entries(tmp_path):
+    index = SeenIndex(str(tmp_path / "seen.db"))
+    index.mark([post("old"), post("new")])
+    old_id = make_post_id(post("old"))
+    index.conn.execute("UPDATE seen SET first_seen = ? WHERE post_id = ?", (time.time() - 31 * 86400, old_id))
+    assert index.prune(max_age_days=30) == 1
+    assert old_id not in index and make_post_id(post("new")) in index
+    assert [i["title"] for i in index.filter_new([post("old"), post("new")])] == ["old"]
+    index.close()
@@ -0,0 +1,67 @@
+import pyarrow.parquet as pq
+import pandas as pd
+
+from storage import ResultStore
+
+
+def make_rows(post_id, **extra):
+    row = {
+        "title": "芯片走强", "content": "芯片走强", "time": "2026-10-17 10:00:00", "platform": "Weibo",
+        "likes": 1, "comments": 2, "post_id": post_id, "cleaned_content": "芯片走强", "matched_sectors": ["人工智能"],
+        "sentiment_score": 0.5, "sentiment_label": "正面", "heat_index": 1.0,
+    }
+    row.update(extra)
+    return pd.DataFrame([row])
+
+
+def test_read_keeps_columns_added_by_later_files(tmp_path):
+    store = ResultStore(str(tmp_path))
+    store.append(make_rows("old"))
+    # 模拟早期版本写入的文件：没有 topic_id / dup_count
+    path = next(tmp_path.rglob("*.parquet"))
+    pq.write_table(pq.read_table(path).drop_columns(["topic_id", "dup_count"]), path)
+    store.append(make_rows("new", topic_id=3, dup_count=4))
+
+    df = store.read().set_index("post_id")
+    assert df.loc["new", "topic_id"] == 3 and df.loc["new", "dup_count"] == 4
+    assert pd.isna(df.loc["old", "topic_id"]) and df.loc["old", "dup_count"] == 1
+
+    filtered = store.read(sectors=["人工智能"], platforms=["Weibo"], start="2026-10-17", end="2026-10-18",
+                          columns=["post_id", "dup_count"])
+    assert sorted(filtered["post_id"]) == ["new", "old"]
+
+
+def test_stream_batches_write_same_columns(tmp_path):
+    store = ResultStore(str(tmp_path))
+    # 流式模式逐批落盘时尚未分配主题
+    store.append(make_rows("stream", dup_count=2))
+    store.append(make_rows("batch", topic_id=1, dup_count=1))
+    schemas = [pq.read_schema(path) for path in tmp_path.rglob("*.parquet")]
+    fields = [{field.name: str(field.type) for field in schema} for schema in schemas]
+    assert len(fields) == 2 and fields[0] == fields[1]
+
+
+def test_partition_filter_skips_other_files(tmp_path):
+    store = ResultStore(str(tmp_path))
+    store.append(make_rows("weibo"))
+    store.append(make_rows("ths", platform="THS"))
+    # 其他分区的文件不应被打开：损坏后按平台查询仍然成功
+    next((tmp_path / "date=2026-10-17" / "platform=THS").glob("*.parquet")).write_bytes(b"corrupt")
+    assert store.read(platforms=["Weibo"])["post_id"].tolist() == ["weibo"]
+
+
+def test_reads_files_with_older_physical_types(tmp_path):
+    import pyarrow as pa
+    store = ResultStore(str(tmp_path))
+    store.append(make_rows("old"))
+    path = next(tmp_path.rglob("*.parquet"))
+    table = pq.read_table(path)
+    # 早期版本由 pandas 推断类型：large_string / 纳秒时间戳
+    table = table.cast(pa.schema([
+        pa.field(f.name, pa.large_string()) if f.type == pa.string()
+        else pa.field(f.name, pa.timestamp("ns")) if f.name == "time" else f
+        for f in table.schema
+    ]))
+    pq.write_table(table, path)
+    df = store.read(start="2026-10-17 09:00", end="2026-10-17 11:00")
+    assert df["post_id"].tolist() == ["old"] and df["likes"].tolist() == [1]
@@ -0,0 +1,47 @@
+from tokenizer import TokenColumn, Tokenizer, load_dictionary
+
+TEXT = "业绩超预期，国产替代提速"
+USER_WORDS = ["超预期", "国产替代"]
+
+
+def test_default_and_domain_tokenizers_do_not_reset_each_other():
+    domain = Tokenizer(user_words=USER_WORDS, cache_size=0)
+    plain = Tokenizer(cache_size=0)
+    # 交替分词：各自的词典互不影响
+    assert "超预期" in domain.cut(TEXT)
+    assert "超预期" not in plain.cut(TEXT)
+    assert "超预期" in domain.cut(TEXT)
+    assert "国产替代" in domain.cut(TEXT) and "国产替代" not in plain.cut(TEXT)
+    assert domain.stats["segmented"] == 3 and plain.stats["segmented"] == 2
+
+
+def test_dictionary_is_shared_per_word_set(tmp_path):
+    words = USER_WORDS + ["光模块"]
+    first = load_dictionary(str(tmp_path), words)
+    assert load_dictionary(None, list(reversed(words))) is first
+    assert load_dictionary(None, ()) is not first
+    assert (tmp_path / "jieba_dict.pkl").exists()
+
+
+def test_disk_cache_is_reused_and_invalidated_by_user_words(tmp_path):
+    path = str(tmp_path / "token_cache.db")
+    tokenizer = Tokenizer(cache_path=path, user_words=USER_WORDS)
+    words = tokenizer.cut(TEXT)
+    tokenizer.close()
+
+    reopened = Tokenizer(cache_path=path, user_words=USER_WORDS)
+    assert reopened.cut(TEXT) == words and reopened.stats["disk_hits"] == 1
+    reopened.close()
+    # 业务词变化后旧的分词结果作废
+    changed = Tokenizer(cache_path=path, user_words=USER_WORDS[:1])
+    changed.cut(TEXT)
+    assert changed.stats["disk_hits"] == 0 and changed.stats["segmented"] == 1
+    changed.close()
+
+
+def test_token_column_concat_remaps_ids():
+    a = TokenColumn.from_token_lists([["芯片", "大涨"], []])
+    b = TokenColumn.from_token_lists([["光伏", "芯片"]])
+    merged = TokenColumn.concat([a, b])
+    assert list(merged) == [["芯片", "大涨"], [], ["光伏", "芯片"]]
+    assert len(merged.vocab) == 3
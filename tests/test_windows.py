@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from windows import DECAY_PER_HOUR, WINDOWS, RollingWindow, WindowAggregator
+
+DECAY = DECAY_PER_HOUR / 3600
+START = pd.Timestamp("2026-10-17 09:00:00")
+
+
+def make_frame(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    n = len(seconds)
+    return pd.DataFrame({
+        "time": (START + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+        "matched_sectors": [list(rng.choice(["芯片", "光伏", "军工"], size=rng.integers(1, 3), replace=False))
+                            for _ in range(n)],
+        "sentiment_score": rng.uniform(-1, 1, n),
+        "heat_index": rng.uniform(0, 10, n),
+    })
+
+
+def brute_force(df, window, now, n_buckets=60):
+    """对全部历史重新 explode / 过滤 / 分组：窗口按桶对齐，覆盖 now 所在桶及之前 n_buckets - 1 个桶"""
+    width = WINDOWS[window] / n_buckets
+    rows = df.explode("matched_sectors", ignore_index=True)
+    t = WindowAggregator.to_epoch(rows["time"])
+    live = (t // width > now // width - n_buckets) & (t <= now)
+    rows = rows.assign(decayed=rows["heat_index"] * np.exp(-DECAY * (now - t)))[live]
+    summary = rows.groupby("matched_sectors").agg(
+        文章数量=("heat_index", "size"), 平均情绪得分=("sentiment_score", "mean"),
+        总热度=("heat_index", "sum"), 衰减热度=("decayed", "sum"))
+    summary.index.name = "key"
+    return summary.sort_index()
+
+
+@pytest.mark.parametrize("window", list(WINDOWS))
+def test_batches_match_brute_force_regroup(window):
+    seconds = np.sort(np.random.default_rng(1).integers(0, 2 * 86400, 3000))
+    df = make_frame(seconds)
+    agg = WindowAggregator()
+    for start in range(0, len(df), 250):
+        agg.update(df.iloc[start:start + 250], "matched_sectors")
+        seen = df.iloc[:start + 250]
+        now = agg.latest + 17
+        result = agg.query(window, now=now)
+        expected = brute_force(seen, window, now)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-9)
+
+
+def test_batch_update_matches_row_by_row_adds():
+    df = make_frame(np.sort(np.random.default_rng(2).integers(0, 3 * 3600, 500)), seed=2)
+    batch, rows = WindowAggregator(), WindowAggregator()
+    batch.update(df, "matched_sectors")
+    for t, keys, score, heat in zip(WindowAggregator.to_epoch(df["time"]), df["matched_sectors"],
+                                    df["sentiment_score"], df["heat_index"]):
+        for key in keys:
+            rows.add(key, float(t), float(score), float(heat))
+    for window in WINDOWS:
+        pd.testing.assert_frame_equal(batch.query(window), rows.query(window), rtol=1e-9)
+
+
+def test_buckets_are_evicted_at_the_window_boundary():
+    window = RollingWindow(60, n_buckets=6, decay=0.0)
+    window.add(0.0, 1.0, 2.0)
+    window.add(35.0, -1.0, 3.0)
+    # 窗口覆盖 now 所在的桶及之前 5 个桶（每桶 10 秒）
+    assert window.snapshot(59.9)[0] == 2
+    assert window.snapshot(60.0)[:3] == (1, -1.0, 3.0)
+    assert window.snapshot(89.9)[0] == 1
+    assert window.snapshot(90.0) == (0, 0.0, 0.0, 0.0)
+    # 跨越很长时间后所有桶都已清空，迟到数据直接忽略
+    window.add(50.0, 1.0, 1.0)
+    assert window.snapshot(10_000.0) == (0, 0.0, 0.0, 0.0)
+
+
+def test_heat_decays_with_age():
+    window = RollingWindow(86400, decay=DECAY)
+    window.add(1000.0, 0.5, 10.0)
+    count, score, heat, decayed = window.snapshot(1000.0 + 3600)
+    assert (count, score, heat) == (1, 0.5, 10.0)
+    assert math.isclose(decayed, 10.0 * math.exp(-DECAY_PER_HOUR))
+
+
+def test_add_heat_keeps_counts():
+    df = make_frame(np.array([0, 30]))
+    agg = WindowAggregator()
+    agg.update(df.iloc[:1], "matched_sectors")
+    before = agg.query("1h")
+    agg.add_heat(df.iloc[:1].assign(heat_index=5.0), "matched_sectors")
+    after = agg.query("1h")
+    assert (after["文章数量"] == before["文章数量"]).all()
+    assert np.allclose(after["总热度"], before["总热度"] + 5.0)
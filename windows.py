@@ -0,0 +1,219 @@
+import math
+import time
+from datetime import datetime
+import numpy as np
+
+# 默认维护的滑动窗口（秒）
+WINDOWS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+# 热度时间衰减系数 λ（每小时），与 DESIGN.md 中 e^(-λ × 小时数) 一致
+DECAY_PER_HOUR = 0.05
+
+
+class RollingWindow:
+    """
+    单个时间窗口：把窗口切成 n_buckets 个等宽桶的环形数组
+    写入只更新所在桶和窗口总和（O(1)），时间推进时清掉过期桶并从总和中减去
+    同时维护按 e^(-λ·Δt) 衰减的热度和，查询时无需遍历历史
+    """
+    def __init__(self, span, n_buckets=60, decay=DECAY_PER_HOUR / 3600):
+        self.span = span
+        self.n_buckets = n_buckets
+        self.width = span / n_buckets
+        self.decay = decay
+        self._slot_bucket = [None] * n_buckets
+        self._count = [0] * n_buckets
+        self._score = [0.0] * n_buckets
+        self._heat = [0.0] * n_buckets
+        # 桶内热度按桶起点折算：Σ h·e^(λ(t - 桶起点))
+        self._decayed = [0.0] * n_buckets
+        self._head = None
+        self.count = 0
+        self.score_sum = 0.0
+        self.heat_sum = 0.0
+        # 衰减热度和及其对应的参考时刻
+        self._decayed_sum = 0.0
+        self._ref = None
+
+    def _rescale(self, t):
+        if self._ref is None:
+            self._ref = t
+        elif t > self._ref:
+            self._decayed_sum *= math.exp(-self.decay * (t - self._ref))
+            self._ref = t
+
+    def _evict(self, slot):
+        bucket = self._slot_bucket[slot]
+        if bucket is None:
+            return
+        self.count -= self._count[slot]
+        self.score_sum -= self._score[slot]
+        self.heat_sum -= self._heat[slot]
+        start = bucket * self.width
+        self._decayed_sum -= self._decayed[slot] * math.exp(-self.decay * (self._ref - start))
+        self._slot_bucket[slot] = None
+        self._count[slot] = 0
+        self._score[slot] = 0.0
+        self._heat[slot] = 0.0
+        self._decayed[slot] = 0.0
+
+    def advance(self, t):
+        """把窗口推进到时刻 t，清除已滑出窗口的桶"""
+        bucket = int(t // self.width)
+        if self._head is not None and bucket <= self._head:
+            return
+        self._rescale(t)
+        if self._head is None:
+            self._head = bucket
+            return
+        # 最多清理 n_buckets 个槽位，与跨越的时间长度无关
+        for b in range(max(self._head + 1, bucket - self.n_buckets + 1), bucket + 1):
+            self._evict(b % self.n_buckets)
+        self._head = bucket
+
+    def _add_bucket(self, bucket, count, score, heat, weighted):
+        """写入一个桶内的汇总；weighted = Σ h·e^(λ(t - 桶起点))"""
+        slot = bucket % self.n_buckets
+        if self._slot_bucket[slot] != bucket:
+            self._evict(slot)
+            self._slot_bucket[slot] = bucket
+        self._count[slot] += count
+        self._score[slot] += score
+        self._heat[slot] += heat
+        self._decayed[slot] += weighted
+        self._decayed_sum += weighted * math.exp(-self.decay * (self._ref - bucket * self.width))
+        self.count += count
+        self.score_sum += score
+        self.heat_sum += heat
+
+    def add(self, t, score, heat, count=1):
+        """写入 count 篇文章的情绪和与热度；count=0 时只补记热度"""
+        self.advance(t)
+        bucket = int(t // self.width)
+        if bucket <= self._head - self.n_buckets:
+            # 早于窗口起点的迟到数据直接忽略
+            return
+        self._add_bucket(bucket, count, score, heat, heat * math.exp(self.decay * (t - bucket * self.width)))
+
+    def add_many(self, t, score, heat, count=1):
+        """
+        批量写入（numpy 数组，每行 count 篇文章）：先推进到批内最晚时刻，再按桶汇总后逐桶写入，
+        结果与逐行 add 相同，每批的 Python 循环次数只与涉及的桶数有关
+        """
+        if not len(t):
+            return
+        self.advance(float(t.max()))
+        buckets = np.floor_divide(t, self.width).astype(np.int64)
+        live = buckets > self._head - self.n_buckets
+        if not live.all():
+            t, score, heat, buckets = t[live], score[live], heat[live], buckets[live]
+        unique, inverse = np.unique(buckets, return_inverse=True)
+        n = len(unique)
+        counts = np.bincount(inverse, minlength=n) * count
+        scores = np.bincount(inverse, weights=score, minlength=n)
+        heats = np.bincount(inverse, weights=heat, minlength=n)
+        weighted = np.bincount(inverse, weights=heat * np.exp(self.decay * (t - unique[inverse] * self.width)),
+                               minlength=n)
+        for bucket, c, s, h, w in zip(unique.tolist(), counts.tolist(), scores.tolist(), heats.tolist(),
+                                      weighted.tolist()):
+            self._add_bucket(bucket, c, s, h, w)
+
+    def snapshot(self, now):
+        """返回 (文章数, 平均情绪, 热度和, 衰减热度和)"""
+        self.advance(now)
+        if self.count <= 0:
+            return 0, 0.0, 0.0, 0.0
+        decayed = self._decayed_sum * math.exp(-self.decay * max(0.0, now - self._ref))
+        return self.count, self.score_sum / self.count, self.heat_sum, decayed
+
+
+class WindowAggregator:
+    """
+    按键（板块或主题ID）维护多个滑动窗口的 情绪均值 / 热度和 / 文章数 / 衰减热度
+    增量写入，不需要对全量历史重新 groupby
+    """
+    def __init__(self, windows=None, n_buckets=60, decay_per_hour=DECAY_PER_HOUR):
+        self.windows = dict(windows or WINDOWS)
+        self.n_buckets = n_buckets
+        self.decay = decay_per_hour / 3600
+        self._keys = {}
+        self.latest = None
+
+    def _windows(self, key):
+        windows = self._keys.get(key)
+        if windows is None:
+            windows = self._keys[key] = {
+                name: RollingWindow(span, self.n_buckets, self.decay) for name, span in self.windows.items()
+            }
+        return windows
+
+    def add(self, key, t, score, heat, count=1):
+        for window in self._windows(key).values():
+            window.add(t, score, heat, count)
+        if self.latest is None or t > self.latest:
+            self.latest = t
+
+    def add_many(self, key, t, score, heat, count=1):
+        """写入同一个键的一批数据（numpy 数组）"""
+        if not len(t):
+            return
+        for window in self._windows(key).values():
+            window.add_many(t, score, heat, count)
+        latest = float(t.max())
+        if self.latest is None or latest > self.latest:
+            self.latest = latest
+
+    @staticmethod
+    def to_epoch(times):
+        """将 time 列（本地时间字符串）转换为秒级时间戳，无法解析的记为当前时间"""
+        import pandas as pd
+        parsed = pd.to_datetime(pd.Series(times), errors='coerce', format='ISO8601')
+        tz = datetime.now().astimezone().tzinfo
+        # 不依赖 datetime64 的存储精度（秒/纳秒）
+        epoch = (parsed.dt.tz_localize(tz) - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)
+        return np.where(parsed.isna(), time.time(), epoch.to_numpy(dtype=float, na_value=0.0))
+
+    def _group_rows(self, df, key_column):
+        """按键分组的行号；key_column 为列表列（如 matched_sectors）时每个元素各记一次"""
+        groups = {}
+        for i, keys in enumerate(df[key_column]):
+            if not isinstance(keys, (list, tuple, np.ndarray)):
+                keys = [keys]
+            for key in keys:
+                groups.setdefault(key, []).append(i)
+        return groups
+
+    def update(self, df, key_column):
+        """写入一批分析结果，按键分组后每个键的每个窗口只做一次批量写入"""
+        t = self.to_epoch(df['time'])
+        score = df['sentiment_score'].to_numpy(dtype=float)
+        heat = df['heat_index'].to_numpy(dtype=float)
+        for key, rows in self._group_rows(df, key_column).items():
+            self.add_many(key, t[rows], score[rows], heat[rows])
+
+    def add_heat(self, df, key_column):
+        """只补记热度（近重复副本晚于代表帖到达），计在代表帖的时间上；键为空的行跳过"""
+        t = self.to_epoch(df['time'])
+        heat = df['heat_index'].to_numpy(dtype=float)
+        for key, rows in self._group_rows(df, key_column).items():
+            if key in self._keys:
+                self.add_many(key, t[rows], np.zeros(len(rows)), heat[rows], count=0)
+
+    def query(self, window="1h", now=None):
+        """
+        查询某个窗口内各键的汇总；now 缺省为已写入数据中的最新时间，仅用于回放与离线分析（结果可复现），
+        实时看板应传入当前时间，否则没有新帖时窗口不会前移
+        """
+        import pandas as pd
+        if now is None:
+            now = self.latest if self.latest is not None else time.time()
+        rows = {}
+        for key, windows in self._keys.items():
+            count, avg_score, heat, decayed = windows[window].snapshot(now)
+            if count:
+                rows[key] = (count, avg_score, heat, decayed)
+        summary = pd.DataFrame.from_dict(
+            rows, orient='index', columns=['文章数量', '平均情绪得分', '总热度', '衰减热度']
+        )
+        summary.index.name = 'key'
+        return summary.sort_index()